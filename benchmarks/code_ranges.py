@@ -0,0 +1,119 @@
+"""
+Benchmark of the planning of the code ranges of a crawl (`icsd.coverage`)
+as the number of ICSD Collection Codes grows, against the scan of Python
+lists it replaces.
+
+    python -m benchmarks.code_ranges [--sizes 10000 100000 1000000]
+
+The crawl is taken late, with the first 90 % of the codes crawled (and
+optionally holes left by failures among them). Each round claims a range and keeps it in
+progress, as the workers of `Crawler` do.
+"""
+import sys
+import time
+import argparse
+import numpy as np
+from icsd.coverage import Coverage
+
+
+def list_next_range(all_codes, crawled_codes, not_yet_crawled, max_dl,
+                    in_progress):
+    """
+    Former `Crawler.get_code_range`, on Python lists.
+    """
+    start = next(c for c in not_yet_crawled
+                 if not any(s <= c <= e for s, e in in_progress))
+    end = all_codes[min(all_codes.index(start) + max_dl - 1,
+                        len(all_codes) - 1)]
+    for c in crawled_codes:
+        if start <= c <= end:
+            end = c - 1
+            break
+    for s, _ in in_progress:
+        if start <= s <= end:
+            end = s - 1
+
+    return((start, end))
+
+
+def make_codes(n_codes, progress=0.9, holes=0.0, seed=0):
+    """
+    Return: (tuple) `n_codes` sorted codes, and the codes crawled: the first
+            `progress` of them, but for a fraction `holes` at random
+    """
+    rng = np.random.RandomState(seed)
+    codes = np.sort(rng.choice(3 * n_codes, n_codes, replace=False)) + 1
+    crawled = codes[:int(progress * n_codes)]
+    crawled = crawled[rng.rand(len(crawled)) >= holes]
+    return(codes, crawled)
+
+
+def run(n_codes, claims=50, max_dl=100, workers=4, with_lists=True):
+    """
+    Arguments:
+        n_codes: number of enumerated codes
+
+    Keyword arguments:
+        claims: (default: 50) number of ranges claimed
+        max_dl: (default: 100) maximum number of codes per range
+        workers: (default: 4) number of ranges kept in progress
+        with_lists: (default: True) whether the list scan is timed too
+
+    Return: (dict) mean microseconds per claim of the coverage ("coverage_us")
+            and of the list scan ("lists_us", None if not timed)
+    """
+    codes, crawled = make_codes(n_codes)
+    coverage = Coverage(codes, crawled)
+
+    def claim_all(next_range):
+        in_progress = []
+        ranges = []
+        start = time.perf_counter()
+        for _ in range(claims):
+            code_range = next_range(in_progress)
+            ranges.append(code_range)
+            in_progress.append(code_range)
+            if len(in_progress) > workers:
+                in_progress.pop(0)
+        return(ranges, 1e6 * (time.perf_counter() - start) / claims)
+
+    ranges, coverage_us = claim_all(
+        lambda in_progress: coverage.next_range(max_dl, in_progress))
+
+    lists_us = None
+    if with_lists:
+        all_codes = codes.tolist()
+        crawled_codes = crawled.tolist()
+        not_yet_crawled = coverage.uncrawled_codes().tolist()
+        list_ranges, lists_us = claim_all(
+            lambda in_progress: list_next_range(
+                all_codes, crawled_codes, not_yet_crawled, max_dl,
+                in_progress))
+        assert list_ranges == ranges
+
+    return({'n_codes': n_codes, 'coverage_us': coverage_us,
+            'lists_us': lists_us})
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--sizes', nargs='+', type=int,
+                        default=[10 ** 4, 10 ** 5, 10 ** 6],
+                        help='numbers of codes')
+    parser.add_argument('--claims', default=50, type=int,
+                        help='number of ranges claimed')
+    args = parser.parse_args(argv)
+
+    sys.stdout.write('{:>10} {:>14} {:>14}\n'.format(
+        'codes', 'coverage us', 'lists us'))
+    for n_codes in args.sizes:
+        result = run(n_codes, claims=args.claims)
+        sys.stdout.write('{:>10} {:>14.1f} {:>14.1f}\n'.format(
+            n_codes, result['coverage_us'], result['lists_us']))
+        sys.stdout.flush()
+
+    return(0)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,175 @@
+"""
+Benchmark of the parse engine over the recorded 'Detailed View' pages in
+`tests/fixtures/detailed_view`, compared against `benchmarks/baseline.json`.
+
+    python -m benchmarks.parse_engine [--rounds N] [--update-baseline]
+
+`Queryer.parse_entry` runs end to end against a fake WebDriver serving the
+pages; the fixed sleeps of the Queryer are skipped, as they do not belong to
+the parse engine. The cost of each panel and field is measured separately
+with `EntryParser.parse_fields`.
+"""
+import os
+import sys
+import glob
+import json
+import time
+import argparse
+from unittest import mock
+from icsd.entry_parser import EntryParser
+from tests.fake_driver import FIXTURES_DIR, make_queryer
+
+
+BASELINE_FILE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+
+
+class SourcePage(EntryParser):
+    def __init__(self, source):
+        super(SourcePage, self).__init__()
+        self.source = source
+
+    def get_page_source(self):
+        return(self.source)
+
+
+def load_pages(fixtures_dir=FIXTURES_DIR):
+    """
+    Return: (list) HTML sources of the recorded pages
+    """
+    pages = []
+    for path in sorted(glob.glob(os.path.join(fixtures_dir, '*.html'))):
+        with open(path) as f:
+            pages.append(f.read())
+
+    return(pages)
+
+
+def run(rounds=20, pages=None):
+    """
+    Keyword arguments:
+        rounds: (default: 20) number of times each page is parsed
+        pages: (default: None) HTML sources (default: all the fixtures)
+
+    Return: (dict) "entries_per_sec", mean "entry_ms" and mean cost of each
+            panel and field in microseconds ("fields_us")
+    """
+    if pages is None:
+        pages = load_pages()
+
+    queryer = make_queryer(pages * rounds)
+    n_entries = len(pages) * rounds
+    with mock.patch('icsd.entry_parser.time.sleep'):
+        start = time.perf_counter()
+        for i in range(n_entries):
+            queryer.parse_entry()
+            if i + 1 < n_entries:
+                queryer._go_to_next_entry()
+        elapsed = time.perf_counter() - start
+
+    totals = {}
+    for _ in range(rounds):
+        for source in pages:
+            timings = {}
+            SourcePage(source).parse_fields(timings=timings)
+            for name, seconds in timings.items():
+                totals[name] = totals.get(name, 0.0) + seconds
+
+    fields_us = {name: 1e6 * seconds / n_entries
+                 for name, seconds in totals.items()}
+
+    return({
+        'n_entries': n_entries,
+        'entries_per_sec': n_entries / elapsed,
+        'entry_ms': 1e3 * elapsed / n_entries,
+        'fields_us': fields_us,
+    })
+
+
+def compare(result, baseline, tolerance=0.5, noise_us=20.0):
+    """
+    Compare a benchmark result with the baseline.
+
+    Keyword arguments:
+        tolerance: (default: 0.5) allowed relative slowdown
+        noise_us: (default: 20.0) slowdowns of a field below this many
+                  microseconds are ignored
+
+    Return: (list) Descriptions of the regressions
+    """
+    regressions = []
+    if result['entries_per_sec'] < \
+            baseline['entries_per_sec'] / (1 + tolerance):
+        regressions.append('entries/sec: {:.1f} (baseline {:.1f})'.format(
+            result['entries_per_sec'], baseline['entries_per_sec']))
+
+    for name, cost in sorted(result['fields_us'].items()):
+        base_cost = baseline['fields_us'].get(name)
+        if base_cost is None:
+            continue
+        if cost > base_cost * (1 + tolerance) and cost - base_cost > noise_us:
+            regressions.append('{}: {:.1f} us (baseline {:.1f} us)'.format(
+                name, cost, base_cost))
+
+    return(regressions)
+
+
+def print_report(result, baseline=None):
+    sys.stdout.write('{} entries: {:.1f} entries/sec ({:.2f} ms/entry)'.format(
+        result['n_entries'], result['entries_per_sec'], result['entry_ms']))
+    if baseline:
+        sys.stdout.write(', baseline {:.1f} entries/sec'.format(
+            baseline['entries_per_sec']))
+    sys.stdout.write('\n\n')
+
+    sys.stdout.write('{:<40} {:>12} {:>12}\n'.format(
+        'field', 'us/entry', 'baseline'))
+    fields = sorted(result['fields_us'].items(), key=lambda x: -x[1])
+    for name, cost in fields:
+        base_cost = ''
+        if baseline and name in baseline['fields_us']:
+            base_cost = '{:.1f}'.format(baseline['fields_us'][name])
+        sys.stdout.write('{:<40} {:>12.1f} {:>12}\n'.format(
+            name, cost, base_cost))
+    sys.stdout.flush()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--rounds', default=20, type=int,
+                        help='number of times each page is parsed')
+    parser.add_argument('--tolerance', default=0.5, type=float,
+                        help='allowed relative slowdown')
+    parser.add_argument('--update-baseline', action='store_true',
+                        help='store the result as the new baseline')
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if os.path.exists(BASELINE_FILE):
+        with open(BASELINE_FILE) as f:
+            baseline = json.load(f)
+
+    result = run(rounds=args.rounds)
+    print_report(result, baseline)
+
+    if args.update_baseline:
+        with open(BASELINE_FILE, 'w') as f:
+            json.dump(result, f, indent=2, sort_keys=True)
+            f.write('\n')
+        sys.stdout.write('Baseline updated.\n')
+        return(0)
+
+    if baseline is None:
+        return(0)
+
+    regressions = compare(result, baseline, tolerance=args.tolerance)
+    if regressions:
+        sys.stdout.write('\nRegressions:\n')
+        for regression in regressions:
+            sys.stdout.write('  {}\n'.format(regression))
+        return(1)
+
+    return(0)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
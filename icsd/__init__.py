@@ -1,3 +1,25 @@
 import os
 
 INSTALL_PATH = os.path.abspath(__file__)
+
+_CRAWLER_VERSION = None
+
+
+def crawler_version():
+    """
+    Version of the installed `icsd` distribution, looked up once per process.
+
+    Return: (string) version, e.g. "0.0.4"
+    """
+    global _CRAWLER_VERSION
+    if _CRAWLER_VERSION is None:
+        try:
+            from importlib.metadata import version
+        except ImportError:
+            # Python < 3.8
+            import pkg_resources
+            _CRAWLER_VERSION = pkg_resources.get_distribution("icsd").version
+        else:
+            _CRAWLER_VERSION = version("icsd")
+
+    return(_CRAWLER_VERSION)
@@ -0,0 +1,87 @@
+"""
+Split the CIF export of a whole selection (a multi-block CIF, or a ZIP
+archive of CIFs) into one CIF per ICSD Collection Code.
+"""
+import io
+import os
+import re
+import zipfile
+
+
+_RE_BLOCK = re.compile(r'^data_', re.MULTILINE)
+_RE_CODE = re.compile(r'^_database_code_ICSD\s+(\d+)', re.MULTILINE)
+_RE_BLOCK_NAME = re.compile(r'^data_(\d+)')
+
+
+def split_cif_blocks(text):
+    """
+    Split a CIF into its data blocks.
+
+    Arguments:
+        text: content of the CIF
+
+    Return: (dict) ICSD Collection Code (string):CIF of the block
+    """
+    starts = [m.start() for m in _RE_BLOCK.finditer(text)]
+    cifs = {}
+    for start, end in zip(starts, starts[1:] + [len(text)]):
+        block = text[start:end]
+        search = _RE_CODE.search(block) or _RE_BLOCK_NAME.search(block)
+        if search:
+            cifs[search.group(1)] = block.rstrip('\n') + '\n'
+
+    return(cifs)
+
+
+def read_cif_batch(path):
+    """
+    Read the CIF export of a selection.
+
+    Arguments:
+        path: multi-block CIF, or ZIP archive of CIFs
+
+    Return: (dict) ICSD Collection Code (string):CIF
+    """
+    cifs = {}
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as archive:
+            for name in archive.namelist():
+                if name.lower().endswith('.cif'):
+                    with archive.open(name) as f:
+                        text = io.TextIOWrapper(f, encoding='utf-8',
+                                                errors='replace').read()
+                    cifs.update(split_cif_blocks(text))
+    else:
+        with open(path, encoding='utf-8', errors='replace') as f:
+            cifs.update(split_cif_blocks(f.read()))
+
+    return(cifs)
+
+
+def save_cifs(cifs, codes, directory='.'):
+    """
+    Write the CIF of each entry into "[code]/[code].cif".
+
+    Arguments:
+        cifs: dictionary of ICSD Collection Code:CIF (see `read_cif_batch`)
+        codes: ICSD Collection Codes of the entries expected
+
+    Keyword arguments:
+        directory: (default: '.') directory of the entry directories
+
+    Return: (list) ICSD Collection Codes without a CIF in `cifs`
+    """
+    missing = []
+    for code in codes:
+        code = str(code)
+        if code not in cifs:
+            missing.append(code)
+            continue
+
+        entry_dir = os.path.join(directory, code)
+        if not os.path.exists(entry_dir):
+            os.mkdir(entry_dir)
+        with open(os.path.join(entry_dir, '{}.cif'.format(code)), 'w') as fw:
+            fw.write(cifs[code])
+
+    return(missing)
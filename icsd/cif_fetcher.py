@@ -0,0 +1,162 @@
+"""
+Download the CIFs of the entries over HTTP, with the cookies of the
+authenticated browser session, while the browser moves on to the next
+entries.
+"""
+import os
+import logging
+from urllib.parse import urljoin
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+from icsd.entry_parser import QueryerError
+
+
+# export URL of the CIF of a single entry
+CIF_URL = 'https://icsd.fiz-karlsruhe.de/ws/cif/{code}'
+
+
+def cif_url_for(url):
+    """
+    Return: (string) URL of a CIF (see `CIF_URL`) on the server of the page
+            `url`
+    """
+    return(urljoin(url, '/ws/cif/{code}'))
+
+
+class CIFFetchError(QueryerError):
+    pass
+
+
+class CIFFetcher(object):
+    """
+    Fetch CIFs on a pool of keep-alive HTTP connections, in background
+    threads. Each CIF is streamed into a temporary file next to its
+    destination, and moved into place once complete.
+    """
+
+    def __init__(self, url=CIF_URL, cookies=None, headers=None, workers=4,
+                 timeout=60):
+        """
+        Keyword arguments:
+            url: (default: `CIF_URL`) URL of a CIF, formatted with the ICSD
+                 Collection Code as "code"
+            cookies: (default: None) cookies of the session, as returned by
+                     `WebDriver.get_cookies`
+            headers: (default: None) dictionary of HTTP headers to send
+            workers: (default: 4) number of concurrent downloads
+            timeout: (default: 60) seconds to wait for the server
+
+        Attributes:
+            errors: dictionary of ICSD Collection Code:error message of the
+                    failed downloads
+        """
+        self.url = url
+        self.timeout = timeout
+        self.errors = {}
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        if headers:
+            self.session.headers.update(headers)
+        for cookie in cookies or []:
+            self.session.cookies.set(
+                cookie['name'], cookie['value'],
+                domain=cookie.get('domain', ''), path=cookie.get('path', '/'))
+
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+        self._pending = []
+
+    @classmethod
+    def from_driver(cls, driver, **kwargs):
+        """
+        Arguments:
+            driver: Selenium WebDriver of the authenticated session
+
+        Keyword arguments: see `CIFFetcher`
+
+        Return: (CIFFetcher) a fetcher sharing the cookies and the user agent
+                of the browser
+        """
+        user_agent = driver.execute_script('return navigator.userAgent')
+        headers = {'User-Agent': user_agent} if user_agent else None
+        return(cls(cookies=driver.get_cookies(), headers=headers, **kwargs))
+
+    def fetch(self, code, path):
+        """
+        Download the CIF of an entry into `path`.
+
+        Arguments:
+            code: ICSD Collection Code
+            path: destination file
+        """
+        url = self.url.format(code=code)
+        part = '{}.part'.format(path)
+        try:
+            with self.session.get(url, stream=True,
+                                  timeout=self.timeout) as response:
+                response.raise_for_status()
+                with open(part, 'wb') as fw:
+                    head = b''
+                    for chunk in response.iter_content(chunk_size=65536):
+                        if not head:
+                            head = chunk.lstrip()
+                            if head.startswith(b'<'):
+                                raise CIFFetchError(
+                                    'Not a CIF (HTML page) at {}'.format(url))
+                        fw.write(chunk)
+
+            if not head:
+                raise CIFFetchError('Empty CIF at {}'.format(url))
+            os.replace(part, path)
+        except Exception as e:
+            if os.path.exists(part):
+                os.remove(part)
+            if isinstance(e, CIFFetchError):
+                raise
+            raise CIFFetchError('Failed to download {}: {}'.format(url, e))
+
+    def _fetch_then(self, code, path, then):
+        self.fetch(code, path)
+        if then is not None:
+            then()
+
+    def submit(self, code, path, then=None):
+        """
+        Queue the download of a CIF (see `fetch`), and return immediately.
+
+        Keyword arguments:
+            then: (default: None) function called without arguments once the
+                  CIF is saved (not if the download fails), before `wait`
+                  returns
+        """
+        future = self._executor.submit(self._fetch_then, code, path, then)
+        self._pending.append((code, future))
+        return(future)
+
+    def wait(self):
+        """
+        Wait for the queued downloads, and record the failed ones in
+        `errors`.
+
+        Return: (dict) ICSD Collection Code:error message of the downloads
+                that failed since the last call
+        """
+        errors = {}
+        for code, future in self._pending:
+            try:
+                future.result()
+            except CIFFetchError as e:
+                logging.error(e)
+                errors[code] = str(e)
+        self._pending = []
+
+        self.errors.update(errors)
+        return(errors)
+
+    def close(self):
+        self.wait()
+        self._executor.shutdown()
+        self.session.close()
@@ -4,30 +4,86 @@ from selenium.webdriver.support.ui import WebDriverWait
 import time
 import os
 import math
+import pandas as pd
 from icsd import queryer
+from icsd.http_queryer import HttpQueryer
 from selenium.webdriver.support.ui import Select
 from tqdm import tqdm
 
 
 class CollectionCoder():
-    def __init__(self, first_code, last_code):
+    def __init__(self, first_code, last_code, url=None, engine='browser'):
+        """
+        Arguments:
+            first_code: first ICSD Collection Code of the range
+            last_code: last ICSD Collection Code of the range
+
+        Keyword arguments:
+            url: (default: None) URL of the search page (see `Queryer`)
+            engine: (default: 'browser') 'browser' or 'http' (see
+                    `icsd.session.CrawlSession`)
+        """
         self.previous_code = 0
         self.code_range = "{0}-{1}".format(first_code, last_code)
         self.combined_csv_path = "combined/comb_{}.csv".format(self.code_range)
-
-    def init_driver(self):
-        self.q = queryer.Queryer(structure_source="A")
-        self.q.select_structure_source()
-        textbox = self.q.driver.find_element_by_id(
-            "content_form:uiCodeCollection:input:input")
-        textbox.send_keys(self.code_range)
+        self.url = url
+        self.engine = engine
+
+    def init_driver(self, instrument=False, browser_data_dir=None):
+        if self.engine == 'http':
+            self.q = HttpQueryer(url=self.url, structure_source="A",
+                                 instrument=instrument)
+            self.q.select_structure_source()
+            self.q.http.set_field(
+                "content_form:uiCodeCollection:input:input", self.code_range)
+        else:
+            self.q = queryer.Queryer(url=self.url, structure_source="A",
+                                     instrument=instrument,
+                                     browser_data_dir=browser_data_dir)
+            self.q.select_structure_source()
+            textbox = self.q.driver.find_element_by_id(
+                "content_form:uiCodeCollection:input:input")
+            textbox.send_keys(self.code_range)
         self.q._run_query()
         self.q._check_list_view()
 
     def run(self):
 
         self.init_driver()
+        os.makedirs("each", exist_ok=True)
+        os.makedirs("combined", exist_ok=True)
+
+        if self.engine == 'http':
+            df_list = self._get_pages_over_http()
+        else:
+            df_list = self._get_pages()
+
+        combined_df = pd.concat(df_list)
+
+        combined_df.to_csv(self.combined_csv_path)
+        self.quit()
+
+    def _get_pages_over_http(self):
+        """
+        Read the 'List View' 50 rows at a time with the ajax requests of its
+        paginator.
+
+        Return: (list) DataFrame of each page
+        """
+        n_pages = math.ceil(self.q.hits / 50)
+        df_list = []
+        for page in range(1, n_pages + 1):
+            print("({0} of {1})".format(page, n_pages))
+            self.q.show_list_page(page - 1, rows=50)
+            _df = self._get_current_df()
+            filename = "each/{0}-p{1}outof{2}ps.csv".format(
+                self.code_range, page, n_pages)
+            _df.to_csv(filename)
+            df_list.append(_df)
+
+        return(df_list)
 
+    def _get_pages(self):
         select = Select(self.q.driver.find_element_by_id(
             "display_form:listViewTable:j_id12"))
         select.select_by_value('50')
@@ -65,9 +121,7 @@ class CollectionCoder():
             self.q._wait_until_dialogue_disappears()
             self.q.wait_for_ajax()
 
-        combined_df = pd.concat(df_list)
-
-        combined_df.to_csv(self.combined_csv_path)
+        return(df_list)
 
     def _get_df(self):
         _df = self._get_current_df()
@@ -82,17 +136,18 @@ class CollectionCoder():
     def _get_current_df(self):
         table = self.q.get_html_table(idx=1)
         df = pd.read_html(table)[0]
-        self.q.page_obatained = False  # Refresh
+        self.q.invalidate_page()  # Refresh
         return(df)
 
     def quit(self):
         self.q.quit()
 
 
-def main():
+def main(url=None, engine='browser'):
     for i in tqdm(range(100)):
         try:
-            cc = CollectionCoder(i * 10000 + 1, i * 10000 + 10000)
+            cc = CollectionCoder(i * 10000 + 1, i * 10000 + 10000, url=url,
+                                 engine=engine)
             print(cc.combined_csv_path)
             if not os.path.exists(cc.combined_csv_path):
                 cc.run()
@@ -0,0 +1,186 @@
+"""
+Coverage of the ICSD Collection Codes by a crawl, for planning the code
+ranges of the queries: the enumerated codes in a sorted numpy array, with a
+bitmap of the crawled ones, and the crawled codes (enumerated or not) in a
+sorted array. The next range to crawl is found by binary searches, in
+O(log n) for n codes; marking codes as crawled rebuilds the arrays with
+vectorized operations, once per batch of codes.
+
+Several disjoint ranges can be packed into one query (see `next_batch`), so
+that the holes left by failures do not cost a query each.
+"""
+import numpy as np
+
+
+def format_code_ranges(code_ranges):
+    """
+    Return: (string) query of the "Collection Code" field for the ranges
+            (first, last) of codes, e.g. "1-59 101-102 108"
+    """
+    return(' '.join(str(first) if first == last else
+                    '{}-{}'.format(first, last)
+                    for first, last in code_ranges))
+
+
+def _sorted_codes(codes):
+    return(np.unique(np.asarray(list(codes), dtype=np.int64)))
+
+
+class Coverage(object):
+    """
+    Enumerated and crawled ICSD Collection Codes.
+    """
+
+    def __init__(self, all_codes=(), crawled_codes=()):
+        """
+        Keyword arguments:
+            all_codes: (default: ()) codes enumerated (in any order)
+            crawled_codes: (default: ()) codes crawled (enumerated or not)
+
+        Attributes:
+            codes: sorted array of the enumerated codes
+            crawled: bitmap (boolean array) of the crawled `codes`
+            crawled_codes: sorted array of the crawled codes
+        """
+        self.codes = _sorted_codes(all_codes)
+        self.crawled_codes = _sorted_codes(crawled_codes)
+        self._index()
+
+    def _index(self):
+        self.crawled = np.isin(self.codes, self.crawled_codes,
+                               assume_unique=True)
+        # positions in `codes` of the codes not crawled
+        self._uncrawled = np.flatnonzero(~self.crawled)
+
+    def __len__(self):
+        return(len(self.codes))
+
+    def update(self, all_codes=(), crawled_codes=()):
+        """
+        Add the codes newly enumerated, and mark the codes newly crawled.
+        """
+        all_codes = _sorted_codes(all_codes)
+        crawled_codes = _sorted_codes(crawled_codes)
+        if len(all_codes):
+            self.codes = np.union1d(self.codes, all_codes)
+        if len(crawled_codes):
+            self.crawled_codes = np.union1d(self.crawled_codes,
+                                            crawled_codes)
+        if len(all_codes) or len(crawled_codes):
+            self._index()
+
+    def uncrawled_codes(self):
+        """
+        Return: (numpy.ndarray) sorted enumerated codes not crawled
+        """
+        return(self.codes[self._uncrawled])
+
+    def _first_uncrawled(self, position):
+        """
+        Return: (int) position in `codes` of the first code not crawled at
+                or after `position`, None if there is none
+        """
+        k = np.searchsorted(self._uncrawled, position)
+        if k == len(self._uncrawled):
+            return(None)
+        return(int(self._uncrawled[k]))
+
+    def _range_from(self, i, max_dl, in_progress):
+        """
+        Return: (tuple) the range (first, last) starting at `codes[i]`,
+                spanning at most `max_dl` enumerated codes, and ending before
+                the next code crawled or in progress
+        """
+        start = int(self.codes[i])
+        end = int(self.codes[min(i + max_dl - 1, len(self.codes) - 1)])
+
+        # first crawled code, or range in progress, within the range
+        j = np.searchsorted(self.crawled_codes, start)
+        if j < len(self.crawled_codes) and self.crawled_codes[j] <= end:
+            end = int(self.crawled_codes[j]) - 1
+        for s, _ in in_progress:
+            if start <= s <= end:
+                end = s - 1
+
+        return((start, end))
+
+    def _next_start(self, position, in_progress):
+        """
+        Return: (int) position in `codes` of the first code not crawled nor
+                in progress, at or after `position`, None if there is none
+        """
+        while True:
+            i = self._first_uncrawled(position)
+            if i is None:
+                return(None)
+            start = self.codes[i]
+            blocking = [e for s, e in in_progress if s <= start <= e]
+            if not blocking:
+                return(i)
+            position = np.searchsorted(self.codes, max(blocking),
+                                       side='right')
+
+    def next_range(self, max_dl, in_progress=()):
+        """
+        Return the next range of codes to crawl: it starts at the first code
+        not crawled nor in one of the ranges `in_progress`, spans at most
+        `max_dl` enumerated codes, and ends before the next code that is
+        crawled or in progress, so that no crawled code is queried again.
+
+        Arguments:
+            max_dl: maximum number of enumerated codes in the range
+
+        Keyword arguments:
+            in_progress: (default: ()) ranges (first, last) of codes being
+                         crawled
+
+        Return: (tuple) first and last ICSD Collection Codes of the range,
+                None if every code is crawled or in progress
+        """
+        i = self._next_start(0, in_progress)
+        if i is None:
+            return(None)
+        return(self._range_from(i, max_dl, in_progress))
+
+    def next_batch(self, max_dl, in_progress=(), max_ranges=20):
+        """
+        Pack the next `max_dl` codes to crawl into one query: ranges as
+        `next_range` returns them, one after the other, until they hold
+        `max_dl` enumerated codes, or `max_ranges` ranges.
+
+        Arguments:
+            max_dl: maximum number of enumerated codes in the batch
+
+        Keyword arguments:
+            in_progress: (default: ()) ranges (first, last) of codes being
+                         crawled
+            max_ranges: (default: 20) maximum number of ranges, to keep the
+                        query short
+
+        Return: (tuple) ranges (first, last), None if every code is
+                crawled or in progress
+        """
+        code_ranges = []
+        n_codes = 0
+        position = 0
+        while n_codes < max_dl and len(code_ranges) < max_ranges:
+            i = self._next_start(position, in_progress)
+            if i is None:
+                break
+            code_range = self._range_from(i, max_dl - n_codes, in_progress)
+            position = np.searchsorted(self.codes, code_range[1],
+                                       side='right')
+            n_codes += position - i
+            code_ranges.append(code_range)
+
+        if not code_ranges:
+            return(None)
+        return(tuple(code_ranges))
+
+    def count(self, code_ranges):
+        """
+        Return: (int) number of enumerated codes in the ranges (first, last)
+        """
+        return(int(sum(np.searchsorted(self.codes, last, side='right') -
+                       np.searchsorted(self.codes, first)
+                       for first, last in code_ranges)))
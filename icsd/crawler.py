@@ -1,9 +1,18 @@
 import glob
+import numpy as np
 import pandas as pd
 import os
 import math
-from icsd.all_entries import AllEntries
+import shutil
+import tempfile
+from icsd.session import CrawlSession
+from icsd.rate_control import RateController, classify_error
+from icsd.journal import CrawlJournal
+from icsd.state_index import StateIndex
+from icsd.coverage import Coverage, format_code_ranges
+from icsd.leases import LeaseCoordinator
 import logging
+import threading
 import time
 
 
@@ -11,95 +20,432 @@ class Crawler(object):
     def __init__(self):
         self.max_dl = 100
         self.skipcif = False
+        self.instrument = False
+        self.workers = 1
+        self.lean = False
+        self.batch_cif = False
+        self.cif_over_http = False  # see `Queryer.fetch_cif_over_http`
+        self.url = None  # URL of the search page (default: see `Queryer`)
+        self.engine = 'browser'  # or 'http' (see `CrawlSession`)
+        self.rate_file = 'crawl_rate.json'  # state of the rate controller
+        self.rate = None  # `RateController` of the running crawl
+        self.journal_file = 'crawl_journal.jsonl'  # see `icsd.journal`
+        self.journal = None  # `CrawlJournal` of the running crawl
+        self.state_file = 'crawl_state.sqlite'  # see `icsd.state_index`
+        self.state = None  # `StateIndex` of the running crawl
+        self._seq = 0  # last change of the state index seen by `refresh`
+        self.coverage = Coverage()  # codes enumerated and crawled
+        self.pack = True  # several code ranges per query (`get_code_batch`)
+        self.max_ranges = 20  # maximum number of code ranges per query
+        self.n_planned = 0  # codes planned into the queries
+        self.n_capacity = 0  # codes the queries could hold (`max_dl` each)
+        self.coordinator = None  # `LeaseCoordinator` (see `icsd.leases`)
+        self._leases = {}  # lease IDs of the batches being crawled
+        self._reported_seq = 0  # last change of the state index reported
+        self.report_interval = 10  # seconds between reports to coordinator
+        self.in_progress = []  # batches of code ranges being crawled
+        self._lock = threading.Lock()
         logging.basicConfig(filename="selenium.log",  level=logging.INFO,
                             format='[%(asctime)s] %(module)s.%(funcName)s %(levelname)s -> %(message)s')
 
-    def get_code_range(self):
-        def get_within_value(start, end):
-            for c in self.crawled_codes:
-                if start <= c and c <= end:
-                    return(c)
+    def _batch_size(self):
+        if self.rate is None:
+            return(self.max_dl)
+        return(min(self.rate.batch_size, self.max_dl))
 
-            return(-1)
+    @property
+    def all_codes(self):
+        return(self.coverage.codes.tolist())
 
-        start = self.not_yet_crawled[0]
-        end = self.all_codes[self.all_codes.index(
-            start) + self.max_dl-1]  # 100 is the maximum of DL
+    @all_codes.setter
+    def all_codes(self, codes):
+        self.coverage = Coverage(codes, self.coverage.crawled_codes)
 
-        print(start, end)
+    @property
+    def crawled_codes(self):
+        return(self.coverage.crawled_codes.tolist())
 
-        within_val = get_within_value(start, end)
+    @crawled_codes.setter
+    def crawled_codes(self, codes):
+        self.coverage = Coverage(self.coverage.codes, codes)
 
-        if within_val > 0:
-            end = within_val - 1
+    @property
+    def not_yet_crawled(self):
+        return(self.coverage.uncrawled_codes().tolist())
 
-        return(start, end)
+    @not_yet_crawled.setter
+    def not_yet_crawled(self, codes):
+        # the enumerated codes not listed are taken as crawled
+        crawled = np.setdiff1d(self.coverage.codes, list(codes))
+        self.coverage = Coverage(
+            self.coverage.codes,
+            np.union1d(self.coverage.crawled_codes, crawled))
+
+    def _ranges_in_progress(self):
+        return([r for code_batch in self.in_progress for r in code_batch])
+
+    def get_code_range(self, in_progress=None):
+        """
+        Return the next range of codes to crawl: it starts at the first code
+        not yet crawled (nor being crawled by a worker), and ends before the
+        next code that is (see `Coverage.next_range`).
+
+        Keyword arguments:
+            in_progress: (default: None) code ranges being crawled (default:
+                         those of the workers)
+
+        Return: (tuple) first and last ICSD Collection Codes of the range
+        """
+        if in_progress is None:
+            in_progress = self._ranges_in_progress()
+        code_range = self.coverage.next_range(self._batch_size(), in_progress)
+        if code_range is None:
+            raise StopIteration
+
+        return(code_range)
+
+    def get_code_batch(self, in_progress=None):
+        """
+        Return the code ranges of the next query: up to `max_dl` codes not
+        yet crawled (nor being crawled), in up to `max_ranges` ranges around
+        the codes that are (see `Coverage.next_batch`); or the single range
+        of `get_code_range` unless `pack`. The codes planned are counted
+        against the capacity of the query (see `fill_ratio`).
+
+        Keyword arguments:
+            in_progress: (default: None) code ranges being crawled (default:
+                         those of the workers)
+
+        Return: (tuple) ranges (first, last) of ICSD Collection Codes
+        """
+        if in_progress is None:
+            in_progress = self._ranges_in_progress()
+        max_dl = self._batch_size()
+        if self.pack:
+            code_batch = self.coverage.next_batch(max_dl, in_progress,
+                                                  self.max_ranges)
+            if code_batch is None:
+                raise StopIteration
+        else:
+            code_batch = (self.get_code_range(in_progress),)
+
+        n_codes = self.coverage.count(code_batch)
+        self.n_planned += n_codes
+        self.n_capacity += max_dl
+        print('{} ({}/{} codes)'.format(format_code_ranges(code_batch),
+                                        n_codes, max_dl))
+        return(code_batch)
+
+    @property
+    def fill_ratio(self):
+        """
+        Return: (float) codes planned per code the queries could hold
+        """
+        if not self.n_capacity:
+            return(0.0)
+        return(self.n_planned / float(self.n_capacity))
 
     def refresh(self):
-        paths = glob.glob("combined/*.csv")
-        df_list = []
+        """
+        Bring `all_codes`, `crawled_codes` and `not_yet_crawled` up to date
+        with the state index (see `icsd.state_index`): the enumerations in
+        "combined/*.csv" are read only when new or modified, and only the
+        codes changed since the last refresh are applied to the lists. The
+        entry directories ("*/source.html") found are imported into the
+        index on the first run.
+        """
+        if self.state is None:
+            self.state = StateIndex(self.state_file)
+            if not self.state.imported:
+                crawled = glob.glob("*/source.html")
+                self.state.import_crawled(c.split("/")[0] for c in crawled)
+
+        paths = [p for p in glob.glob("combined/*.csv")
+                 if os.stat(p).st_size > 0]
+        if self.state.sync_enumeration(paths):
+            cdf = pd.concat([pd.read_csv(p) for p in paths],
+                            ignore_index=True, sort=False)
+            cdf.to_csv('all_coolection_code.csv')
+            logging.info(
+                "{} structures are in Collection Code list".format(len(cdf)))
+
+        seq, changes = self.state.changes(self._seq)
+        if self._seq:
+            self.coverage.update(
+                [c for c, enumerated, _ in changes if enumerated],
+                [c for c, _, crawled in changes if crawled])
+        else:
+            self.coverage = Coverage(
+                [c for c, enumerated, _ in changes if enumerated],
+                [c for c, _, crawled in changes if crawled])
+        self._seq = seq
+
+        logging.info("{} structures are not retrieved".format(
+            len(self.coverage.uncrawled_codes())))
+
+    def resume_code_batch(self):
+        """
+        Return the codes left of the first unfinished query of the journal
+        that no worker is crawling (see `JournalCursor.remaining_ranges`),
+        and mark the query as finished. Queries that failed before any entry
+        was saved are dropped, so that their codes are planned anew.
+
+        Return: (tuple) ranges (first, last) of ICSD Collection Codes, None
+                if there is no query to resume
+        """
+        if self.journal is None:
+            return(None)
+
+        in_progress = self._ranges_in_progress()
+        for cursor in self.journal.unfinished():
+            if any(s <= last and first <= e for s, e in in_progress
+                   for first, last in cursor.code_ranges):
+                continue
+
+            code_batch = cursor.remaining_ranges()
+            cursor.finish()
+            if cursor.next_index > 0 and code_batch is not None:
+                logging.info('Resuming the query of {} from entry {}'.format(
+                    format_code_ranges(cursor.code_ranges),
+                    cursor.next_index + 1))
+                return(code_batch)
 
-        for p in paths:
-            if os.stat(p).st_size > 0:
-                _df = pd.read_csv(p)
-                df_list.append(_df)
+        return(None)
 
-        cdf = pd.concat(df_list, ignore_index=True, sort=False)
-        cdf.to_csv('all_coolection_code.csv')
+    def claim_code_batch(self):
+        """
+        Refresh the list of crawled codes, and reserve the code ranges of the
+        next query for a worker: the rest of an unfinished query first (see
+        `resume_code_batch`), else new ranges (see `get_code_batch`). With a
+        `coordinator`, the ranges are leased from it instead (see
+        `lease_code_batch`).
 
-        assert(cdf["Coll. Code"].duplicated() == True).sum() == 0
+        Return: (tuple) ranges (first, last) of ICSD Collection Codes, None
+                if there is nothing left to crawl
+        """
+        with self._lock:
+            self.refresh()
+            if self.coordinator is not None:
+                return(self.lease_code_batch())
 
-        logging.info(
-            "{} structures are in Collection Code list".format(len(cdf)))
+            code_batch = self.resume_code_batch()
+            try:
+                if code_batch is None:
+                    code_batch = self.get_code_batch()
+            except StopIteration:
+                return(None)
+
+            self.in_progress.append(code_batch)
+            return(code_batch)
+
+    def lease_code_batch(self):
+        """
+        Lease the code ranges of the next query from the `coordinator`,
+        planned around the codes crawled by all the crawlers sharing it, and
+        the ranges they hold (see `LeaseCoordinator.acquire`). The unfinished
+        queries of the journal (left by a crawl that died) are not resumed,
+        since their leases have been lost: the codes saved are reported, and
+        the queries are finished, so that the rest of their codes are
+        planned anew.
 
-        cdf = cdf.sort_values(by=["Coll. Code"])
+        Return: (tuple) ranges (first, last) of ICSD Collection Codes, None
+                if there is nothing left to crawl
+        """
+        if self.journal is not None:
+            in_progress = set(self.in_progress)
+            for cursor in self.journal.unfinished():
+                if cursor.code_ranges not in in_progress:
+                    self.coordinator.report(cursor.codes.values())
+                    cursor.finish()
+
+        def plan(crawled_codes, leased):
+            self.coverage.update(crawled_codes=crawled_codes)
+            try:
+                return(self.get_code_batch(leased))
+            except StopIteration:
+                return(None)
 
-        crawled = glob.glob("*/source.html")
-        crawled = [int(c.split("/")[0]) for c in crawled]
+        lease = self.coordinator.acquire(plan)
+        if lease is None:
+            return(None)
 
-        cdf2 = cdf[~cdf["Coll. Code"].isin(crawled)]
-        logging.info("{} structures are not retrieved".format(len(cdf2)))
+        lease_id, code_batch = lease
+        self._leases[code_batch] = lease_id
+        self.in_progress.append(code_batch)
+        return(code_batch)
 
-        self.crawled_codes = sorted(crawled)
-        self.all_codes = cdf["Coll. Code"].tolist()
-        self.not_yet_crawled = cdf2["Coll. Code"].tolist()
+    def release_code_batch(self, code_batch):
+        """
+        Release the code ranges claimed by a worker. With a `coordinator`,
+        the codes crawled since the last report are recorded in it as the
+        lease ends (see `report_crawled`), and the query is finished in the
+        journal if it failed, since the lease of the rest of its codes ends.
+        """
+        with self._lock:
+            self.in_progress.remove(code_batch)
+            if self.coordinator is None:
+                return
+
+            lease_id = self._leases.pop(code_batch)
+            if self.journal is not None:
+                cursor = self.journal.cursors.get(code_batch)
+                if cursor is not None:
+                    cursor.finish()
+            self._report_crawled(
+                lambda codes: self.coordinator.release(lease_id, codes))
+
+    def _report_crawled(self, report):
+        # codes marked as crawled in the state index since the last report
+        seq, changes = self.state.changes(self._reported_seq)
+        report([c for c, _, crawled in changes if crawled])
+        self._reported_seq = seq
+
+    def report_crawled(self):
+        """
+        Report the codes crawled since the last report to the `coordinator`
+        (see `LeaseCoordinator.report`): the entries saved, as marked in the
+        state index.
+        """
+        with self._lock:
+            self._report_crawled(self.coordinator.report)
+
+    def _heartbeat(self, stop):
+        """
+        Report the codes crawled, and renew the leases of the batches being
+        crawled, every `report_interval` seconds (at least three times per
+        time to live of the leases), until `stop` is set. A failed beat
+        (e.g., the database of the coordinator is locked) is tried again at
+        the next one.
+        """
+        interval = min(self.report_interval, self.coordinator.ttl / 3.0)
+        while not stop.wait(interval):
+            try:
+                self.report_crawled()
+                with self._lock:
+                    lease_ids = list(self._leases.values())
+                for lease_id in self.coordinator.heartbeat(lease_ids):
+                    logging.warning('Lease {} lost'.format(lease_id))
+            except Exception as e:
+                logging.error('Heartbeat failed: {}: {}'.format(
+                    type(e).__name__, e))
 
     def run(self):
+        """
+        Crawl all the codes not yet crawled with `workers` browser sessions
+        running side by side, each on its own code ranges.
+        """
         logging.info("Awakening...")
         self.refresh()
+        self._reported_seq = self._seq
+        self.rate = RateController.load(self.rate_file, max_batch=self.max_dl)
+        self.journal = CrawlJournal(self.journal_file, state=self.state)
+        logging.info("Resuming with {} codes per query, {:.1f} s per entry"
+                     .format(self.rate.batch_size, self.rate.interval))
+
+        threads = [threading.Thread(target=self._work, args=(worker,),
+                                    name='worker-{}'.format(worker))
+                   for worker in range(self.workers)]
+        stop = threading.Event()
+        if self.coordinator is not None:
+            threads.append(threading.Thread(target=self._heartbeat,
+                                            args=(stop,), name='heartbeat'))
+        for thread in threads:
+            thread.start()
+        for thread in threads[:self.workers]:
+            thread.join()
+        stop.set()
+        for thread in threads[self.workers:]:
+            thread.join()
+
+        if self.n_capacity:
+            message = 'Planned {} codes into queries for {} ({:.0%} full)'\
+                .format(self.n_planned, self.n_capacity, self.fill_ratio)
+            logging.info(message)
+            print(message)
 
-        sleep_time = 1800
-        # n_at_fail = 0
+    def _work(self, worker):
+        """
+        Crawl batches of code ranges in a browser session with its own
+        profile and download directory until no code is left. The browser is
+        kept open from one query to the next (see `CrawlSession`).
+        """
+        # unique to the process: crawlers sharing the working directory
+        # must not wipe each other's profiles (see `Queryer`)
+        root = os.path.join(os.getcwd(), 'browser_data')
+        os.makedirs(root, exist_ok=True)
+        browser_data_dir = tempfile.mkdtemp(
+            prefix='worker-{}-'.format(worker), dir=root)
+        session = CrawlSession(
+            instrument=self.instrument, skipcif=self.skipcif, lean=self.lean,
+            batch_cif=self.batch_cif, url=self.url, engine=self.engine,
+            journal=self.journal, cif_over_http=self.cif_over_http,
+            browser_data_dir=browser_data_dir)
+        if self.workers > 1:
+            session.instrumentation_file = \
+                'instrumentation-worker-{}.json'.format(worker)
 
-        while len(self.not_yet_crawled) > 0:
+        while True:
             try:
-                self.refresh()
-                start, end = self.get_code_range()
+                code_batch = self.claim_code_batch()
+            except Exception as e:
+                # e.g., the database of the coordinator is locked
+                logging.error('Failed to claim codes: {} ({}): {}'.format(
+                    type(e).__name__, classify_error(e), e))
+                backoff = self.rate.record_error(e)
+                print("Sleep {} seconds".format(backoff))
+                self._sleep(backoff)
+                continue
+
+            if code_batch is None:
+                break
 
-                ae = AllEntries(start, end)
-                ae.cc.q.skipcif = self.skipcif
-                ae.run()
+            interval = session.interval = self.rate.interval
+            backoff = 0
+            try:
+                entries = session.crawl_codes(code_batch)
 
             except Exception as e:
-                logging.error(e)
-                print("Sleep {} seconds".format(sleep_time))
-                time.sleep(sleep_time)
-                sleep_time = sleep_time * 2
-                ae.cc.q.interval = ae.cc.q.interval * 2
+                logging.error('{} ({}): {}'.format(
+                    type(e).__name__, classify_error(e), e))
+                backoff = self.rate.record_error(e)
+
+            else:
+                # neither the query nor the pauses before the entries are the
+                # server's latency per entry
+                n_entries = len(entries or [])
+                self.rate.record_success(
+                    n_entries,
+                    session.entries_seconds - n_entries * interval)
 
-                self.max_dl = int(self.max_dl / 2)
+            finally:
+                self.release_code_batch(code_batch)
 
-                self.refresh()
+            if backoff:
+                print("Sleep {} seconds".format(backoff))
+                self._sleep(backoff)
 
-                # if n_at_fail - len(self.not_yet_crawled) > 1000:
-                    # sleep_time = 1800
-                    # ae.cc.q.init_interval()
+        session.close()
+        shutil.rmtree(browser_data_dir, ignore_errors=True)
 
-                # n_at_fail = len(self.not_yet_crawled)
+    def _sleep(self, seconds):
+        time.sleep(seconds)
 
 
-def main(skipcif=False, maxdl=100):
+def main(skipcif=False, maxdl=100, instrument=False, workers=1, lean=False,
+         batch_cif=False, url=None, engine='browser', pack=True,
+         coordinator=None, owner=None, lease_ttl=600, cif_over_http=False):
     c = Crawler()
+    c.pack = pack
+    if coordinator:
+        c.coordinator = LeaseCoordinator(coordinator, owner=owner,
+                                         ttl=lease_ttl)
+    c.url = url
+    c.engine = engine
     c.skipcif = skipcif
     c.max_dl = maxdl
+    c.instrument = instrument
+    c.workers = workers
+    c.lean = lean
+    c.batch_cif = batch_cif
+    c.cif_over_http = cif_over_http
     c.run()
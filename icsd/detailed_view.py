@@ -0,0 +1,253 @@
+import re
+from lxml import html
+
+
+_RE_WHITESPACE = re.compile(r'\s+')
+_RE_VERSION = re.compile(r'<p>(Version[\s0-9.()A-z-]+)</p>')
+
+# Snapshot of a 'Detailed View' page in a single WebDriver round trip (see
+# `DetailedViewPage.from_bundle`): the panels are split as in
+# `DetailedViewPage._split_panels`. The whole document is included if
+# arguments[0] is true. "transferred" is the number of bytes the browser
+# transferred since the previous snapshot (resource timing entries).
+SNAPSHOT_SCRIPT = """
+var bundle = {titles: [], version: null, panels: [], source: null};
+
+var queue = window.PrimeFaces && PrimeFaces.ajax && PrimeFaces.ajax.Queue;
+bundle.idle = !(queue && !queue.isEmpty()) &&
+    !(window.jQuery && jQuery.active !== 0) &&
+    document.readyState === 'complete';
+var dialog = document.getElementById('dlgBlockUI');
+bundle.blocked = !!dialog && dialog.getAttribute('aria-hidden') !== 'true';
+
+var titles = document.querySelectorAll('[id="display_main"]');
+for (var i = 0; i < titles.length; i++) {
+    bundle.titles.push(titles[i].textContent);
+}
+
+var paragraphs = document.getElementsByTagName('p');
+for (var i = 0; i < paragraphs.length; i++) {
+    var match = /^(Version[\\s0-9.()A-z-]+)$/.exec(paragraphs[i].innerHTML);
+    if (match) {
+        bundle.version = match[1];
+        break;
+    }
+}
+
+var seen = {}, pending = [];
+var elements = document.querySelectorAll('div, table');
+for (var i = 0; i < elements.length; i++) {
+    var element = elements[i];
+    if (element.tagName === 'TABLE') {
+        if (!seen['Summary']) {
+            seen['Summary'] = true;
+            pending.unshift('Summary');
+        }
+        for (var j = 0; j < pending.length; j++) {
+            bundle.panels.push([pending[j], element.outerHTML]);
+        }
+        pending = [];
+        continue;
+    }
+
+    if (element.childElementCount !== 1 ||
+            element.firstElementChild.tagName !== 'SPAN') {
+        continue;
+    }
+    var text = '', tail = '';
+    for (var node = element.firstChild; node; node = node.nextSibling) {
+        if (node.nodeType === 1) {
+            tail = ' ';
+        } else if (node.nodeType === 3) {
+            if (tail) { tail += node.data; } else { text += node.data; }
+        }
+    }
+    var header = tail.trim();
+    if (header && !text.trim() && !seen[header]) {
+        seen[header] = true;
+        pending.push(header);
+    }
+}
+
+bundle.transferred = 0;
+if (window.performance && performance.getEntriesByType) {
+    var entries = performance.getEntriesByType('resource');
+    if (!window.__icsdTransfer) {
+        window.__icsdTransfer = true;
+        performance.setResourceTimingBufferSize(10000);
+        entries = entries.concat(performance.getEntriesByType('navigation'));
+    }
+    for (var i = 0; i < entries.length; i++) {
+        bundle.transferred += entries[i].transferSize || 0;
+    }
+    performance.clearResourceTimings();
+}
+
+if (arguments[0]) {
+    bundle.source = document.documentElement.outerHTML;
+}
+return bundle;
+"""
+
+
+def _cell_text(cell):
+    return(_RE_WHITESPACE.sub(' ', cell.text_content()).strip())
+
+
+def iter_panel_rows(table):
+    """
+    Parse a panel table of the form
+    [Name | Value | (spacer) | Name | Value] into (name, value) pairs.
+
+    A name cell spanning several rows (e.g. "Remarks", "Comments") is repeated
+    for each of its rows, so multi-valued rows yield one pair per value.
+    Pairs without a name are skipped.
+
+    Arguments:
+        table: 'table' element of the panel
+
+    Yield: (tuple) (name, value)
+    """
+    spans = {}  # column: [remaining rows, text]
+    for tr in table.xpath('./tr | ./tbody/tr | ./thead/tr'):
+        cells = iter(tr.xpath('./td | ./th'))
+        row = []
+        column = 0
+        while True:
+            if column in spans:
+                span = spans[column]
+                row.append(span[1])
+                span[0] -= 1
+                if span[0] == 0:
+                    del spans[column]
+                column += 1
+                continue
+
+            cell = next(cells, None)
+            if cell is None:
+                break
+
+            text = _cell_text(cell)
+            rowspan = int(cell.get('rowspan', 1) or 1)
+            for _ in range(int(cell.get('colspan', 1) or 1)):
+                if rowspan > 1:
+                    spans[column] = [rowspan - 1, text]
+                row.append(text)
+                column += 1
+
+        row += [''] * (5 - len(row))
+        for name, value in ((row[0], row[1]), (row[3], row[4])):
+            if name:
+                yield((name, value))
+
+
+class DetailedViewPage(object):
+    """
+    HTML source of a 'Detailed View' page, split into its named panels
+    ("Summary", "Chemistry", "Published Crystal Structure Data",
+    "Experimental information", "Bibliography", "Additional information", ...)
+    in a single pass over the document.
+
+    The table of each panel is parsed into (name, value) rows on first
+    access, and cached for the lifetime of the page.
+    """
+
+    def __init__(self, source):
+        """
+        Arguments:
+            source: HTML source of the 'Detailed View' page
+
+        Attributes:
+            source: HTML source of the page (None if built from a bundle
+                    without it)
+            tree: root element of the parsed document (None if built from a
+                  bundle)
+            tables: dictionary of panel header:'table' element
+            titles: texts of the 'title' ('display_main') elements
+            version: ICSD version in the footer, None if not found
+        """
+        self.source = source
+        self.tree = html.fromstring(source)
+        self.tables = self._split_panels(self.tree)
+        self.titles = [t.text_content() for t
+                       in self.tree.xpath('//*[@id="display_main"]')]
+        search = _RE_VERSION.search(source)
+        self.version = search.group(1) if search else None
+        self._panels = {}
+
+    @classmethod
+    def from_bundle(cls, bundle):
+        """
+        Build the page from the bundle returned by `SNAPSHOT_SCRIPT`, parsing
+        only the tables of the panels instead of the whole document.
+
+        Arguments:
+            bundle: dictionary with "titles", "version", "panels" (list of
+                    [header, HTML of the table]) and "source"
+
+        Return: (DetailedViewPage) the page
+        """
+        page = cls.__new__(cls)
+        page.source = bundle.get('source')
+        page.tree = None
+        page.titles = list(bundle['titles'])
+        page.version = bundle.get('version')
+        page.tables = {}
+        elements = {}
+        for header, table in bundle['panels']:
+            if table not in elements:
+                elements[table] = html.fragment_fromstring(table)
+            page.tables.setdefault(header, elements[table])
+        page._panels = {}
+
+        return(page)
+
+    def _split_panels(self, tree):
+        """
+        Walk through the document once, and pair each panel header (a 'div'
+        holding only an icon 'span' followed by the header text) with the
+        first 'table' after it.
+        The "Summary" panel is the first table of the page.
+
+        Return: (dict) panel header:'table' element
+        """
+        tables = {}
+        pending = []
+        for element in tree.iter('div', 'table'):
+            if element.tag == 'table':
+                if 'Summary' not in tables:
+                    tables['Summary'] = element
+                for header in pending:
+                    tables[header] = element
+                pending = []
+                continue
+
+            if len(element) != 1 or element[0].tag != 'span' or \
+                    (element.text or '').strip():
+                continue
+
+            header = (element[0].tail or '').strip()
+            if header and header not in tables and header not in pending:
+                pending.append(header)
+
+        return(tables)
+
+    def panel(self, *headers):
+        """
+        Arguments:
+            headers: header(s) of the panel; the first one found on the page
+                     is returned
+
+        Return: (list) Rows of the panel as (name, value) pairs
+        """
+        for header in headers:
+            if header not in self.tables:
+                continue
+
+            if header not in self._panels:
+                self._panels[header] = list(
+                    iter_panel_rows(self.tables[header]))
+
+            return(self._panels[header])
+
+        raise KeyError('Panel not found: {}'.format(', '.join(headers)))
@@ -0,0 +1,217 @@
+"""
+Wait for browser downloads to complete: on Linux, with inotify (woken when
+the final file is closed after writing or renamed into place), elsewhere by
+polling the directory.
+"""
+import os
+import time
+import errno
+import select
+import struct
+import ctypes
+import ctypes.util
+from icsd.entry_parser import QueryerError
+
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+_EVENT = struct.Struct('iIII')  # wd, mask, cookie, len
+
+# suffixes of the files of downloads in progress
+PARTIAL_SUFFIXES = ('.crdownload', '.part', '.tmp')
+
+
+class DownloadTimeout(QueryerError):
+    pass
+
+
+def _load_inotify():
+    """
+    Return: (ctypes.CDLL) libc if it provides inotify, None otherwise
+    """
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6',
+                           use_errno=True)
+        libc.inotify_init1
+        libc.inotify_add_watch
+    except (OSError, AttributeError):
+        return(None)
+
+    return(libc)
+
+
+def _is_partial(name):
+    return(name.startswith('.') or name.endswith(PARTIAL_SUFFIXES))
+
+
+class DownloadWatcher(object):
+    """
+    Watch a download directory from the moment it is created, and wait for
+    files to be complete: present under their final name, with no download
+    in progress for them, and closed after writing or renamed into place
+    since (with inotify) or of a size that holds still (without). The files
+    present when the watcher is created are taken as complete.
+    """
+
+    def __init__(self, directory, timeout=100, poll=0.1, use_inotify=True):
+        """
+        Arguments:
+            directory: download directory
+
+        Keyword arguments:
+            timeout: (default: 100) default timeout of a wait in seconds
+            poll: (default: 0.1) seconds between two scans of the directory
+                  without inotify
+            use_inotify: (default: True) False to poll the directory even
+                         if inotify is available
+
+        Attributes:
+            inotify: whether inotify is used
+        """
+        self.directory = directory
+        self.timeout = timeout
+        self.poll = poll
+        self._existing = set(os.listdir(directory))
+        self._closed = set(self._existing)  # closed or moved in (inotify)
+        self._sizes = {}
+        self._fd = None
+
+        libc = _load_inotify() if use_inotify else None
+        if libc is not None:
+            fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+            if fd >= 0 and libc.inotify_add_watch(
+                    fd, os.fsencode(directory),
+                    IN_CLOSE_WRITE | IN_MOVED_TO) >= 0:
+                self._fd = fd
+            elif fd >= 0:
+                os.close(fd)
+
+        self.inotify = self._fd is not None
+
+    def _scan(self, names):
+        """
+        Return: (set) complete files of the directory among `names` (any new
+                file if None)
+        """
+        files = set(os.listdir(self.directory))
+        candidates = files - self._existing if names is None else \
+            files & names
+        complete = set()
+        for name in candidates:
+            if _is_partial(name) or \
+                    any(name + s in files for s in PARTIAL_SUFFIXES):
+                continue
+            if self.inotify:
+                if name in self._closed:
+                    complete.add(name)
+                continue
+
+            # without inotify, the size must hold still between two scans
+            try:
+                size = os.path.getsize(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            if self._sizes.get(name) == size:
+                complete.add(name)
+            self._sizes[name] = size
+
+        return(complete)
+
+    def _read_events(self, timeout):
+        """
+        Block until inotify reports events, or `timeout` seconds.
+
+        Return: (set) names of the files closed after writing or moved into
+                the directory
+        """
+        readable, _, _ = select.select([self._fd], [], [], max(timeout, 0))
+        if not readable:
+            return(set())
+
+        try:
+            data = os.read(self._fd, 65536)
+        except OSError as e:
+            if e.errno == errno.EAGAIN:
+                return(set())
+            raise
+
+        names = set()
+        offset = 0
+        while offset + _EVENT.size <= len(data):
+            _, mask, _, length = _EVENT.unpack_from(data, offset)
+            offset += _EVENT.size
+            name = data[offset:offset + length].rstrip(b'\0')
+            offset += length
+            if mask & (IN_CLOSE_WRITE | IN_MOVED_TO):
+                names.add(os.fsdecode(name))
+
+        return(names)
+
+    def iter_completed(self, names=None, timeout=None):
+        """
+        Yield the files as they complete.
+
+        Keyword arguments:
+            names: (default: None) file names to wait for (default: any file
+                   created after the watcher)
+            timeout: (default: None) seconds to wait for all of `names`
+                     (default: `self.timeout`)
+
+        Yield: (string) path of a complete file
+        """
+        if timeout is None:
+            timeout = self.timeout
+        if names is not None:
+            names = set(names)
+        deadline = time.monotonic() + timeout
+        done = set()
+
+        while True:
+            for name in sorted(self._scan(names) - done):
+                done.add(name)
+                self._existing.add(name)
+                self._closed.discard(name)
+                yield(os.path.join(self.directory, name))
+                if names is None:
+                    return
+
+            if names is not None and done >= names:
+                return
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                waiting = sorted(names - done) if names is not None \
+                    else ['a new file']
+                raise DownloadTimeout(
+                    'Download not complete after {} s: {}'.format(
+                        timeout, ', '.join(waiting)))
+
+            if self.inotify:
+                self._closed.update(self._read_events(min(remaining, 1.0)))
+            else:
+                time.sleep(min(remaining, self.poll))
+
+    def wait_for(self, names, timeout=None):
+        """
+        Wait until all the files are complete (see `iter_completed`).
+
+        Return: (list) paths of the files, in the order of `names`
+        """
+        list(self.iter_completed(names, timeout=timeout))
+        return([os.path.join(self.directory, name) for name in names])
+
+    def wait_for_new(self, timeout=None):
+        """
+        Wait until a file created after the watcher is complete.
+
+        Return: (string) path of the file
+        """
+        return(next(self.iter_completed(None, timeout=timeout)))
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
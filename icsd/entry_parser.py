@@ -0,0 +1,258 @@
+import sys
+import time
+from icsd import crawler_version
+from icsd.detailed_view import DetailedViewPage
+from icsd.instrumentation import timed
+from icsd.extraction import EXTRACTION_PLAN, parse_cell_parameters
+
+
+class QueryerError(Exception):
+    pass
+
+
+class HitCountMismatch(QueryerError):
+    """
+    The 'Detailed View' did not load as many entries as the query hits.
+    """
+    pass
+
+
+class EntryParser(object):
+    """
+    Base class to parse the fields of an entry from the HTML source of the
+    'Detailed View' page.
+
+    Subclasses provide the page source by implementing `get_page_source`:
+    `Queryer` takes it from the live WebDriver session, while
+    `icsd.reparse.SavedPage` reads the `source.html` saved during a crawl.
+    The source is parsed once into `page` (`DetailedViewPage`), from which
+    the fields are extracted until `invalidate_page` is called for the next
+    entry.
+
+    The queryers (`Queryer`, `icsd.http_queryer.HttpQueryer`) share
+    `parse_entry` and `parse_entries`, and only implement the navigation of
+    their engine: `_get_number_of_entries_loaded`, `_go_to_next_entry`,
+    `get_snapshot`, `_open_cif_fetcher` and `quit`.
+    """
+
+    # whether the assets of the pages are blocked, noted in the report of
+    # the data transferred (see `parse_entries`)
+    lean_session = False
+
+    def __init__(self):
+        self._page = None
+
+    def get_page_source(self):
+        """
+        Return: (string) HTML source of the current 'Detailed View' page
+        """
+        raise NotImplementedError
+
+    @property
+    def page(self):
+        """
+        Return: (DetailedViewPage) the current 'Detailed View' page
+        """
+        if self._page is None:
+            self._page = self._load_page()
+
+        return(self._page)
+
+    def _load_page(self):
+        """
+        Return: (DetailedViewPage) the current page, from `get_page_source`
+        """
+        return(DetailedViewPage(self.get_page_source()))
+
+    def invalidate_page(self):
+        """
+        Discard the parsed page, e.g., after moving on to the next entry.
+        """
+        self._page = None
+
+    def parse_fields(self, timings=None):
+        """
+        Parse all `tags.ICSD_PARSE_TAGS` + the ICSD Collection Code for the
+        current entry, and construct a dictionary `parsed_data` with tag:value.
+
+        The tags are resolved by the extraction plan compiled from
+        `tags/parse_tags.yml` (see `icsd.extraction`).
+
+        Keyword arguments:
+            timings: (default: None) dictionary to record the time (in
+                     seconds) spent on building the page ("page"), on each
+                     panel and on each field
+
+        Return: (dict) `parsed_data` with [tag]:[parsed value]
+        """
+        start = time.perf_counter()
+        page = self.page
+        if timings is not None:
+            timings['page'] = time.perf_counter() - start
+
+        parsed_data = {}
+        start = time.perf_counter()
+        parsed_data['collection_code'] = self.get_collection_code()
+        if timings is not None:
+            timings['collection_code'] = time.perf_counter() - start
+
+        parsed_data.update(EXTRACTION_PLAN.extract(page, timings=timings))
+
+        start = time.perf_counter()
+        parsed_data['ICSD_version'] = self._get_icsd_ver()
+        if timings is not None:
+            timings['ICSD_version'] = time.perf_counter() - start
+        parsed_data['crawler_version'] = crawler_version()
+
+        return(parsed_data)
+
+    def get_field(self, tag):
+        """
+        Parse a single tag of `tags.ICSD_PARSE_TAGS` for the current entry.
+
+        Return: parsed value
+        """
+        return(EXTRACTION_PLAN.extract(self.page, fields=[tag])[tag])
+
+    def _get_icsd_ver(self):
+        return(self.page.version or "")
+
+    def _parse_collection_code(self, titles):
+        """
+        Parse the ICSD Collection Code from the texts of the 'title'
+        ('display_main') elements.
+
+        Arguments:
+            titles: list of the element texts
+
+        Return: (integer) ICSD Collection Code if found, None otherwise
+        """
+        for title in titles:
+            if 'Summary' in title:
+                if len(title.split()) > 21:
+                    code = title.split()[21]
+                    if code.isdigit():
+                        return(int(code))
+
+        return(None)
+
+    def get_collection_code(self):
+        """
+        Locate 'title' elements, parse the ICSD Collection
+        Code from the element text and raise Error if unsuccessful.
+
+        Return: (integer) ICSD Collection Code
+        """
+        code = self._parse_collection_code(self.page.titles)
+        if code is None:
+            raise QueryerError('Failed to parse the ICSD Collection Code.')
+
+        return(code)
+
+    def parse_cell_parameters(self, raw_text):
+        return(parse_cell_parameters(raw_text))
+
+    @timed('wait')
+    def _sleep(self, seconds):
+        time.sleep(seconds)
+
+    def parse_entry(self):
+        """
+        Pause for `interval` seconds, and parse the current entry (see
+        `parse_fields`), recording the time spent on each field if
+        instrumented.
+
+        Return: (dict) `parsed_data` with [tag]:[parsed value]
+        """
+        if self.interval:
+            self._sleep(self.interval)
+
+        self.n_entries_parsed += 1
+        if self.instrumentation is None:
+            return(self.parse_fields())
+
+        timings = {}
+        parsed_data = self.parse_fields(timings=timings)
+        for name, seconds in timings.items():
+            self.instrumentation.record('field', name, seconds)
+
+        return(parsed_data)
+
+    def _open_cif_fetcher(self):
+        """
+        Return: (CIFFetcher) fetcher downloading the CIFs over HTTP in the
+                background (see `icsd.cif_fetcher`), None if the CIFs are
+                downloaded otherwise
+        """
+        return(None)
+
+    def _parse_all_entries(self):
+        """
+        Parse and save all the entries in stages (see `icsd.pipeline`).
+
+        Return: (list) A list of ICSD Collection Codes of entries parsed
+        """
+        from icsd.pipeline import EntryPipeline
+
+        pipeline = EntryPipeline(self, parse_workers=self.parse_workers)
+        try:
+            return(pipeline.run(self.hits))
+        except Exception:
+            self.quit()
+            raise
+
+    def parse_entries(self, quit=True):
+        """
+        Parse and save all the entries resulting from the query (see
+        `_parse_all_entries`), the CIFs being downloaded in the background
+        by `cif_fetcher` if any, and report the data transferred per entry.
+
+        Raise `HitCountMismatch` if the number of entries loaded is not equal
+        to `hits`.
+
+        Keyword arguments:
+            quit: (default: True) whether the session is closed at the end
+                  (False to keep it for the next query, see
+                  `icsd.session.CrawlSession`)
+
+        Return: (list) A list of ICSD Collection Codes of entries parsed
+                (but those whose CIF failed to download)
+        """
+        hit_number = self._get_number_of_entries_loaded()
+        if hit_number != self.hits:
+            self.quit()
+            error_message = '# Hits ({0}) != # Entries: ({1}) in Detailed View'.format(
+                hit_number, self.hits)
+            raise HitCountMismatch(error_message)
+
+        sys.stdout.write('Parsing all the entries... \n')
+        sys.stdout.flush()
+        if self.skipcif == False and self.cif_fetcher is None:
+            self.cif_fetcher = self._open_cif_fetcher()
+
+        entries_parsed = self._parse_all_entries()
+
+        if self.cif_fetcher is not None:
+            errors = self.cif_fetcher.wait()
+            for code, error in sorted(errors.items()):
+                sys.stdout.write('CIF of {} not saved, to be crawled again: '
+                                 '{}\n'.format(code, error))
+            sys.stdout.flush()
+            entries_parsed = [c for c in entries_parsed if c not in errors]
+
+        if self.instrumentation is not None:
+            self.instrumentation.dump(self.instrumentation_file)
+
+        if self.n_entries_parsed:
+            sys.stdout.write('Transferred {:.1f} kB per entry{}.\n'.format(
+                self.n_bytes_transferred / 1e3 / self.n_entries_parsed,
+                ' (lean session)' if self.lean_session else ''))
+
+        if not quit:
+            return(entries_parsed)
+
+        sys.stdout.write('Closing the session and exiting...')
+        sys.stdout.flush()
+        self.quit()
+        sys.stdout.write(' done.\n')
+        return(entries_parsed)
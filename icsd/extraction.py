@@ -0,0 +1,215 @@
+"""
+Compile the field specification in `tags/parse_tags.yml` into a flat
+extraction plan, resolved in one sweep over the rows of the panels of a
+'Detailed View' page.
+"""
+import time
+from tags import ICSD_PARSE_SPEC
+
+
+def parse_cell_parameters(raw_text):
+    raw_text = raw_text.strip()
+    raw_text = raw_text.replace(" (", "(")
+
+    a, b, c, alpha, beta, gamma = [float(e.split('(')[0].strip('.')) for e
+                                   in raw_text.split()]
+
+    assert a > 0
+    assert b > 0
+    assert c > 0
+    assert alpha > 0
+    assert beta > 0
+    assert gamma > 0
+    assert alpha < 180
+    assert beta < 180
+    assert gamma < 180
+
+    cell_parameters = {'a': a, 'b': b, 'c': c, 'alpha': alpha, 'beta': beta,
+                       'gamma': gamma}
+    return(cell_parameters)
+
+
+def clean_reference_string(r):
+    """
+    Strip the reference string of unrelated text.
+
+    Arguments:
+        r: Reference string to be cleaned
+
+    Return: (string) r, stripped
+    """
+    r = r.strip()
+    r = r.replace('Northwestern University Library', '').strip()
+    r = r.replace('\n', ' ')
+    return(r)
+
+
+def _text(values):
+    return('\n'.join(values).strip())
+
+
+def _oneline(values):
+    return(_text(values).replace('\n', ' '))
+
+
+def _unbracket(values):
+    return(_text(values).replace("[", "").replace("]", "").strip())
+
+
+def _space_group(values):
+    return(_text(values).replace(" (", "(").strip())
+
+
+def _volume(values):
+    return(float(_text(values).split()[0]))
+
+
+def _integer(values):
+    return(int(_text(values)))
+
+
+def _r_value(values):
+    if len(values) == 0:
+        return(None)
+
+    return(float(_text(values).split("(")[0]))
+
+
+def _reference(values):
+    if len(values) == 0:
+        return("")
+
+    return(clean_reference_string(values[0]))
+
+
+# Value transforms: list of the values of the matching rows -> field value
+TRANSFORMS = {
+    'text': _text,
+    'oneline': _oneline,
+    'unbracket': _unbracket,
+    'space_group': _space_group,
+    'cell_parameters': lambda values: parse_cell_parameters(_text(values)),
+    'volume': _volume,
+    'integer': _integer,
+    'r_value': _r_value,
+    'reference': _reference,
+    'list': list,
+}
+
+
+class ExtractionPlan(object):
+    """
+    Flat list of (field, resolver) compiled once from the field
+    specification (see `tags/parse_tags.yml`). Each resolver looks up the
+    values of a single (panel, row) in the rows collected from the page.
+    """
+
+    def __init__(self, spec):
+        """
+        Arguments:
+            spec: dictionary of field:specification
+        """
+        self.fields = []
+        self.panels = []
+        for field, field_spec in spec.items():
+            self.fields.append((field, self._compile(field, field_spec)))
+
+    def _panel_key(self, panel):
+        """
+        Register the panel headers, and return them as a hashable key.
+        """
+        if isinstance(panel, str):
+            panel = [panel]
+
+        key = tuple(panel)
+        if key not in self.panels:
+            self.panels.append(key)
+
+        return(key)
+
+    def _compile(self, field, spec):
+        """
+        Return: (function) rows -> field value, where rows is a dictionary
+                (panel key, row name):[values]
+        """
+        if 'constant' in spec:
+            constant = spec['constant']
+            return(lambda rows: constant)
+
+        if 'any' in spec:
+            resolvers = [self._compile(field, s) for s in spec['any']]
+            return(lambda rows: any(r(rows) for r in resolvers))
+
+        key = (self._panel_key(spec['panel']), spec['row'])
+
+        if 'equals' in spec:
+            text = spec['equals']
+            return(lambda rows: text in rows.get(key, []))
+
+        if 'contains' in spec:
+            text = spec['contains']
+            return(lambda rows: any(text in v for v in rows.get(key, [])))
+
+        if 'present' in spec:
+            return(lambda rows: key in rows)
+
+        transform_name = spec.get('transform', 'text')
+        if transform_name not in TRANSFORMS:
+            raise ValueError('Unknown transform "{}" for "{}"'.format(
+                transform_name, field))
+
+        transform = TRANSFORMS[transform_name]
+        return(lambda rows: transform(rows.get(key, [])))
+
+    def collect_rows(self, page, timings=None):
+        """
+        Sweep once over the rows of all the panels the plan needs.
+
+        Arguments:
+            page: `DetailedViewPage` of the entry
+            timings: (default: None) dictionary to record the time (in
+                     seconds) spent on each panel, as "panel:[header]"
+
+        Return: (dict) (panel key, row name):[values]
+        """
+        rows = {}
+        for key in self.panels:
+            start = time.perf_counter()
+            try:
+                panel = page.panel(*key)
+            except KeyError:
+                continue
+
+            for name, value in panel:
+                rows.setdefault((key, name), []).append(value)
+
+            if timings is not None:
+                timings['panel:{}'.format(key[0])] = \
+                    time.perf_counter() - start
+
+        return(rows)
+
+    def extract(self, page, fields=None, timings=None):
+        """
+        Arguments:
+            page: `DetailedViewPage` of the entry
+            fields: (default: None) only extract these fields
+            timings: (default: None) dictionary to record the time (in
+                     seconds) spent on each panel (see `collect_rows`) and
+                     each field
+
+        Return: (dict) field:value
+        """
+        rows = self.collect_rows(page, timings=timings)
+        parsed_data = {}
+        for field, resolve in self.fields:
+            if fields is None or field in fields:
+                start = time.perf_counter()
+                parsed_data[field] = resolve(rows)
+                if timings is not None:
+                    timings[field] = time.perf_counter() - start
+
+        return(parsed_data)
+
+
+EXTRACTION_PLAN = ExtractionPlan(ICSD_PARSE_SPEC)
@@ -0,0 +1,312 @@
+"""
+Browserless alternative to `Queryer`: the same steps (query, 'List View',
+select all, 'Detailed View', next entry) are replayed as the JSF/PrimeFaces
+form submissions and ajax requests the browser would send (see `icsd.jsf`),
+so that a session costs an HTTP connection instead of a Chrome process.
+"""
+import sys
+from lxml import html
+from tags import ICSD_QUERY_TAGS
+from icsd.entry_parser import EntryParser, QueryerError
+from icsd.detailed_view import DetailedViewPage
+from icsd.instrumentation import Instrumentation
+from icsd.jsf import JSFSession, JSFError
+from icsd.cif_fetcher import CIFFetcher, cif_url_for
+
+
+DEFAULT_URL = 'https://icsd.fiz-karlsruhe.de/search/basic.xhtml'
+
+# labels of the "Content Selection" boxes checked for each structure source,
+# in addition to the experimental inorganic structures
+STRUCTURE_SOURCE_LABELS = {
+    'E': [],
+    'T': ['Theoretical structures'],
+    'A': ['Theoretical structures', 'Experim. metal-organic str.'],
+}
+
+
+class HttpQueryer(EntryParser):
+    """
+    Query the ICSD web interface over HTTP, without a browser, behind the
+    interface of `Queryer` (`post_query_to_form`, `_click_select_all`,
+    `_click_show_detailed_view`, `parse_entries`, `perform_icsd_query`).
+
+    The pages are expected to be rendered by the server as a browser would
+    display them, with the panels of the 'Detailed View' expanded; no
+    screenshot can be taken.
+    """
+
+    def __init__(self,
+                 url=None,
+                 query=None,
+                 structure_source='E',
+                 instrument=False,
+                 timeout=60):
+        """
+        Load the URL, and check if the "Basic Search" page has loaded.
+
+        Keyword arguments:
+            url: URL of the search page
+            query: query to be posted to the webform (see `Queryer`)
+            structure_source: "E"/"T"/"A" for experimental/theoretical/all
+                              structures (Default: "E")
+            instrument: whether the time spent on each parsed field and HTTP
+                        request is recorded and summarized (into
+                        `instrumentation_file`) when `parse_entries` finishes
+                        (Default: False)
+            timeout: seconds to wait for the server (Default: 60)
+
+        Attributes:
+            http: `JSFSession` holding the current page
+            hits: number of search hits for the query
+            interval: seconds to pause before parsing each entry (Default: 0)
+            n_entries_parsed: number of entries parsed
+            cif_url: URL of the CIF of an entry, on the server of `url` (see
+                     `icsd.cif_fetcher`)
+            cif_fetcher: `CIFFetcher` downloading the CIFs
+            journal_cursor: `JournalCursor` recording the entries saved
+                            (see `icsd.journal`), None if not journaled
+            parse_workers: number of parser threads (see `icsd.pipeline`)
+        """
+        super(HttpQueryer, self).__init__()
+
+        self.url = url or DEFAULT_URL
+        self.query = query or {}
+        structure_source = (structure_source or 'A').upper()[:1]
+        if structure_source not in STRUCTURE_SOURCE_LABELS:
+            structure_source = 'A'
+        self.structure_source = structure_source
+
+        self.skipcif = True
+        self.save_screenshot = False
+        self.save_source = True
+        self.hits = 0
+        self.interval = 0
+        self.n_entries_parsed = 0
+
+        self.cif_url = cif_url_for(self.url)
+        self.cif_fetcher = None
+        self.journal_cursor = None
+        self.parse_workers = 2
+
+        self.instrumentation = Instrumentation() if instrument else None
+        self.instrumentation_file = 'instrumentation.json'
+
+        self.http = JSFSession(timeout=timeout,
+                               instrumentation=self.instrumentation)
+        try:
+            self.http.get(self.url)
+        except JSFError:
+            self.quit()
+            raise
+        self._check_basic_search()
+
+    @property
+    def n_bytes_transferred(self):
+        return(self.http.n_bytes_transferred)
+
+    def _title_texts(self):
+        return([' '.join(title.text_content().split()) for title in
+                self.http.tree.xpath('//*[@id="display_main"]')])
+
+    def _check_basic_search(self):
+        """
+        Raise Error if the Search Panel header does not read 'Basic Search'.
+        """
+        header = self.http.element('content_form:mainSearchPanel_header')
+        if header is None or 'Basic Search' not in header.text_content():
+            self.quit()
+            error_message = 'Failed to load Basic Search & Retrieve'
+            raise QueryerError(error_message)
+
+    def _check_box_labelled(self, text):
+        labels = self.http.tree.xpath(
+            '//label[contains(normalize-space(.), $text)]', text=text)
+        if not labels or not labels[0].get('for'):
+            raise QueryerError('No "{}" box in Content Selection'.format(
+                text))
+        self.http.check(labels[0].get('for'))
+
+    def select_structure_source(self):
+        """
+        Check the boxes of the "Content Selection" panel for the structure
+        source; they are submitted with the query.
+        """
+        for text in STRUCTURE_SOURCE_LABELS[self.structure_source]:
+            self._check_box_labelled(text)
+
+    def post_query_to_form(self):
+        """
+        Fill the fields of the query (IDs in `tags.ICSD_QUERY_TAGS`) and run
+        the query. (Also check if the 'List View' page has been loaded.)
+        """
+        if not self.query:
+            self.quit()
+            error_message = 'Empty query'
+            raise QueryerError(error_message)
+
+        sys.stdout.write('Querying the ICSD for\n')
+        for k, v in self.query.items():
+            self.http.set_field(ICSD_QUERY_TAGS[k], v)
+            sys.stdout.write('\t{} = "{}"\n'.format(k, v))
+            sys.stdout.flush()
+
+        self._run_query()
+        self._check_list_view()
+
+    def _run_query(self):
+        """
+        Submit the search form with the 'Run Query' button.
+        """
+        self.http.submit('content_form', button='content_form:btnRunQuery')
+
+    def _check_list_view(self):
+        """
+        Raise Error if the 'List View' is not loaded; parse the number of
+        hits for the query from its title into `self.hits`.
+        """
+        titles = self._title_texts()
+        if not titles:
+            self.quit()
+            error_message = 'No hits/too many hits. Modify your query.'
+            raise QueryerError(error_message)
+        if 'List View' not in titles[0]:
+            self.quit()
+            error_message = 'Failed to load "List View" of results'
+            raise QueryerError(error_message)
+
+        self.hits = int(titles[0].split()[6])
+        sys.stdout.write('The query yielded ')
+        sys.stdout.write('{} hits.\n'.format(self.hits))
+        sys.stdout.flush()
+
+    def _click_select_all(self):
+        """
+        Select all the rows of the 'List View' table (the ajax request of
+        its 'Select All' box).
+        """
+        table = 'display_form:listViewTable'
+        self.http.ajax('display_form', table, execute=table, render=table,
+                       event='toggleSelect',
+                       params={table + '_selection': '@all',
+                               table + '_checked': 'true'})
+
+    def show_list_page(self, page, rows=50):
+        """
+        Show a page of the 'List View' table (the ajax request of its
+        paginator).
+
+        Arguments:
+            page: index of the page, from 0
+
+        Keyword arguments:
+            rows: (default: 50) number of rows per page
+        """
+        table = 'display_form:listViewTable'
+        self.http.ajax('display_form', table, execute=table, render=table,
+                       event='page',
+                       params={table + '_pagination': 'true',
+                               table + '_first': str(page * rows),
+                               table + '_rows': str(rows),
+                               table + '_encodeFeature': 'true'})
+        self.invalidate_page()
+
+    def _click_show_detailed_view(self):
+        """
+        Submit the 'List View' with the 'Show Detailed View' button, and
+        check the 'Detailed View' is loaded.
+        """
+        buttons = self.http.tree.xpath(
+            '//button[contains(., "Show Detailed View")]')
+        if not buttons:
+            self.quit()
+            error_message = 'No "Show Detailed View" button in the List View'
+            raise QueryerError(error_message)
+
+        button = buttons[0].get('name') or buttons[0].get('id')
+        self.http.submit('display_form', button=button)
+        self.invalidate_page()
+        self._check_detailed_view()
+
+    def _check_detailed_view(self):
+        if not any('Detailed View' in t for t in self._title_texts()):
+            self.quit()
+            error_message = 'Failed to load "Detailed View" of results'
+            raise QueryerError(error_message)
+
+    def _get_number_of_entries_loaded(self):
+        for title in self._title_texts():
+            if 'Detailed View' in title:
+                return(int(title.split()[5]))
+
+        return(None)
+
+    def _go_to_next_entry(self):
+        """
+        Send the ajax request of the 'Next' button, which renders the next
+        entry into the form.
+        """
+        self.http.ajax('display_form', 'display_form:buttonNext',
+                       execute='@this', render='display_form')
+        self.invalidate_page()
+
+    def get_page_source(self):
+        return(self.http.source)
+
+    def _load_page(self):
+        return(DetailedViewPage(self.get_page_source()))
+
+    def get_html_table(self, idx):
+        """
+        Return: (string) HTML of the `idx`-th table of the current page
+        """
+        table = self.http.tree.xpath('//table')[idx]
+        return(html.tostring(table, encoding='unicode', with_tail=False))
+
+    def new_search(self):
+        """
+        Go back to the 'Basic Search & Retrieve' form, with the boxes of the
+        structure source checked.
+        """
+        self.invalidate_page()
+        self.http.get(self.url)
+        self._check_basic_search()
+        self.select_structure_source()
+
+    def get_snapshot(self):
+        """
+        Return: (dict) snapshot of the current entry for `icsd.pipeline`,
+                the whole page in "source"
+        """
+        return({'source': self.get_page_source()})
+
+    def _open_cif_fetcher(self):
+        """
+        Return: (CIFFetcher) fetcher downloading the CIFs over HTTP with the
+                cookies of the session
+        """
+        return(CIFFetcher(url=self.cif_url, cookies=self.http.cookies(),
+                          headers=dict(self.http.session.headers)))
+
+    def parse_selection(self, quit=True):
+        """
+        Parse all the entries selected in the 'List View' (see
+        `parse_entries`).
+        """
+        self._click_show_detailed_view()
+        return(self.parse_entries(quit=quit))
+
+    def quit(self):
+        if self.cif_fetcher is not None:
+            self.cif_fetcher.close()
+            self.cif_fetcher = None
+        self.http.close()
+
+    def perform_icsd_query(self):
+        """
+        Post the query to form, parse data for all the entries. (wrapper)
+        """
+        self.select_structure_source()
+        self.post_query_to_form()
+        self._click_select_all()
+        return(self.parse_selection())
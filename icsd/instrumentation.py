@@ -0,0 +1,219 @@
+"""
+Opt-in timing of a crawl: parsed fields, wait helpers and WebDriver
+commands, aggregated into histograms over a run.
+"""
+import sys
+import json
+import time
+import bisect
+import functools
+import threading
+from contextlib import contextmanager
+
+
+# upper bounds of the histogram buckets in seconds: 0.1 ms, 0.2 ms, ... ~55 s
+BUCKETS = [1e-4 * 2 ** i for i in range(20)]
+
+
+class Histogram(object):
+    """
+    Log-scale histogram of durations.
+    """
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, q):
+        """
+        Return: (float) upper bound of the bucket holding the q-th percentile
+        """
+        rank = q / 100.0 * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank and n > 0:
+                return(min(BUCKETS[i], self.max) if i < len(BUCKETS)
+                       else self.max)
+
+        return(self.max)
+
+    def summary(self):
+        return({
+            'count': self.count,
+            'total': self.total,
+            'mean': self.total / self.count if self.count else 0.0,
+            'p50': self.percentile(50),
+            'p90': self.percentile(90),
+            'p99': self.percentile(99),
+            'max': self.max,
+            # upper bound of the bucket in seconds: count
+            'buckets': dict(('{:g}'.format(bound), n) for bound, n
+                            in zip(BUCKETS + [float('inf')], self.counts)
+                            if n > 0),
+        })
+
+
+class Instrumentation(object):
+    """
+    Histograms of durations, keyed by (category, name), e.g.
+    ('field', 'cell_parameters'), ('wait', 'wait_for_ajax') or
+    ('webdriver', 'find_element_by_id').
+    """
+
+    def __init__(self):
+        self.histograms = {}
+        self._lock = threading.Lock()
+
+    def record(self, category, name, seconds):
+        key = (category, name)
+        with self._lock:
+            if key not in self.histograms:
+                self.histograms[key] = Histogram()
+
+            self.histograms[key].add(seconds)
+
+    @contextmanager
+    def timer(self, category, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(category, name, time.perf_counter() - start)
+
+    def summary(self):
+        """
+        Return: (dict) category:{name:histogram summary}
+        """
+        summary = {}
+        for (category, name), histogram in sorted(self.histograms.items()):
+            summary.setdefault(category, {})[name] = histogram.summary()
+
+        return(summary)
+
+    def format_table(self):
+        """
+        Return: (string) Histograms as a table, the most expensive first
+        """
+        lines = ['{:<10} {:<40} {:>8} {:>10} {:>10} {:>10} {:>10}'.format(
+            'category', 'name', 'count', 'total [s]', 'mean [ms]',
+            'p90 [ms]', 'max [ms]')]
+        items = sorted(self.histograms.items(), key=lambda x: -x[1].total)
+        for (category, name), h in items:
+            lines.append(
+                '{:<10} {:<40} {:>8} {:>10.3f} {:>10.2f} {:>10.2f} {:>10.2f}'
+                .format(category, name, h.count, h.total,
+                        1e3 * h.total / h.count, 1e3 * h.percentile(90),
+                        1e3 * h.max))
+
+        return('\n'.join(lines))
+
+    def dump(self, json_file='instrumentation.json'):
+        """
+        Write the summary into `json_file`, and print it as a table.
+        """
+        with open(json_file, 'w') as fw:
+            json.dump(self.summary(), fw, indent=2)
+
+        sys.stdout.write(self.format_table() + '\n')
+        sys.stdout.flush()
+
+
+def timed(category, name=None):
+    """
+    Decorator timing a method of an object with an `instrumentation`
+    attribute, when the attribute is set.
+    """
+    def decorator(method):
+        label = name or method.__name__
+
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            if self.instrumentation is None:
+                return(method(self, *args, **kwargs))
+
+            with self.instrumentation.timer(category, label):
+                return(method(self, *args, **kwargs))
+
+        return(wrapper)
+
+    return(decorator)
+
+
+def _unwrap(value):
+    if isinstance(value, InstrumentedElement):
+        return(value._element)
+    if isinstance(value, (list, tuple)):
+        return(type(value)(_unwrap(v) for v in value))
+    return(value)
+
+
+class _Instrumented(object):
+    """
+    Proxy timing every method call of the wrapped object as a 'webdriver'
+    command. Returned web elements are wrapped as well, so that their
+    commands (`get_attribute`, `click`, ...) are timed too.
+    """
+
+    _prefix = ''
+
+    def __init__(self, wrapped, instrumentation):
+        object.__setattr__(self, '_wrapped', wrapped)
+        object.__setattr__(self, '_instrumentation', instrumentation)
+
+    def _wrap_result(self, value):
+        if hasattr(value, 'get_attribute') and hasattr(value, 'click'):
+            return(InstrumentedElement(value, self._instrumentation))
+        if isinstance(value, list):
+            return([self._wrap_result(v) for v in value])
+        return(value)
+
+    def __getattr__(self, name):
+        attribute = getattr(self._wrapped, name)
+        if not callable(attribute) or name.startswith('_'):
+            return(attribute)
+
+        @functools.wraps(attribute)
+        def command(*args, **kwargs):
+            args = _unwrap(args)
+            kwargs = dict((k, _unwrap(v)) for k, v in kwargs.items())
+            with self._instrumentation.timer('webdriver', self._prefix + name):
+                result = attribute(*args, **kwargs)
+            return(self._wrap_result(result))
+
+        return(command)
+
+    def __setattr__(self, name, value):
+        setattr(self._wrapped, name, value)
+
+
+class InstrumentedElement(_Instrumented):
+    _prefix = 'element.'
+
+    @property
+    def _element(self):
+        return(self._wrapped)
+
+    @property
+    def text(self):
+        with self._instrumentation.timer('webdriver', 'element.text'):
+            return(self._wrapped.text)
+
+
+class InstrumentedDriver(_Instrumented):
+    """
+    WebDriver timing each of its commands (see `_Instrumented`).
+    """
+
+    @property
+    def page_source(self):
+        with self._instrumentation.timer('webdriver', 'page_source'):
+            return(self._wrapped.page_source)
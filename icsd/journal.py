@@ -0,0 +1,181 @@
+"""
+Journal of the queries of a crawl: each query of code ranges, each entry
+saved from its 'Detailed View' and the end of the query are appended to a
+JSON Lines file as they happen. After a failure (or a restart), an
+unfinished query resumes after its last entry saved, instead of walking the
+'Detailed View' from its first entry again.
+"""
+import os
+import json
+import threading
+
+
+class JournalCursor(object):
+    """
+    Progress of the query of code ranges through its 'Detailed View'.
+    """
+
+    def __init__(self, journal, code_ranges, hits):
+        """
+        Arguments:
+            journal: `CrawlJournal` the progress is recorded into
+            code_ranges: ranges (first, last) of ICSD Collection Codes queried
+            hits: number of entries in the 'Detailed View'
+
+        Attributes:
+            codes: {index in the 'Detailed View': ICSD Collection Code} of
+                   the entries saved
+            finished: whether the query is over
+        """
+        self.journal = journal
+        self.code_ranges = tuple(tuple(r) for r in code_ranges)
+        self.hits = hits
+        self.codes = {}
+        self.finished = False
+
+    @property
+    def next_index(self):
+        """
+        Return: (int) index of the first entry not saved (the entries are
+                saved out of order by the parser threads)
+        """
+        index = 0
+        while index in self.codes:
+            index += 1
+        return(index)
+
+    def record(self, index, code):
+        """
+        Record the entry at `index` of the 'Detailed View' as saved.
+        """
+        self.journal._append({'event': 'entry', 'ranges': self.code_ranges,
+                              'index': index, 'code': int(code)})
+        self.codes[index] = int(code)
+        if self.journal.state is not None:
+            self.journal.state.mark_crawled([code])
+
+    def finish(self):
+        """
+        Record the end of the query: all its entries have been saved, or it
+        is superseded by the query of its remaining codes.
+        """
+        self.journal._append({'event': 'finish', 'ranges': self.code_ranges})
+        self.finished = True
+
+    def remaining_ranges(self):
+        """
+        Return: (tuple) ranges (first, last) of the codes after the last
+                entry saved (the entries are listed by increasing Collection
+                Code), all the ranges if the saved entries are not in order,
+                None if all the entries are saved or no code is left
+        """
+        n_saved = self.next_index
+        if n_saved >= self.hits:
+            return(None)
+        if n_saved == 0:
+            return(self.code_ranges)
+
+        saved = [self.codes[i] for i in range(n_saved)]
+        if saved != sorted(saved):
+            return(self.code_ranges)
+
+        # no code is left once the last one of the ranges is saved
+        remaining = tuple((max(first, saved[-1] + 1), last)
+                          for first, last in self.code_ranges
+                          if last > saved[-1])
+        return(remaining or None)
+
+
+class CrawlJournal(object):
+    """
+    Append-only journal of the queries of a crawl, shared by its workers.
+    The finished queries are dropped from the file when it is loaded.
+    """
+
+    def __init__(self, path, state=None):
+        """
+        Load the unfinished queries of the journal at `path` (if any).
+
+        Arguments:
+            path: JSON Lines file of the journal
+
+        Keyword arguments:
+            state: (default: None) `StateIndex` the entries saved are marked
+                   as crawled in (see `icsd.state_index`)
+
+        Attributes:
+            cursors: {code ranges: `JournalCursor`} of the unfinished queries
+        """
+        self.path = path
+        self.state = state
+        self.cursors = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+
+        with open(self.path) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # the last line of a crawl killed while writing it
+                    continue
+                code_ranges = tuple(tuple(r) for r in record['ranges'])
+                if record['event'] == 'query':
+                    self.cursors[code_ranges] = JournalCursor(
+                        self, code_ranges, record['hits'])
+                elif code_ranges not in self.cursors:
+                    continue
+                elif record['event'] == 'entry':
+                    self.cursors[code_ranges].codes[record['index']] = \
+                        record['code']
+                elif record['event'] == 'finish':
+                    del self.cursors[code_ranges]
+
+        self._compact()
+
+    def _compact(self):
+        part = '{}.part'.format(self.path)
+        with open(part, 'w') as fw:
+            for cursor in self.cursors.values():
+                fw.write(json.dumps({'event': 'query',
+                                     'ranges': cursor.code_ranges,
+                                     'hits': cursor.hits}) + '\n')
+                for index, code in sorted(cursor.codes.items()):
+                    fw.write(json.dumps({'event': 'entry',
+                                         'ranges': cursor.code_ranges,
+                                         'index': index,
+                                         'code': code}) + '\n')
+        os.replace(part, self.path)
+
+    def _append(self, record):
+        with self._lock:
+            if record['event'] == 'finish':
+                self.cursors.pop(record['ranges'], None)
+            with open(self.path, 'a') as fw:
+                fw.write(json.dumps(record) + '\n')
+
+    def begin(self, code_ranges, hits):
+        """
+        Record the query of the ranges (first, last) of codes `code_ranges`,
+        with `hits` entries.
+
+        Return: (JournalCursor) cursor recording the entries saved
+        """
+        cursor = JournalCursor(self, code_ranges, hits)
+        self._append({'event': 'query', 'ranges': cursor.code_ranges,
+                      'hits': hits})
+        with self._lock:
+            self.cursors[cursor.code_ranges] = cursor
+        return(cursor)
+
+    def unfinished(self):
+        """
+        Return: (list) `JournalCursor`s of the unfinished queries, by code
+                ranges
+        """
+        with self._lock:
+            return([self.cursors[r] for r in sorted(self.cursors)])
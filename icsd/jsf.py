@@ -0,0 +1,319 @@
+"""
+Client side of the JSF/PrimeFaces form protocol over plain HTTP: full form
+submissions, and ajax requests whose partial responses (XML) are applied to
+the current document, as the browser would, while the
+`javax.faces.ViewState` of the forms is kept up to date.
+"""
+import time
+from urllib.parse import urljoin
+import requests
+from requests.adapters import HTTPAdapter
+from lxml import etree, html
+from icsd.entry_parser import QueryerError
+
+
+VIEW_STATE = 'javax.faces.ViewState'
+
+# headers of the ajax requests of PrimeFaces
+AJAX_HEADERS = {
+    'Faces-Request': 'partial/ajax',
+    'X-Requested-With': 'XMLHttpRequest',
+    'Accept': 'application/xml, text/xml, */*; q=0.01',
+}
+
+
+class JSFError(QueryerError):
+    """
+    Attributes:
+        status: HTTP status of the response, None if there is none
+    """
+
+    def __init__(self, message, status=None):
+        super(JSFError, self).__init__(message)
+        self.status = status
+
+
+class JSFSession(object):
+    """
+    HTTP session holding the current JSF document, like a browser tab.
+    """
+
+    def __init__(self, headers=None, timeout=60, instrumentation=None):
+        """
+        Keyword arguments:
+            headers: (default: None) dictionary of HTTP headers to send
+            timeout: (default: 60) seconds to wait for the server
+            instrumentation: (default: None) `Instrumentation` to record the
+                             requests into, as ('http', [name])
+
+        Attributes:
+            url: URL of the current document
+            tree: current document (lxml element)
+            n_requests: number of HTTP requests sent
+            n_bytes_transferred: bytes of the responses received
+        """
+        self.timeout = timeout
+        self.instrumentation = instrumentation
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=1)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        if headers:
+            self.session.headers.update(headers)
+
+        self.url = None
+        self.tree = None
+        self._source = None
+        self.n_requests = 0
+        self.n_bytes_transferred = 0
+
+    @property
+    def source(self):
+        """
+        Return: (string) HTML source of the current document
+        """
+        if self._source is None and self.tree is not None:
+            self._source = html.tostring(self.tree, encoding='unicode')
+
+        return(self._source)
+
+    def _request(self, name, method, url, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = self.session.request(method, url,
+                                            timeout=self.timeout, **kwargs)
+            response.raise_for_status()
+        except requests.RequestException as e:
+            status = getattr(e.response, 'status_code', None)
+            raise JSFError('{} {} failed: {}'.format(method, url, e),
+                           status=status) from e
+        finally:
+            if self.instrumentation is not None:
+                self.instrumentation.record('http', name,
+                                            time.perf_counter() - start)
+
+        self.n_requests += 1
+        self.n_bytes_transferred += len(response.content)
+        return(response)
+
+    def _load(self, response):
+        self.url = response.url
+        self._source = response.text
+        self.tree = html.document_fromstring(response.text)
+
+    def get(self, url):
+        """
+        Load the document at `url`.
+        """
+        self._load(self._request('get', 'GET', url))
+
+    def element(self, element_id):
+        """
+        Return: (lxml element) element of the current document with the id,
+                None if there is none
+        """
+        elements = self.tree.xpath('//*[@id=$id]', id=element_id)
+        return(elements[0] if elements else None)
+
+    def _form(self, form_id):
+        form = self.element(form_id)
+        if form is None or form.tag != 'form':
+            raise JSFError('No form "{}" in {}'.format(form_id, self.url))
+
+        return(form)
+
+    def view_state(self, form_id=None):
+        """
+        Return: (string) `javax.faces.ViewState` of the form (of the
+                document if None), None if there is none
+        """
+        root = self.tree if form_id is None else self._form(form_id)
+        inputs = root.xpath('.//input[@name=$name]', name=VIEW_STATE)
+        return(inputs[0].get('value') if inputs else None)
+
+    def form_fields(self, form_id):
+        """
+        Return: (list) (name, value) pairs of the form, as submitted by a
+                browser: text and hidden inputs, checked boxes, selected
+                options and text areas (buttons excluded)
+        """
+        fields = []
+        for element in self._form(form_id).iter('input', 'select', 'textarea'):
+            name = element.get('name')
+            if not name or element.get('disabled') is not None:
+                continue
+
+            if element.tag == 'input':
+                kind = (element.get('type') or 'text').lower()
+                if kind in ('submit', 'button', 'image', 'reset', 'file'):
+                    continue
+                if kind in ('checkbox', 'radio'):
+                    if element.get('checked') is not None:
+                        fields.append((name, element.get('value', 'on')))
+                    continue
+                fields.append((name, element.get('value', '')))
+            elif element.tag == 'select':
+                options = element.xpath('.//option[@selected]') or \
+                    element.xpath('.//option')[:1]
+                for option in options:
+                    value = option.get('value')
+                    fields.append((name, option.text_content()
+                                   if value is None else value))
+            else:
+                fields.append((name, element.text or ''))
+
+        return(fields)
+
+    def set_field(self, element_id, value):
+        """
+        Fill the input of the current document with the id.
+        """
+        element = self.element(element_id)
+        if element is None:
+            raise JSFError('No input "{}" in {}'.format(element_id, self.url))
+        element.set('value', str(value))
+        self._source = None
+
+    def check(self, element_id, checked=True):
+        """
+        Check (or uncheck) the box of the current document with the id.
+        """
+        element = self.element(element_id)
+        if element is None:
+            raise JSFError('No input "{}" in {}'.format(element_id, self.url))
+        if checked:
+            element.set('checked', 'checked')
+        elif 'checked' in element.attrib:
+            del element.attrib['checked']
+        self._source = None
+
+    def _action(self, form_id):
+        action = self._form(form_id).get('action')
+        return(urljoin(self.url, action) if action else self.url)
+
+    def _merge(self, fields, params):
+        params = dict(params or {})
+        data = [(name, params.pop(name) if name in params else value)
+                for name, value in fields]
+        return(data + list(params.items()))
+
+    def submit(self, form_id, button=None, params=None):
+        """
+        Submit the form (non-ajax), as if `button` was clicked, and load the
+        document returned.
+
+        Arguments:
+            form_id: id of the form
+
+        Keyword arguments:
+            button: (default: None) name of the button clicked
+            params: (default: None) dictionary of fields overriding or
+                    completing those of the form
+        """
+        params = dict(params or {})
+        if button is not None:
+            params[button] = button
+        params.setdefault(form_id, form_id)
+        data = self._merge(self.form_fields(form_id), params)
+        self._load(self._request(button or form_id, 'POST',
+                                 self._action(form_id), data=data))
+
+    def ajax(self, form_id, source, execute='@this', render='@none',
+             event=None, params=None):
+        """
+        Send a PrimeFaces ajax request from the form, and apply the partial
+        response to the current document.
+
+        Arguments:
+            form_id: id of the form
+            source: id of the component sending the request
+
+        Keyword arguments:
+            execute: (default: '@this') ids of the components processed by
+                     the server
+            render: (default: '@none') ids of the components to update
+            event: (default: None) name of the ajax behavior event
+            params: (default: None) dictionary of additional fields
+        """
+        data = [
+            ('javax.faces.partial.ajax', 'true'),
+            ('javax.faces.source', source),
+            ('javax.faces.partial.execute', execute),
+            ('javax.faces.partial.render', render),
+        ]
+        if event is None:
+            data.append((source, source))
+        else:
+            data += [('javax.faces.behavior.event', event),
+                     ('javax.faces.partial.event', event)]
+        data += self._merge(self.form_fields(form_id), params)
+
+        response = self._request(source, 'POST', self._action(form_id),
+                                 data=data, headers=AJAX_HEADERS)
+        self.apply_partial_response(response.content)
+
+    def apply_partial_response(self, content):
+        """
+        Apply a `<partial-response>` to the current document: replace the
+        updated components, set the new `javax.faces.ViewState`, follow a
+        redirect, or raise `JSFError` on an error.
+
+        Arguments:
+            content: (bytes) XML of the partial response
+        """
+        try:
+            root = etree.fromstring(content)
+        except etree.XMLSyntaxError as e:
+            raise JSFError('Not a partial response from {}: {}'.format(
+                self.url, e))
+        if root.tag != 'partial-response':
+            raise JSFError('Not a partial response from {}: <{}>'.format(
+                self.url, root.tag))
+
+        for change in root.iter('update', 'redirect', 'error'):
+            if change.tag == 'error':
+                raise JSFError('{}: {}'.format(
+                    change.findtext('error-name'),
+                    change.findtext('error-message')))
+            if change.tag == 'redirect':
+                self.get(urljoin(self.url, change.get('url')))
+                return
+
+            update_id = change.get('id')
+            content = change.text or ''
+            if VIEW_STATE in update_id:
+                for element in self.tree.xpath('//input[@name=$name]',
+                                               name=VIEW_STATE):
+                    element.set('value', content)
+            else:
+                self._replace(update_id, content)
+        self._source = None
+
+    def _replace(self, element_id, content):
+        element = self.element(element_id)
+        if element is None:
+            raise JSFError('Update of an unknown component "{}"'.format(
+                element_id))
+
+        elements = [fragment for fragment in
+                    html.fragments_fromstring(content)
+                    if not isinstance(fragment, str)]
+        parent = element.getparent()
+        index = parent.index(element)
+        tail = element.tail
+        parent.remove(element)
+        for offset, fragment in enumerate(elements):
+            parent.insert(index + offset, fragment)
+        if elements:
+            elements[-1].tail = tail
+
+    def cookies(self):
+        """
+        Return: (list) cookies of the session, in the format of
+                `WebDriver.get_cookies`
+        """
+        return([{'name': c.name, 'value': c.value, 'domain': c.domain,
+                 'path': c.path} for c in self.session.cookies])
+
+    def close(self):
+        self.session.close()
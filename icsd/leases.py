@@ -0,0 +1,216 @@
+"""
+Crawl split across several hosts (or accounts): a coordinator in a shared
+SQLite file hands out leases on batches of code ranges. A lease expires
+unless its holder renews it (heartbeat); the codes of an expired lease are
+planned anew by the next host asking for work. The codes crawled by each
+host are reported to the coordinator as they are saved (with the
+heartbeats), so that every host plans around the codes crawled by the
+others, including those of a host that died in the middle of a lease.
+
+The file must be on a filesystem with working POSIX locks (SQLite's
+rollback journal is used, not WAL, so that it can be shared over a network
+mount that supports them).
+"""
+import os
+import json
+import time
+import glob
+import shutil
+import socket
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+from icsd.state_index import mark_crawled
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS leases (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ranges TEXT NOT NULL,  -- JSON list of [first, last]
+    owner TEXT NOT NULL,
+    expires REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS crawled (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    code INTEGER NOT NULL,
+    owner TEXT NOT NULL
+);
+"""
+
+
+def default_owner():
+    """
+    Return: (string) name of this crawler: "<host name>-<process ID>"
+    """
+    return('{}-{}'.format(socket.gethostname(), os.getpid()))
+
+
+class LeaseCoordinator(object):
+    """
+    Leases on batches of code ranges, in a SQLite file shared by the hosts
+    of a crawl. Each call is a transaction of its own; `acquire` plans and
+    leases a batch in a single write transaction, so that no two hosts are
+    handed the same codes.
+    """
+
+    def __init__(self, path, owner=None, ttl=600):
+        """
+        Arguments:
+            path: SQLite file of the coordinator
+
+        Keyword arguments:
+            owner: (default: None) name of this crawler in the leases
+                   (default: see `default_owner`)
+            ttl: (default: 600) seconds a lease lasts without a heartbeat
+
+        Attributes:
+            n_requeued: number of expired leases of other crawlers whose codes
+                        have been planned anew by this one
+            clock: function returning the current time in seconds
+        """
+        self.path = path
+        self.owner = owner or default_owner()
+        self.ttl = ttl
+        self.n_requeued = 0
+        self.clock = time.time
+        self._seq = 0
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=60, isolation_level=None,
+                                    check_same_thread=False)
+        self.conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _transaction(self):
+        # one transaction at a time on the connection shared by the threads
+        with self._lock:
+            self.conn.execute('BEGIN IMMEDIATE')
+            try:
+                yield
+            except Exception:
+                self.conn.execute('ROLLBACK')
+                raise
+            self.conn.execute('COMMIT')
+
+    def acquire(self, plan):
+        """
+        Lease the next batch of code ranges. The expired leases are dropped
+        first, and `plan` is called with
+
+            - the codes crawled by any crawler since the last call (all the
+              codes at the first call)
+            - the code ranges (first, last) of the leases held
+
+        to return the code ranges of the batch (None if there is nothing
+        left to crawl).
+
+        Return: (tuple) ID of the lease, and code ranges of the batch; None
+                if there is nothing left to crawl
+        """
+        with self._transaction():
+            now = self.clock()
+            expired = self.conn.execute(
+                'SELECT id, ranges, owner FROM leases WHERE expires < ?',
+                (now,)).fetchall()
+            for lease_id, ranges, owner in expired:
+                logging.warning('Lease {} of {} on {} expired'.format(
+                    lease_id, owner, ranges))
+            self.conn.execute('DELETE FROM leases WHERE expires < ?', (now,))
+            self.n_requeued += len(expired)
+
+            rows = self.conn.execute(
+                'SELECT seq, code FROM crawled WHERE seq > ? ORDER BY seq',
+                (self._seq,)).fetchall()
+            if rows:
+                self._seq = rows[-1][0]
+            leased = [tuple(r) for ranges, in self.conn.execute(
+                'SELECT ranges FROM leases') for r in json.loads(ranges)]
+
+            code_ranges = plan([code for _, code in rows], leased)
+            if code_ranges is None:
+                return(None)
+
+            code_ranges = tuple(tuple(r) for r in code_ranges)
+            cursor = self.conn.execute(
+                'INSERT INTO leases (ranges, owner, expires) VALUES (?, ?, ?)',
+                (json.dumps(code_ranges), self.owner, now + self.ttl))
+            return((cursor.lastrowid, code_ranges))
+
+    def heartbeat(self, lease_ids):
+        """
+        Renew the leases `lease_ids` for `ttl` seconds.
+
+        Return: (list) IDs of the leases lost (expired and dropped)
+        """
+        lost = []
+        with self._transaction():
+            expires = self.clock() + self.ttl
+            for lease_id in lease_ids:
+                cursor = self.conn.execute(
+                    'UPDATE leases SET expires = ? WHERE id = ? AND owner = ?',
+                    (expires, lease_id, self.owner))
+                if cursor.rowcount == 0:
+                    lost.append(lease_id)
+
+        return(lost)
+
+    def _record(self, codes):
+        self.conn.executemany(
+            'INSERT INTO crawled (code, owner) VALUES (?, ?)',
+            [(int(c), self.owner) for c in codes])
+
+    def report(self, codes):
+        """
+        Record the codes crawled so far, while their leases go on.
+        """
+        codes = list(codes)
+        if not codes:
+            return
+
+        with self._transaction():
+            self._record(codes)
+
+    def release(self, lease_id, codes=()):
+        """
+        Record the codes crawled (see `report`), and end the lease `lease_id`:
+        the codes of the batch not crawled are planned anew.
+        """
+        with self._transaction():
+            self._record(codes)
+            self.conn.execute('DELETE FROM leases WHERE id = ?', (lease_id,))
+
+    def close(self):
+        self.conn.close()
+
+
+def merge_entries(source_dirs, dest_dir='.'):
+    """
+    Copy the entry directories ("<code>/" with a "source.html") crawled by
+    other hosts into `dest_dir`, unless already there, and mark them as
+    crawled in its state index (see `icsd.state_index`), if any.
+
+    Arguments:
+        source_dirs: crawl directories of the other hosts
+
+    Keyword arguments:
+        dest_dir: (default: ".") crawl directory to merge them into
+
+    Return: (list) ICSD Collection Codes of the entries copied
+    """
+    copied = []
+    for source_dir in source_dirs:
+        for path in sorted(glob.glob(os.path.join(source_dir,
+                                                  '*', 'source.html'))):
+            entry_dir = os.path.dirname(path)
+            code = os.path.basename(entry_dir)
+            dest = os.path.join(dest_dir, code)
+            if os.path.exists(os.path.join(dest, 'source.html')):
+                continue
+            if os.path.exists(dest):
+                shutil.rmtree(dest)
+            shutil.copytree(entry_dir, dest)
+            copied.append(code)
+
+    mark_crawled(copied, os.path.join(dest_dir, 'crawl_state.sqlite'))
+
+    return(copied)
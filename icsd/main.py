@@ -1,20 +1,41 @@
 import argparse
-from icsd.crawler import main as scrape_all
-from icsd.collection_coder import main as enumerate_all
-from sys import argv
 import sys
-from icsd.queryer import Queryer
+
+# The subcommands import their modules (selenium, pandas, ...) when they run,
+# so that `icsd --help` and the lightweight subcommands start quickly.
+
+
+def make_queryer(args, query):
+    """
+    Return: a `Queryer` for `query`, or an `HttpQueryer` with --engine http
+    """
+    if args.engine == 'http':
+        from icsd.http_queryer import HttpQueryer
+        return(HttpQueryer(url=args.url, query=query,
+                           structure_source=args.source,
+                           instrument=args.instrument))
+
+    from icsd.queryer import Queryer
+    queryer = Queryer(url=args.url, query=query, structure_source=args.source,
+                      instrument=args.instrument, lean=args.lean)
+    queryer.batch_cif = args.batch_cif
+    queryer.fetch_cif_over_http = args.cif_over_http
+    return(queryer)
 
 
 def command_scrape(args):
     if args.all:
-        scrape_all(args.dlcif == False, args.maxdl)
+        from icsd.crawler import main as scrape_all
+        scrape_all(args.dlcif == False, args.maxdl, args.instrument,
+                   args.workers, args.lean, args.batch_cif, args.url,
+                   args.engine, args.pack, args.coordinator, args.owner,
+                   args.lease_ttl, args.cif_over_http)
 
     if args.code > 0:
         query = {
             "icsd_collection_code": args.code,
         }
-        queryer = Queryer(query=query, structure_source=args.source)
+        queryer = make_queryer(args, query)
         queryer.skipcif = args.dlcif == False
         queryer.perform_icsd_query()
 
@@ -22,12 +43,24 @@ def command_scrape(args):
         query = {
             "composition": args.composition,
         }
-        queryer = Queryer(query=query, structure_source=args.source)
+        queryer = make_queryer(args, query)
         queryer.perform_icsd_query()
 
 
 def command_enumerate(args):
-    enumerate_all()
+    from icsd.collection_coder import main as enumerate_all
+    enumerate_all(url=args.url, engine=args.engine)
+
+
+def command_merge(args):
+    from icsd.leases import merge_entries
+    copied = merge_entries(args.dirs)
+    print('{} entries merged'.format(len(copied)))
+
+
+def command_reparse(args):
+    from icsd.reparse import main as reparse_all
+    reparse_all(codes=args.code, force=args.force, processes=args.processes)
 
 # def command_ls():
 #     pass
@@ -53,12 +86,76 @@ def main():
         '--code', help='scrape by ICSD Collection Code (e.g. 2000)', default=-1, type=int)
     parser_scrape.add_argument(
         '--source', help='structure source (E (experiment), T (theory), or A (all, default))', default="A", type=str)
+    parser_scrape.add_argument(
+        '--workers', help='number of browser sessions crawling side by side '
+        '(with --all)', default=1, type=int)
+    parser_scrape.add_argument(
+        '--no-pack', dest='pack', action='store_false',
+        help='query a single range of codes at a time, rather than up to '
+        '--maxdl codes across the codes already crawled (with --all)')
+    parser_scrape.add_argument(
+        '--batch-cif', action='store_true',
+        help='with --dlcif, export the CIFs of all the hits at once')
+    parser_scrape.add_argument(
+        '--cif-over-http', action='store_true',
+        help='with --dlcif, download the CIFs over HTTP with the cookies of '
+        'the browser, rather than with the browser')
+    parser_scrape.add_argument(
+        '--lean', action='store_true',
+        help='do not load images, fonts, stylesheets and analytics')
+    parser_scrape.add_argument(
+        '--engine', choices=['browser', 'http'], default='browser',
+        help='drive the web interface with a headless browser, or replay '
+        'its forms over HTTP')
+    parser_scrape.add_argument(
+        '--url', default=None,
+        help='URL of the search page (e.g. of a local stand-in server)')
+    parser_scrape.add_argument(
+        '--coordinator', default=None,
+        help='SQLite file shared by the hosts of a crawl, handing out '
+        'leases on code ranges (with --all)')
+    parser_scrape.add_argument(
+        '--owner', default=None,
+        help='name of this crawler in the leases (default: host-pid)')
+    parser_scrape.add_argument(
+        '--lease-ttl', default=600, type=float,
+        help='seconds a lease lasts without a heartbeat')
+    parser_scrape.add_argument(
+        '--instrument', action='store_true',
+        help='time fields, waits and WebDriver commands '
+        '(summary in instrumentation.json)')
     parser_scrape.set_defaults(handler=command_scrape)
 
     parser_enumerate = subparsers.add_parser(
         'enumerate', help='make list of all ICSD codes')
+    parser_enumerate.add_argument(
+        '--engine', choices=['browser', 'http'], default='browser',
+        help='drive the web interface with a headless browser, or replay '
+        'its forms over HTTP')
+    parser_enumerate.add_argument(
+        '--url', default=None,
+        help='URL of the search page (e.g. of a local stand-in server)')
     parser_enumerate.set_defaults(handler=command_enumerate)
 
+    parser_reparse = subparsers.add_parser(
+        'reparse', help='rebuild meta_data.json from saved source.html')
+    parser_reparse.add_argument(
+        '--code', help='ICSD Collection Codes to reparse (default: all)',
+        nargs='*', type=int)
+    parser_reparse.add_argument(
+        '--force', action='store_true',
+        help='reparse entries whose meta_data.json is up to date')
+    parser_reparse.add_argument(
+        '--processes', help='number of worker processes (default: all cores)',
+        default=None, type=int)
+    parser_reparse.set_defaults(handler=command_reparse)
+
+    parser_merge = subparsers.add_parser(
+        'merge', help='copy the entries crawled by other hosts here')
+    parser_merge.add_argument(
+        'dirs', nargs='+', help='crawl directories of the other hosts')
+    parser_merge.set_defaults(handler=command_merge)
+
     # parser_ls = subparsers.add_parser(
     #     'ls', help='report already retrieved entries')
     # parser_ls.add_argument(
@@ -71,6 +168,13 @@ def main():
     # parser_ls.set_defaults(handler=command_ls)
 
     args = parser.parse_args()
+    if getattr(args, 'handler', None) is command_scrape and \
+            args.engine == 'http':
+        # options of the browser sessions
+        for option in ('--lean', '--batch-cif'):
+            if getattr(args, option[2:].replace('-', '_')):
+                parser_scrape.error(
+                    '{} is not supported with --engine http'.format(option))
     print(args)
 
     try:
@@ -0,0 +1,251 @@
+"""
+Staged processing of the entries of a 'Detailed View': the browser thread
+only captures the snapshot of each entry and moves on to the next one, a
+pool of parser threads extracts the fields, and a writer thread saves the
+entries to disk. Bounded queues between the stages hold the browser back
+when parsing or writing falls behind.
+"""
+import os
+import sys
+import json
+import queue
+import shutil
+import threading
+from icsd.detailed_view import DetailedViewPage
+from icsd.entry_parser import EntryParser
+from icsd.cif_batch import save_cifs
+from icsd.state_index import mark_crawled
+
+
+_STOP = object()
+
+
+def record_entry(queryer, index, coll_code):
+    """
+    Record the entry saved at `index` of the 'Detailed View' of `queryer` in
+    its journal (see `icsd.journal`), or else in the state index of the
+    directory, if any (see `icsd.state_index`). If `queryer` fetches the CIFs over
+    HTTP, the CIF of the entry is queued, and the entry is recorded once the
+    CIF is saved; if the CIFs of the selection were exported at once (see
+    `Queryer.parse_selection`), the CIF of the entry is written from the
+    export first. An entry whose CIF failed or is missing is not recorded,
+    and is crawled again.
+    """
+    journal_cursor = queryer.journal_cursor
+
+    def record():
+        if journal_cursor is not None:
+            journal_cursor.record(index, coll_code)
+        else:
+            mark_crawled([coll_code])
+
+    batch_cifs = getattr(queryer, 'batch_cifs', None)
+    if batch_cifs is not None:
+        if not save_cifs(batch_cifs, [coll_code]):
+            record()
+        return
+
+    if queryer.skipcif or queryer.cif_fetcher is None:
+        record()
+        return
+
+    queryer.cif_fetcher.submit(
+        coll_code, os.path.join(coll_code, '{}.cif'.format(coll_code)),
+        then=record)
+
+
+class Snapshot(EntryParser):
+    """
+    Entry captured by `Queryer.get_snapshot`, parsed away from the browser.
+    A bundle without "panels" holds the whole page in "source".
+    """
+
+    def __init__(self, bundle):
+        super(Snapshot, self).__init__()
+        self.bundle = bundle
+
+    def get_page_source(self):
+        return(self.bundle['source'])
+
+    def _load_page(self):
+        if 'panels' not in self.bundle:
+            return(DetailedViewPage(self.bundle['source']))
+
+        return(DetailedViewPage.from_bundle(self.bundle))
+
+
+class EntryPipeline(object):
+    """
+    Parse the entries of the 'Detailed View' of a `Queryer` in three stages
+    (capture -> parse -> write), see the module docstring.
+    """
+
+    def __init__(self, queryer, parse_workers=2, queue_size=8, batch_size=8):
+        """
+        Arguments:
+            queryer: `Queryer` showing the first entry of the 'Detailed View'
+
+        Keyword arguments:
+            parse_workers: (default: 2) number of parser threads
+            queue_size: (default: 8) capacity of the queues between stages
+            batch_size: (default: 8) maximum number of entries saved by the
+                        writer at once
+        """
+        self.queryer = queryer
+        self.parse_workers = parse_workers
+        self.batch_size = batch_size
+        self._parse_queue = queue.Queue(maxsize=queue_size)
+        self._write_queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self.error = None
+        self.entries_parsed = []
+
+    def _fail(self, error):
+        with self._lock:
+            if self.error is None:
+                self.error = error
+
+    def _put(self, q, item):
+        """
+        Put `item` into `q`, blocking while it is full, unless a stage has
+        failed.
+
+        Return: (bool) whether the item was queued
+        """
+        while self.error is None:
+            try:
+                q.put(item, timeout=0.1)
+                return(True)
+            except queue.Full:
+                continue
+
+        return(False)
+
+    def _parse(self):
+        instrumentation = self.queryer.instrumentation
+        while True:
+            item = self._parse_queue.get()
+            if item is _STOP:
+                break
+            if self.error is not None:
+                continue
+
+            index, bundle, screenshot = item
+            try:
+                timings = {} if instrumentation is not None else None
+                entry_data = Snapshot(bundle).parse_fields(timings=timings)
+                if timings is not None:
+                    for name, seconds in timings.items():
+                        instrumentation.record('field', name, seconds)
+            except Exception as e:
+                self._fail(e)
+                continue
+
+            self._put(self._write_queue,
+                      (index, entry_data, bundle['source'], screenshot))
+
+    def _write_entry(self, index, entry_data, source, screenshot, n_entries):
+        # create a directory for the entry after the ICSD Collection Code
+        coll_code = str(entry_data['collection_code'])
+        if os.path.exists(coll_code):
+            shutil.rmtree(coll_code)
+        os.mkdir(coll_code)
+
+        # write the parsed data into a JSON file in the directory
+        json_file = os.path.join(coll_code, 'meta_data.json')
+        with open(json_file, 'w') as fw:
+            json.dump(entry_data, fw, indent=2)
+
+        if screenshot is not None:
+            with open(os.path.join(coll_code, 'screenshot.png'), 'wb') as fw:
+                fw.write(screenshot)
+
+        if source is not None:
+            with open(os.path.join(coll_code, 'source.html'), 'w') as fw:
+                fw.write(source)
+
+        record_entry(self.queryer, index, coll_code)
+
+        sys.stdout.write('[{}/{}]: '.format(index + 1, n_entries))
+        sys.stdout.write('Data exported into ')
+        sys.stdout.write('folder "{}"\n'.format(coll_code))
+        self.entries_parsed.append((index, coll_code))
+
+    def _write(self, n_entries):
+        n_stops = 0
+        while n_stops < self.parse_workers:
+            batch = [self._write_queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._write_queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            for item in batch:
+                if item is _STOP:
+                    n_stops += 1
+                    continue
+                if self.error is not None:
+                    continue
+                try:
+                    self._write_entry(*item, n_entries=n_entries)
+                except Exception as e:
+                    self._fail(e)
+            sys.stdout.flush()
+
+    def _stop_parsers(self):
+        for _ in range(self.parse_workers):
+            self._parse_queue.put(_STOP)
+
+    def run(self, n_entries):
+        """
+        Capture the `n_entries` entries in the browser, starting from the
+        current one, while they are parsed and saved in the background.
+
+        Return: (list) A list of ICSD Collection Codes of entries parsed
+        """
+        queryer = self.queryer
+        parsers = [threading.Thread(target=self._parse_and_stop,
+                                    name='parser-{}'.format(i))
+                   for i in range(self.parse_workers)]
+        writer = threading.Thread(target=self._write, args=(n_entries,),
+                                  name='writer')
+        for thread in parsers + [writer]:
+            thread.daemon = True
+            thread.start()
+
+        try:
+            for i in range(n_entries):
+                if self.error is not None:
+                    break
+
+                if queryer.interval:
+                    queryer._sleep(queryer.interval)
+                bundle = queryer.get_snapshot()
+                queryer.n_entries_parsed += 1
+                screenshot = None
+                if queryer.save_screenshot:
+                    screenshot = queryer.driver.get_screenshot_as_png()
+
+                if not self._put(self._parse_queue, (i, bundle, screenshot)):
+                    break
+
+                if i + 1 < n_entries:
+                    queryer._go_to_next_entry()
+        except Exception as e:
+            self._fail(e)
+        finally:
+            self._stop_parsers()
+            for thread in parsers + [writer]:
+                thread.join()
+
+        if self.error is not None:
+            raise self.error
+
+        return([code for _, code in sorted(self.entries_parsed)])
+
+    def _parse_and_stop(self):
+        try:
+            self._parse()
+        finally:
+            self._write_queue.put(_STOP)
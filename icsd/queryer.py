@@ -3,28 +3,42 @@ import platform
 import os
 import shutil
 import json
-import time
-from bs4 import BeautifulSoup
-import pandas as pd
-import re
-import pkg_resources
+import tempfile
+from lxml import html
 from selenium import webdriver
 from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.support.ui import WebDriverWait
-from tags import ICSD_QUERY_TAGS, ICSD_PARSE_TAGS
+from tags import ICSD_QUERY_TAGS
 from selenium.webdriver.support import expected_conditions as ec
 from selenium.webdriver.common.by import By
 from selenium.webdriver.chrome.options import Options
-
-
-pd.options.display.max_colwidth = 100000
-
-
-class QueryerError(Exception):
-    pass
-
-
-class Queryer(object):
+from icsd.entry_parser import EntryParser, QueryerError
+from icsd.detailed_view import DetailedViewPage, SNAPSHOT_SCRIPT
+from icsd.instrumentation import Instrumentation, InstrumentedDriver, timed
+from icsd.waits import Waiter, WaitTimeout
+from icsd.cif_fetcher import CIFFetcher, cif_url_for
+from icsd.cif_batch import read_cif_batch
+from icsd.download_watcher import DownloadWatcher
+from icsd.pipeline import record_entry
+
+
+# URL patterns dropped by lean sessions (see `Queryer._block_assets`): images,
+# fonts, stylesheets and analytics are never needed to parse the pages.
+LEAN_BLOCKED_URLS = [
+    '*.png', '*.jpg', '*.jpeg', '*.gif', '*.svg', '*.ico', '*.webp',
+    '*.woff', '*.woff2', '*.ttf', '*.otf', '*.eot',
+    '*.css', '*.css?*',
+    '*google-analytics.com*', '*googletagmanager.com*', '*doubleclick.net*',
+]
+
+# Chrome content settings of lean sessions (2: block). Chrome has no such
+# setting for stylesheets and fonts, which are blocked by URL instead.
+LEAN_CONTENT_SETTINGS = {
+    'profile.managed_default_content_settings.images': 2,
+}
+
+
+class Queryer(EntryParser):
     """
     Base class to query the ICSD via the web interface using a Selenium
     WebDriver (http://selenium-python.readthedocs.io/).
@@ -34,7 +48,11 @@ class Queryer(object):
                  url=None,
                  query=None,
                  save_screenshot=None,
-                 structure_source='E'):
+                 structure_source='E',
+                 instrument=False,
+                 wait_timeout=60,
+                 browser_data_dir=None,
+                 lean=False):
         """
         Initialize the webdriver and load the URL.
         (Also, check if the "Basic Search" page has loaded successfully.)
@@ -68,6 +86,33 @@ class Queryer(object):
                 Options: "E"/"T"/"A" for experimental/theoretical/all structures
                 (Default: "E")
 
+            instrument:
+                Boolean specifying whether the time spent on each parsed
+                field, wait helper and WebDriver command should be recorded
+                and summarized (into `instrumentation_file`) when
+                `parse_entries` finishes.
+                (Default: False)
+
+            wait_timeout:
+                Seconds to wait for the page to get ready (ajax requests
+                completed, blockUI dialog hidden, ...) before giving up.
+                (Default: 60)
+
+            browser_data_dir:
+                Directory for the browser user profile and the downloads,
+                dedicated to this session (it is emptied on start).
+                By default, a new directory is created under "browser_data"
+                and removed by `quit`, so that several sessions can run
+                side by side.
+                (Default: None)
+
+            lean:
+                Boolean specifying whether the browser should skip images,
+                fonts, stylesheets and analytics, which are not needed to
+                parse the pages. Ignored when `save_screenshot` is set, as
+                the screenshots need them.
+                (Default: False)
+
         Attributes:
             url: URL of the search page
             query: query to be posted to the webform (see kwargs)
@@ -75,9 +120,47 @@ class Queryer(object):
             structure_source: search for experimental/theoretical/all structures
             virt_display: Display object from pyvirtualdisplay
             browser_data_dir: directory for browser user profile, related data
+            download_dir: directory the browser downloads the CIFs into
             driver: instance of Selenium WebDriver running PhantomJS
             hits: number of search hits for the query
-        """
+            n_page_captures: number of snapshots (or page sources) transferred
+                             from the WebDriver (see `get_snapshot`)
+            save_source: whether "source.html" is saved for each entry, in
+                         which case the snapshots include the whole page
+            instrumentation: `Instrumentation` if `instrument`, None otherwise
+            instrumentation_file: JSON file for the summary of instrumentation
+            waits: `Waiter` blocking on the readiness of the page
+            interval: seconds to pause before parsing each entry (Default: 0)
+            lean: whether the assets of the pages are blocked (see kwargs)
+            n_bytes_transferred: bytes transferred by the browser for the
+                                 entries parsed (see `get_snapshot`)
+            n_entries_parsed: number of entries parsed
+            cif_url: URL of the CIF of an entry, on the server of `url` (see
+                     `icsd.cif_fetcher`)
+            fetch_cif_over_http: whether the CIFs are downloaded over HTTP
+                                 with the cookies of the browser (see
+                                 `icsd.cif_fetcher`), rather than exported
+                                 by the browser (Default: False)
+            cif_fetcher: `CIFFetcher` downloading the CIFs over HTTP, None
+                         to download them with the browser
+            journal_cursor: `JournalCursor` recording the entries saved
+                            (see `icsd.journal`), None if not journaled
+            batch_cif: whether the CIFs of all the selected entries are
+                       exported at once from the 'List View' (see
+                       `parse_selection`)
+            batch_cifs: ICSD Collection Code:CIF of the export of the
+                        selection being parsed, None if not exported at once
+            download_watcher: `DownloadWatcher` of `download_dir`, once the
+                              browser downloads a file
+            download_timeout: seconds to wait for a browser download
+            pipeline: whether the entries are parsed and saved in background
+                      threads while the browser moves on (see
+                      `icsd.pipeline`); CIFs downloaded by the browser
+                      require the sequential processing
+            parse_workers: number of parser threads of the pipeline
+        """
+        super(Queryer, self).__init__()
+
         self._url = None
         self.url = url
 
@@ -96,19 +179,47 @@ class Queryer(object):
 
         self.virt_diplay = None
 
+        self.browser_data_dir = browser_data_dir
+        self._remove_browser_data = False
+
+        self.lean = lean
+        self.n_bytes_transferred = 0
+        self.n_entries_parsed = 0
+
+        self.cif_url = cif_url_for(self.url)
+        self.cif_fetcher = None
+        self.journal_cursor = None
+        self.fetch_cif_over_http = False
+        self.batch_cif = False
+        self.batch_cifs = None
+        self.download_watcher = None
+        self.download_timeout = 100
+        self.pipeline = True
+        self.parse_workers = 2
+
+        self.instrumentation = Instrumentation() if instrument else None
+        self.instrumentation_file = 'instrumentation.json'
+
         self.driver = self._initialize_driver()
+        if self.instrumentation is not None:
+            self.driver = InstrumentedDriver(self.driver, self.instrumentation)
+        self.waits = Waiter(self.driver, timeout=wait_timeout,
+                            instrumentation=self.instrumentation)
         self.driver.get(self.url)
 
         self._check_basic_search()
 
         self.hits = 0
 
-        self.page_obatained = False
+        self._page_source = None
+        self._snapshot = None
+        self.n_page_captures = 0
+        self.save_source = True
 
         self.init_interval()
 
     def init_interval(self):
-        self.interval = 1  # sec
+        self.interval = 0  # sec
 
     @property
     def url(self):
@@ -139,7 +250,7 @@ class Queryer(object):
     def save_screenshot(self, save_screenshot):
         if not save_screenshot:
             self._save_screenshot = False
-        elif is_instance(save_screenshot, str):
+        elif isinstance(save_screenshot, str):
             self._save_screenshot = save_screenshot.lower() == 't'
         else:
             self._save_screenshot = save_screenshot
@@ -157,21 +268,47 @@ class Queryer(object):
         else:
             self._structure_source = structure_source.upper()[0]
 
+    @property
+    def lean_session(self):
+        """
+        Return: (bool) whether the assets of the pages are blocked
+        """
+        return(bool(self.lean) and not self.save_screenshot)
+
+    def _send_command(self, browser, cmd, params):
+        """
+        Send a Chrome DevTools Protocol command to the browser.
+        """
+        browser.command_executor._commands["send_command"] = (
+            "POST", '/session/$sessionId/chromium/send_command')
+
+        browser.execute("send_command", {'cmd': cmd, 'params': params})
+
     def enable_download_in_headless_chrome(self, browser, download_dir):
         if not os.path.exists(download_dir):
             os.makedirs(download_dir)
 
-        browser.command_executor._commands["send_command"] = (
-            "POST", '/session/$sessionId/chromium/send_command')
+        self._send_command(browser, 'Page.setDownloadBehavior', {
+            'behavior': 'allow', 'downloadPath': download_dir})
 
-        params = {'cmd': 'Page.setDownloadBehavior', 'params': {
-            'behavior': 'allow', 'downloadPath': download_dir}}
-        browser.execute("send_command", params)
+    def _block_assets(self, browser):
+        """
+        Drop the requests for `LEAN_BLOCKED_URLS` at the network layer.
+        """
+        self._send_command(browser, 'Network.enable', {})
+        self._send_command(browser, 'Network.setBlockedURLs',
+                           {'urls': LEAN_BLOCKED_URLS})
 
     def _initialize_driver(self):
-        browser_data_dir = os.path.join(os.getcwd(), 'browser_data')
-        if os.path.exists(browser_data_dir):
-            shutil.rmtree(browser_data_dir, ignore_errors=True)
+        if self.browser_data_dir is None:
+            root = os.path.join(os.getcwd(), 'browser_data')
+            os.makedirs(root, exist_ok=True)
+            self.browser_data_dir = tempfile.mkdtemp(prefix='session-',
+                                                     dir=root)
+            self._remove_browser_data = True
+        elif os.path.exists(self.browser_data_dir):
+            shutil.rmtree(self.browser_data_dir, ignore_errors=True)
+        browser_data_dir = os.path.abspath(self.browser_data_dir)
         self.download_dir = os.path.abspath(os.path.join(browser_data_dir,
                                                          'driver_downloads'))
         sys.stdout.write('Starting a ChromeDriver ')
@@ -192,6 +329,8 @@ class Queryer(object):
             'download.default_directory': self.download_dir,
             'profile.default_content_setting_values.automatic_downloads': 1
         }
+        if self.lean_session:
+            prefs.update(LEAN_CONTENT_SETTINGS)
         _options.add_experimental_option("prefs", prefs)
 
         if platform.system() == "Linux":
@@ -226,9 +365,14 @@ class Queryer(object):
             _options.add_argument("--ignore-certificate-errors")
             _options.add_argument("--start-maximized")
 
-            return(webdriver.Chrome(os.environ['CDRIVER'], options=_options))
+            driver = webdriver.Chrome(os.environ['CDRIVER'], options=_options)
+        else:
+            driver = webdriver.Chrome(options=_options)
+
+        if self.lean_session:
+            self._block_assets(driver)
 
-        return(webdriver.Chrome(options=_options))
+        return(driver)
 
     def _check_basic_search(self):
         """
@@ -283,13 +427,7 @@ class Queryer(object):
         self._wait_until_dialogue_disappears()
 
     def _wait_until_dialogue_disappears(self):
-        for _ in range(1000):
-            element = self.driver.find_element_by_id("dlgBlockUI")
-            is_hidden = element.get_attribute("aria-hidden")
-            time.sleep(0.1)
-            if is_hidden == 'true':
-                time.sleep(0.1)
-                return()
+        self.waits.block_ui_hidden()
 
     def post_query_to_form(self):
         """
@@ -317,9 +455,7 @@ class Queryer(object):
         """
         Locate the 'Run Query' button and click it.
         """
-        time.sleep(3)
-        self._wait_until_dialogue_disappears()
-        self.wait_for_ajax()
+        self.waits.page_idle()
         element = WebDriverWait(self.driver, 20).until(
             ec.element_to_be_clickable((
                 By.NAME, "content_form:btnRunQuery"
@@ -368,13 +504,13 @@ class Queryer(object):
         self.driver.execute_script("arguments[0].click();", element)
 
     def wait_for_ajax(self, second=15):
-        wait = WebDriverWait(self.driver, second)
+        """
+        Wait (at most `second` seconds) until the ajax queue is empty and the
+        document is loaded.
+        """
         try:
-            wait.until(lambda driver: self.driver.execute_script(
-                'return jQuery.active') == 0)
-            wait.until(lambda driver: self.driver.execute_script(
-                'return document.readyState') == 'complete')
-        except Exception as e:
+            self.waits.ajax_idle(timeout=second)
+        except WaitTimeout:
             pass
 
     def _click_show_detailed_view(self):
@@ -382,31 +518,23 @@ class Queryer(object):
         Locate the 'Show Detailed View' button, and
         click it.
         """
-        time.sleep(3)
-        self.wait_for_ajax()
-        self._wait_until_dialogue_disappears()
+        self.waits.page_idle()
 
         element = WebDriverWait(self.driver, 60).until(
             ec.presence_of_element_located((
                 By.XPATH, "//span[contains(.,'Show Detailed View')]"
             )))
-        self._wait_until_dialogue_disappears()
         self.driver.execute_script("arguments[0].click();", element)
-        self.wait_for_ajax()
+        self.waits.page_idle()
         self._check_detailed_view()
-        self._wait_until_dialogue_disappears()
-        time.sleep(3)
+        self.waits.dom_settled()
         self._expand_all()
 
-        for _ in range(1000):
-            time.sleep(0.1)
-            folded_elements = self.driver.find_elements_by_xpath(
+        self.waits.until(
+            lambda driver: len(driver.find_elements_by_xpath(
                 '//*[@class="ui-accordion-header '
-                'ui-helper-reset ui-state-default ui-corner-all"]')
-
-            if len(folded_elements) == 0:
-                time.sleep(0.1)
-                return()
+                'ui-helper-reset ui-state-default ui-corner-all"]')) == 0,
+            'expand_all')
 
     def _check_detailed_view(self):
         """
@@ -446,38 +574,53 @@ class Queryer(object):
         Locate 'display_main' elements, split the element text
         with 'Detailed View' in it and return(the last item in )the list.
         """
-        for i in range(10):
-            titles = self.driver.find_elements_by_id('display_main')
-            for title in titles:
+        def n_entries_loaded(driver):
+            for title in driver.find_elements_by_id('display_main'):
                 if 'Detailed View' in title.text:
-                    n_entries_loaded = int(title.text.split()[5])
-                    return(n_entries_loaded)
+                    return(int(title.text.split()[5]))
 
-            time.sleep(1)
+        try:
+            return(self.waits.until(n_entries_loaded, 'detailed_view',
+                                    timeout=10))
+        except WaitTimeout:
+            return(None)
 
-    def parse_entries(self):
+    def _open_cif_fetcher(self):
+        """
+        Return: (CIFFetcher) fetcher downloading the CIFs over HTTP with the
+                cookies of the browser if `fetch_cif_over_http`, None
+                otherwise
         """
-        Parse all entries resulting from the query.
+        if not self.fetch_cif_over_http:
+            return(None)
 
-        If the number of entries loaded is equal to `self.hits`, raise Error.
-        Loop through all the entries loaded, and for each entry:
+        return(CIFFetcher.from_driver(self.driver, url=self.cif_url))
+
+    def _parse_all_entries(self):
+        """
+        Loop through all the entries loaded (in stages, see `pipeline`), and
+        for each entry:
             a. create a directory named after its ICSD Collection Code
             b. write "meta_data.json" into the directory
             c. save "screenshot.png" into the directory
-            d. export the CIF into the directory
-        Close the browser session and quit.
+            d. export the CIF into the directory (downloaded over HTTP in
+               the background if `fetch_cif_over_http`, see
+               `icsd.cif_fetcher`)
 
         Return: (list) A list of ICSD Collection Codes of entries parsed
         """
-        hit_number = self._get_number_of_entries_loaded()
-        if hit_number != self.hits:
-            self.quit()
-            error_message = '# Hits ({0}) != # Entries: ({1}) in Detailed View'.format(
-                hit_number, self.hits)
-            raise QueryerError(error_message)
+        if self.pipeline and (self.skipcif or self.fetch_cif_over_http):
+            return(super(Queryer, self)._parse_all_entries())
 
-        sys.stdout.write('Parsing all the entries... \n')
-        sys.stdout.flush()
+        return(self._parse_entries_in_sequence())
+
+    def _parse_entries_in_sequence(self):
+        """
+        Parse and save the entries one after another in the browser thread
+        (see `parse_entries`).
+
+        Return: (list) A list of ICSD Collection Codes of entries parsed
+        """
         entries_parsed = []
         for i in range(self.hits):
             # get entry data
@@ -497,25 +640,19 @@ class Queryer(object):
             # save the screenshot the current page into the directory
             if self.save_screenshot:
                 screenshot_file = os.path.join(coll_code, 'screenshot.png')
-                self.save_screenshot(fname=screenshot_file)
+                self.take_screenshot(fname=screenshot_file)
 
-            if self.skipcif == False:
+            if self.skipcif == False and not self.fetch_cif_over_http:
                 self.enable_download_in_headless_chrome(
                     self.driver, self.download_dir)
+                if self.download_watcher is None:
+                    self.download_watcher = DownloadWatcher(
+                        self.download_dir, timeout=self.download_timeout)
                 # get the CIF file
                 self.export_CIF()
-                # uncomment the next few lines for automatic copying of CIF files
-                # into the correct folders
                 # wait for the file download to be completed
                 CIF_name = 'ICSD_CollCode{}.cif'.format(coll_code)
-                CIF_source_loc = os.path.join(self.download_dir, CIF_name)
-
-                for _ in range(1000):
-                    if os.path.exists(CIF_source_loc):
-                        time.sleep(0.1)
-                        break
-                    else:
-                        time.sleep(0.1)
+                CIF_source_loc = self._wait_for_download(CIF_name)
                 # move it into the directory of the current entry
                 CIF_dest_loc = os.path.join(coll_code, '{}.cif'.format(coll_code))
                 shutil.move(CIF_source_loc, CIF_dest_loc)
@@ -526,872 +663,171 @@ class Queryer(object):
             sys.stdout.flush()
             entries_parsed.append(coll_code)
 
-            self.save_entire_page(coll_code)
+            if self.save_source:
+                self.save_entire_page(coll_code)
 
-            if self.hits != 1:
+            record_entry(self, i, coll_code)
+
+            if i + 1 < self.hits:
                 self._go_to_next_entry()
 
-        sys.stdout.write('Closing the browser session and exiting...')
-        sys.stdout.flush()
-        self.quit()
-        sys.stdout.write(' done.\n')
         return(entries_parsed)
 
+    @timed('wait')
+    def _wait_for_download(self, name):
+        """
+        Wait until the browser has downloaded the file `name` completely
+        (see `icsd.download_watcher`), or raise `DownloadTimeout` after
+        `download_timeout` seconds.
+
+        Return: (string) path of the downloaded file
+        """
+        return(self.download_watcher.wait_for([name])[0])
+
     def save_entire_page(self, coll_code):
-        source = self.driver.page_source
+        source = self.get_page_source()
 
         with open("{}/source.html".format(coll_code), "w") as f:
             f.write(source)
 
     def _go_to_next_entry(self):
         """
-        Locate the 'Next' button ('button_vcr_next'), and
-        click it.
+        Locate the 'Next' button ('button_vcr_next'), click it, and wait
+        until the title of the next entry is displayed.
         """
         self.wait_for_ajax()
+        title = self.waits.title()
         element = self.driver.find_element_by_xpath(
             "//button[@id='display_form:buttonNext']/span")
         self.driver.execute_script("arguments[0].click();", element)
-        self.page_obatained = False
+        self.invalidate_page()
+        self.waits.title_changed(title)
 
-    def parse_entry(self):
+    def get_snapshot(self):
         """
-        Parse all `tags.ICSD_PARSE_TAGS` + the ICSD Collection Code for the
-        current entry, and construct a dictionary `parsed_data` with tag:value.
-
-        For each tag in `tags.ICSD_PARSE_TAGS`, call the method named
-        `get_[tag]` or `is_[tag]` depending on whether the value to be parsed is
-        a text field or checkbox, respectively, and raise an Error if the
-        corresponding method is not found.
+        Take the snapshot of the current entry with `SNAPSHOT_SCRIPT` (see
+        `DetailedViewPage.from_bundle`): the titles, the ICSD version, the
+        table of each panel, the state of the page and, if `save_source`,
+        the whole page, in a single `execute_script` call.
+        The call is repeated until the page is ready (no ajax request
+        pending, blockUI dialog hidden, Collection Code in the title), and
+        the snapshot is kept until `invalidate_page`.
 
-        Return: (dict) `parsed_data` with [tag]:[parsed value]
+        Return: (dict) snapshot of the current entry
         """
-        self._wait_until_dialogue_disappears()
-        self.wait_for_ajax()
-        time.sleep(self.interval)
-        parsed_data = {}
-        parsed_data['collection_code'] = self.get_collection_code()
-        for tag in ICSD_PARSE_TAGS.keys():
-            # assume text field
-            method = 'get_{}'.format(tag)
-            try:
-                parsed_data[tag] = getattr(self, method)()
-            except AttributeError:
-                pass
-            else:
-                continue
-
-            # assume checkbox
-            method = 'is_{}'.format(tag)
-            try:
-                parsed_data[tag] = getattr(self, method)()
-            except AttributeError as e:
-                sys.stdout.write('"{}" parser not implemented!\n'.format(tag))
-                print(e)
-                continue
+        if self._snapshot is not None:
+            return(self._snapshot)
 
-        parsed_data['ICSD_version'] = self._get_icsd_ver()
-        parsed_data['theoretical_calculation'] = "Structure calculated theoretically" in parsed_data['comments']
-        parsed_data['crawler_version'] = pkg_resources.get_distribution(
-            "icsd").version
+        def ready_snapshot(driver):
+            bundle = driver.execute_script(SNAPSHOT_SCRIPT, self.save_source)
+            self.n_page_captures += 1
+            self.n_bytes_transferred += bundle.get('transferred', 0)
+            if bundle['idle'] and not bundle['blocked'] and \
+                    self._parse_collection_code(bundle['titles']) is not None:
+                return(bundle)
 
-        return(parsed_data)
+        try:
+            self._snapshot = self.waits.until(ready_snapshot, 'snapshot')
+        except WaitTimeout:
+            error_message = 'Failed to parse the ICSD Collection Code.'
+            print(error_message)
+            self.quit()
+            raise QueryerError(error_message)
 
-    def _get_icsd_ver(self):
-        source = self.driver.page_source
-        search = re.search('<p>(Version[\s0-9.()A-z-]+)</p>', source)
-        if search:
-            return(search.group(1))
+        return(self._snapshot)
 
-        return("")
+    def _load_page(self):
+        return(DetailedViewPage.from_bundle(self.get_snapshot()))
 
-    def get_collection_code(self):
+    def get_page_source(self):
         """
-        Locate 'title' elements, parse the ICSD Collection
-        Code from the element text and raise Error if unsuccessful.
+        Return the HTML source of the current page: the one in the snapshot
+        of the entry if any (see `get_snapshot`), otherwise it is
+        transferred from the WebDriver once until `invalidate_page`.
 
-        Return: (integer) ICSD Collection Code
+        Return: (string) HTML source of the current page
         """
+        if self._page_source is None:
+            if self._snapshot is not None and self._snapshot['source']:
+                self._page_source = self._snapshot['source']
+            else:
+                self._page_source = self.driver.page_source
+                self.n_page_captures += 1
 
-        for _ in range(1000):
-            self.wait_for_ajax()
-            self._wait_until_dialogue_disappears()
-
-            titles = WebDriverWait(self.driver, 20).until(
-                ec.presence_of_all_elements_located((
-                    By.ID, "display_main"
-                )))
-
-            for title in titles:
-                if 'Summary' in title.text:
-                    if len(title.text.split()) > 21:
-                        code = title.text.split()[21]
-                        if code.isdigit():
-                            return(int(code))
-
-            time.sleep(0.1)
+        return(self._page_source)
 
-        error_message = 'Failed to parse the ICSD Collection Code.'
-        print(error_message)
-        self.quit()
-        raise QueryerError(error_message)
+    def invalidate_page(self):
+        super(Queryer, self).invalidate_page()
+        self._page_source = None
+        self._snapshot = None
 
     def get_html_table(self, idx):
-        if not self.page_obatained:
-            self.wait_for_ajax()
-            self.soup = BeautifulSoup(self.driver.page_source, 'lxml')
-            self.page_obatained = True
-
-        table = self.soup.find_all('table')[idx]
-
-        return(str(table))
-
-    def get_html_table_dynamic(self, keywords):
-
-        for keyword in keywords:
-
-            keyword = "</span>{}</div>".format(keyword)
-            if not self.page_obatained:
-                self.wait_for_ajax()
-                self.soup = BeautifulSoup(self.driver.page_source, 'lxml')
-                self.page_obatained = True
-
-            source = self.driver.page_source
-
-            if keyword in source:
-                table = source.split(keyword)[1]
-                return(table)
-
-        raise QueryerError
-
-    # panel: "Summary"
-
-    def get_PDF_number(self):
-        """
-        Locate a 'td' node with the tag name (stored in
-        `tags.ICSD_PARSE_TAGS`), parse the node text.
-
-        Return: (string) PDF-number if available, empty string otherwise
-        """
-        _df = self._get_experimental_information_panel()
-        pdf_number = _df[_df.Name == 'PDF calc.'].Value
-        if len(pdf_number) == 0:
-            return("")
-
-        pdf_number = pdf_number.to_string(index=False)
-        pdf_number = pdf_number.strip()
-        return(pdf_number)
-
-    def get_authors(self):
-        """
-        Locate a 'td' node with the tag name (stored in
-        `tags.ICSD_PARSE_TAGS`), parse the node text.
-
-        Return: (string) Authors if available, empty string otherwise
-        """
-        _df = self._get_summary_panel()
-        author = _df[_df.Name == 'Author'].Value.to_string(index=False)
-        return(author.strip().replace('\n', ' '))
-
-    def get_publication_title(self):
-        """
-        Locate 'Title of Article' ['textfield13'], parse the
-        element text.
-
-        Return: (string) Publication title if available, empty string otherwise
-        """
-        _df = self._get_summary_panel()
-        title = _df[_df.Name == 'Title'].Value.to_string(index=False)
-        return(title.strip().replace('\n', ' '))
-
-    def get_doi(self):
-        _df = self._get_summary_panel()
-        doi = _df[_df.Name == 'DOI'].Value
-        if len(doi) == 0:
-            return("")
-
-        doi = doi.to_string(index=False)
-        return(doi.strip().replace('\n', ' '))
-
-    def get_reference(self):
-        """
-        Locate 'Reference' for the publication ['textfield12'],
-        parse the element text.
-
-        Return: (string) Bibliographic reference if available, empty string
-        otherwise
-        """
-        _df = self._get_summary_panel()
-        reference = _df[_df.Name == 'Reference'].Value.to_string(index=False)
-        return(reference.strip().replace('\n', ' '))
-
-    def get_data_quality(self):
-
-        _df = self._get_summary_panel()
-        quality = _df[_df.Name == 'Data quality'].Value
-        if len(quality) == 0:
-            return("")
-
-        quality = quality.to_string(index=False)
-        return(quality.strip().replace('\n', ' '))
-
-    # panel: "Summary"
-    def _get_summary_panel(self):
-        table = self.get_html_table(idx=0)
-        # This cannot be replaced with dynamic one
-        df = pd.read_html(table)[0]
-        df = self._parse_two_column_table(df)
-        return(df)
-
-    # panel: "Chemistry"
-    def _get_chemistry_panel(self):
-        # table = self.get_html_table(idx=2)
-        table = self.get_html_table_dynamic(["Chemistry"])
-        df = pd.read_html(table)[0]
-        df = self._parse_two_column_table(df)
-        return(df)
-
-    def get_defect(self):
-        """
-        All test data has defect: false
-        """
-
-        return(False)
-
-    def get_chemical_formula(self):
-        """
-        Locate 'Sum Form' ['textfieldChem1'], parse the elemnent
-        text.
-
-        Return: (string) Chemical formula if available, empty string otherwise
-        """
-        _df = self._get_chemistry_panel()
-        formula = _df[_df.Name == 'Sum. formula'].Value.to_string(index=False)
-        return(formula.strip())
-
-    def get_structural_formula(self):
-        """
-        Locate 'Struct. Form.' ['textfieldChem3'], parse the
-        element text.
-
-        Return: (string) Structural formula if available, empty string otherwise
-        """
-        _df = self._get_chemistry_panel()
-        formula = _df[_df.Name == 'Struct. formula'].Value.to_string(
-            index=False)
-        return(formula.strip())
-
-    def get_AB_formula(self):
-        """
-        Locate 'AB Formula' ['textfieldChem6'], parse the element
-        text.
-
-        Return: (string) AB formula if available, empty string otherwise
-        """
-        _df = self._get_chemistry_panel()
-        formula = _df[_df.Name == 'AB formula'].Value.to_string(index=False)
-        return(formula.strip())
-
-    def parse_cell_parameters(self, raw_text):
-        raw_text = raw_text.strip()
-        raw_text = raw_text.replace(" (", "(")
-
-        a, b, c, alpha, beta, gamma = [float(e.split('(')[0].strip('.')) for e
-                                       in raw_text.split()]
-
-        assert a > 0
-        assert b > 0
-        assert c > 0
-        assert alpha > 0
-        assert beta > 0
-        assert gamma > 0
-        assert alpha < 180
-        assert beta < 180
-        assert gamma < 180
-
-        cell_parameters = {'a': a, 'b': b, 'c': c, 'alpha': alpha, 'beta': beta,
-                           'gamma': gamma}
-        return(cell_parameters)
-
-    # panel: "Published Crystal Structure Data"
-    def get_cell_parameters(self):
-        """
-        Locate 'Cell Parameters' ['textfieldPub1'] textfield, get
-        its 'value' attribute, strip uncertainties from the quantities, and
-        construct a cell parameters dictionary.
-
-        Return: (dictionary) Cell parameters with keys 'a', 'b', 'c', 'alpha',
-                'beta', 'gamma', and values in float
-                (Lattice vectors are in Angstrom, angles in degrees.)
-        """
-        _df = self._get_published_crystal_structure_data_panel()
-        raw_text = _df[_df.Name ==
-                       'Cell parameter'].Value.to_string(index=False)
-        cell_parameters = self.parse_cell_parameters(raw_text)
-        return(cell_parameters)
-
-    def get_volume(self):
-        """
-        Locate 'Volume' ['textfieldPub2'], parse its 'value'
-        attribute.
-
-        Return: (float) Volume in cubic Angstrom
-        """
-        _df = self._get_published_crystal_structure_data_panel()
-        raw_text = _df[_df.Name == 'Cell volume'].Value.to_string(index=False)
-        raw_text.strip()
-        raw_text = raw_text.split()[0]
-        volume = float(raw_text)
-
-        return(volume)
-
-    def get_space_group(self):
-        """
-        Locate 'Space Group' ['textfieldPub5'], parse its 'value'
-        attribute.
-
-        Return: (string) Space group if available, empty string otherwise
-        """
-
-        # Published Crystal Structure Data
-        _df = self._get_published_crystal_structure_data_panel()
-        raw_text = _df[_df.Name == 'Space group'].Value.to_string(index=False)
-        raw_text = raw_text.replace(" (", "(")
-        return(raw_text.strip())
-
-    def _get_published_crystal_structure_data_panel(self):
-        table = self.get_html_table_dynamic(["Published Crystal Structure Data"])
-        df = pd.read_html(table)[0]
-        df = self._parse_two_column_table(df)
-        return(df)
-
-    def get_crystal_system(self):
-        """
-        Locate 'Crystal System' ['textfieldPub8'], parse its
-        'value' attribute.
-
-        Return: (string) Crystal system if available, empty string otherwise
-        """
-        # Published Crystal Structure Data
-
-        _df = self._get_published_crystal_structure_data_panel()
-        system = _df[_df.Name == 'Crystal system'].Value.to_string(index=False)
-
-        if system == "Series([], )":
-            return("")
-
-        return(system.strip())
-
-    def get_wyckoff_sequence(self):
-        """
-        Locate 'Wyckoff Sequence' ['textfieldPub11'], parse its
-        'value' attribute.
-
-        Return: (string) Wyckoff sequence if available, empty string otherwise
-        """
-        _df = self._get_published_crystal_structure_data_panel()
-        wyckoff = _df[_df.Name == 'Wyckoff sequence'].Value.to_string(
-            index=False)
-        return(wyckoff.strip())
-
-    def get_formula_units_per_cell(self):
-        """
-        Locate 'Formula Units per Cell' ['textfieldPub3'], parse
-        its 'value' attribute.
-        Return: (integer) Formula units per unit cell
-        """
-        _df = self._get_published_crystal_structure_data_panel()
-        z = _df[_df.Name == 'Z'].Value.to_string(index=False)
-        return(int(z.strip()))
-
-    def get_pearson(self):
-        """
-        details.xhtml > Details
-        > Published Crystal Structure Data > Pearson symbol
-
-        Locate 'Pearson Symbol' ['textfieldPub6'], parse its
-        'value' attribute.
-
-        Return: (string) Pearson symbol if available, empty string otherwise
-        """
-        _df = self._get_published_crystal_structure_data_panel()
-
-        pearson = _df[_df.Name == 'Pearson symbol'].Value.to_string(
-            index=False)
-        return(pearson.strip())
-
-    def get_crystal_class(self):
-        """
-        details.xhtml > Details
-        > Published Crystal Structure Data > Crystal class
-
-        Locate 'Crystal Class' ['textfieldPub9'], parse its 'value'
-        attribute.
-
-        Return: (string) Crystal class if available, empty string otherwise
-        """
-        _df = self._get_published_crystal_structure_data_panel()
-        crystalclass = _df[_df.Name ==
-                           'Crystal class'].Value.to_string(index=False)
-
-        if crystalclass == "Series([], )":
-            return("")
-
-        return(crystalclass.strip())
-
-    def get_structural_prototype(self):
         """
-        Locate 'Structure Type' ['textfieldPub12'], parse its
-        'value' attribute.
-
-        Return: (string) Structure type if available, empty string otherwise
-        """
-        _df = self._get_published_crystal_structure_data_panel()
-        stype = _df[_df.Name == 'Structure type'].Value
-
-        if len(stype) == 0:
-            return("")
-
-        crystalclass = stype.to_string(index=False)
-        return(crystalclass.strip())
-        # return("")
-
-    # panel: "Bibliography"
-    def _get_references(self, n):
-        """
-        Locate 'td' nodes with the tag name (stored in
-        `tags.ICSD_PARSE_TAGS`), parse the text for each node.
-        ['Detailed View' page has text fields for 3 references]
-
-        Arguments:
-            n: which-th reference to parse (= 0/1/2)
-
-        Return: (string) Reference if available, empty string otherwise
-        """
-        tag = 'Reference'
-        xpath = "//td[text()[contains(., '{}')]]/../td/div".format(tag)
-        nodes = self.driver.find_elements_by_xpath(xpath)
-        reference = self._clean_reference_string(nodes[n].text)
-        return(reference)
-
-    def get_reference_1(self):
-        """
-        Parse '1st Reference' on the 'Detailed View' page.
-
-        Return: (string) Reference if available, empty string otherwise
-        """
-        return(self._get_references(0))
-
-    def get_reference_2(self):
-        """
-        '2nd Reference' seems to be abolished on ICSD 4.2.0.
-        Following comments are for previous versions
-
-        Parse '2nd Reference' on the 'Detailed View' page.
-
-        Return: (string) Reference if available, empty string otherwise
-        """
-        return("")  # Abolished
-        # return(self._get_references(1))
-
-    def get_reference_3(self):
-        """
-        '2nd Reference' seems to be abolished on ICSD 4.2.0.
-        Following comments are for previous versions
-
-        Parse '3rd Reference' on the 'Detailed View' page.
-
-        Return: (string) Reference if available, empty string otherwise
-        """
-        return("")  # Abolished
-        # return(self._get_references(2))
-
-    def _clean_reference_string(self, r):
-        """
-        Strip the reference string of unrelated text.
-
-        Arguments:
-            r: Reference string to be cleaned
-
-        Return: (string) r, stripped
+        Return: (string) HTML of the `idx`-th table of the current page
         """
-        r = r.strip()
-        r = r.replace('Northwestern University Library', '').strip()
-        r = r.replace('\n', ' ')
-        return(r)
-
-    def _parse_two_column_table(self, df):
-        if df.shape[1] != 5:
-            print(df)
-
-        assert df.shape[1] == 5
-
-        df1 = df.loc[:, 0:1]
-        df2 = df.loc[:, 3:5]
-
-        df1.columns = ['Name', "Value"]
-        df2.columns = ['Name', "Value"]
-
-        df = pd.concat([df1, df2], axis=0)
-        return(df)
-
-    def _get_additional_info(self, key="Warnings"):
-        # table = self.get_html_table(idx=18)
-        table = self.get_html_table_dynamic(["Additional information"])
-
-        if '<table class="outputcontentpanel"></table>' == table:
-            return([])
-
-        df = pd.read_html(table)[0]
-        df = self._parse_two_column_table(df)
-
-        warnings = df[df.Name == key].Value.tolist()
-        return(warnings)
-
-    # panel: "Warnings & Comments"
-
-    def get_warnings(self):
-        """
-        Locate 'Warnings & Comments' ('ir_a_8_81a3e') block, then
-        use By.XPATH to locate rows in the 'Warnings' table
-        ('.//table/tbody/tr'), add text in each row, if any, to a list.
-
-        Return: (list) A list of warnings if any, empty list otherwise
-        """
-        return(self._get_additional_info("Warnings"))
-
-    def get_comments(self):
-        """
-        Locate 'Warnings & Comments' ('ir_a_8_81a3e') block, then
-        use By.XPATH to locate the individual 'Comments' divs, add text in each
-        div, if any, to a list.
-
-        Return: (list) A list of comments if any, empty list otherwise
-        """
-        return(self._get_additional_info("Comments"))
-
-    # panel: "Experimental Conditions"
-    # text fields
-    def get_temperature(self):
-        """
-        details.xhtml > Details
-        > Experimental information > Temperature
-
-        Locate the 'input' nodes associated with the div name
-        (stored in `tag.ICSD_PARSE_TAGS`), and get the 'value' attribute of the
-        first node.
-
-        Return: (string) Temperature if available, empty string otherwise
-        """
-        _df = self._get_experimental_information_panel()
-        raw_text = _df[_df.Name == 'Temperature'].Value.to_string(index=False)
-        raw_text = raw_text.replace("[", "").replace("]", "")
-        return(raw_text.strip())
-
-    def get_pressure(self):
-        """
-        details.xhtml > Details
-        > Experimental information > Pressure
-
-        Locate the 'input' nodes associated with the div name
-        (stored in `tag.ICSD_PARSE_TAGS`), and get the 'value' attribute of the
-        second node.
-
-        Return: (string) Pressure if available, empty string otherwise
-        """
-        _df = self._get_experimental_information_panel()
-        raw_text = _df[_df.Name == 'Pressure'].Value.to_string(index=False)
-        raw_text = raw_text.replace("[", "").replace("]", "")
-        return(raw_text.strip())
-
-    def get_R_value(self):
-        """
-        details.xhtml > Details
-        > Experimental information > R-value
-
-        Locate the 'input' node with attribute 'text',
-        associated with 'td' node with the tag name (stored in
-        `tags.ICSD_PARSE_TAGS`), get its 'value' attribute.
-
-        Return: (float) R-value if available, None otherwise
-        """
-        _df = self._get_experimental_information_panel()
-        raw_text = _df[_df.Name == 'R-value'].Value.to_string(index=False)
-
-        if raw_text == "Series([], )":
-            return(None)
-
-        raw_text = raw_text.strip()
-        raw_text = raw_text.split("(")[0]
-
-        return(float(raw_text))
-
-    # checkboxes
-    def _is_checkbox_enabled(self, tag_key):
-        """
-        Locate the 'input' node of type 'checkbox' associated
-        with a 'td' node with the tag name (stored in `tags.ICSD_PARSE_TAGS`),
-        and try to get its 'checked' attribute.
-
-        Return: (bool) True if checked, False otherwise
-        """
-        tag = ICSD_PARSE_TAGS[tag_key]
-        xpath = "//*[text()[contains(., '{}')]]".format(tag)
-        xpath += "/../input[@type='checkbox']"
-        node = self.driver.find_element_by_xpath(xpath)
-        if node.get_attribute('checked') is None:
-            return(False)
-        else:
-            return(True)
-
-    def _get_radiation_type(self):
-        """
-        details.xhtml > Details
-        > Experimental information > Radiation type
-        """
-        _df = self._get_experimental_information_panel()
-        rad_type = _df[_df.Name ==
-                       'Radiation type'].Value.to_string(index=False)
-        return(rad_type.strip())
-
-    # subpanel: "Radiation Type"
-    def is_x_ray(self):
-        """
-        Is the 'X-ray' checkbox enabled?
-
-        details.xhtml > Details
-        > Experimental information > Radiation Type
-        """
-        rad_type = self._get_radiation_type()
-
-        return('X-Ray' == rad_type)
-
-    def is_electron_diffraction(self):
-        """
-        Is the 'Electrons' checkbox enabled?
-        """
-        if 'Electron' == self._get_radiation_type():
-            return(True)
-
-        if "Electron microscopy (powder)" in self._get_remarks():
-            return(True)
-
-        return(False)
-
-        # return(self._is_checkbox_enabled('electron_diffraction'))
-
-    def is_neutron_diffraction(self):
-        """
-        Is the 'Neutrons' checkbox enabled?
-        """
-        return('Neutron' == self._get_radiation_type())
-
-    def is_synchrotron(self):
-        """
-        Is the 'Synchrotron' checkbox enabled?
-        """
-        return('Synchrotron' == self._get_radiation_type())
-
-    def _get_bibliography_panel(self):
-        table = self.get_html_table_dynamic(["Bibliography"])
-        df = pd.read_html(table)[0]
-        df = self._parse_two_column_table(df)
-        return(df)
-
-    def get_abstract(self):
-        _df = self._get_bibliography_panel()
-        abstract = _df[_df.Name == 'Abstract'].Value
-
-        if len(abstract) == 0:
-            return("")
-
-        return(abstract.to_string(index=False))
-
-    def _get_experimental_information_panel(self):
-        table = self.get_html_table_dynamic(['Experimental information', 'Theoretical information'])
-        df = pd.read_html(table)[0]
-        df = self._parse_two_column_table(df)
-        return(df)
-
-    def _get_sample_type(self):
-        """
-        details.xhtml > Details
-        > Experimental information > Sample type
-        """
-        _df = self._get_experimental_information_panel()
-        sample_type = _df[_df.Name ==
-                          'Sample type'].Value.to_string(index=False)
-        return(sample_type.strip())
-
-    # subpanel: "Sample Type"
-    def is_powder(self):
-        """
-        Is the 'Powder' checkbox enabled?
-        """
-        return("Powder data" == self._get_sample_type())
-
-    def is_single_crystal(self):
-        """
-        Is the 'Single-Cystal' checkbox enabled?
-        """
-        return("Single crystal" == self._get_sample_type())
-
-    def _get_remarks(self):
-        """
-        details.xhtml > Details
-        > Experimental information > Remarks
-        """
-        df = self._get_experimental_information_panel()
-        remarks = list(df[df.Name == 'Remarks'].Value)
-        remarks = [s.strip() for s in remarks]
-        return(remarks)
-
-    # subpanel: "Additional Information"
-    def is_twinned_crystal_data(self):
-        """
-        Is the 'Twinned Crystal Data' checkbox enabled?
-        """
-        remarks = self._get_remarks()
-        return("Structure determined on a twinned crystal" in remarks)
-
-    def is_rietveld_employed(self):
-        """
-        Is the 'Rietveld Refinement employed' checkbox enabled?
-        """
-        remarks = self._get_remarks()
-        return("Rietveld profile refinement applied" in remarks)
-        return(self._is_checkbox_enabled('rietveld_employed'))
-
-    def is_absolute_config_determined(self):
-        """
-        Is the 'Absolute Configuration Determined' checkbox enabled?
-
-        Needs to check whether "Absolute Configuration Determined" is in remarks or not.
-        """
-        remarks = self._get_remarks()
-        return("Absolute Configuration Determined" in remarks)
-
-    def is_experimental_PDF_number(self):
-        """
-        Is the 'Experimental PDF Number assigned' checkbox enabled?
-        """
-        _df = self._get_experimental_information_panel()
-        return("PDF exp." in _df.columns.values)
-
-    def is_temperature_factors_available(self):
-        """
-        Is the 'Temperature Factors available' checkbox enabled?
-        """
-        remarks = self._get_remarks()
-        return("Temperature factors available" in remarks)
-
-    def is_magnetic_structure_available(self):
-        """
-        Is the 'Magnetic Structure Available' checkbox enabled?
-        """
-        return(False)  # Where can I find this?
-
-    def is_anharmonic_temperature_factors_given(self):
-        """
-        Is the 'Anharmonic temperature factors given' checkbox enabled?
-        """
-        remarks = self._get_remarks()
-        return("Anharmonic temperature factors given" in remarks)
-
-    def is_calculated_PDF_number(self):
-        """
-        Is the 'Calculated PDF Number assigned' checkbox enabled?
-        """
-        _df = self._get_experimental_information_panel()
-        return("PDF calc." in _df.columns.values)
-
-    def is_NMR_data_available(self):
-        """
-        Is the 'NMR Data available' checkbox enabled?
-        """
-        remarks = self._get_remarks()
-        return("NMR spectroscopy data given" in remarks)
-
-    def is_correction_of_previous(self):
-        """
-        Is the 'Correction of Earlier Work' checkbox enabled?
-        """
-        remarks = self._get_remarks()
-        return("This publication corrects errors in an earlier one" in remarks)
-
-    def is_cell_constants_without_sd(self):
-        """
-        Is the 'Cell Constants without s.d.' checkbox enabled?
-        """
-        remarks = self._get_remarks()
-        return("Standard deviation missing in cell constants" in remarks)
+        if self._page_source is None:
+            self.wait_for_ajax()
 
-    def is_only_cell_and_structure_type(self):
-        """
-        Is the 'Only Cell and Structure Type Determined' checkbox enabled?
-        """
-        remarks = self._get_remarks()
-        return("Cell and Type only determined" in remarks)
+        table = html.fromstring(self.get_page_source()).xpath('//table')[idx]
+        return(html.tostring(table, encoding='unicode', with_tail=False))
 
-    # subpanel: "Properties of Structure"
-    def is_polytype(self):
+    def export_selected_CIFs(self):
         """
-        Is the 'Polytype Structure' checkbox enabled?
-        """
-        remarks = self._get_remarks()
-        return("Polytype structure" in remarks)
+        Locate the CIF export button of the 'List View', click it, and wait
+        for the export of all the selected entries (one multi-block CIF, or
+        a ZIP archive of CIFs) to be downloaded.
 
-    def is_is_prototype_structure(self):
-        """
-        Is the 'Prototype Structure Type' checkbox enabled?
+        Return: (string) path of the downloaded file
         """
-        remarks = self._get_remarks()
-        for remark in remarks:
-            if "rototype" in remark:
-                return(True)
+        self.enable_download_in_headless_chrome(self.driver, self.download_dir)
+        watcher = DownloadWatcher(self.download_dir,
+                                  timeout=self.download_timeout * 3)
 
-        return(False)
-
-    def is_order_disorder(self):
-        """
-        Is the 'Order/Disorder Structure' checkbox enabled?
-        """
-        remarks = self._get_remarks()
-        return("Order-disorder structure" in remarks)
-
-    def is_modulated_structure(self):
-        """
-        Is the 'Modulated Structure' checkbox enabled?
-        """
-        remarks = self._get_remarks()
-        return("Modulated structure" in remarks)
+        try:
+            self.waits.page_idle()
+            element = self.driver.find_element_by_xpath(
+                "//button[contains(@id, 'DownloadCif')]/span[2]")
+            self.driver.execute_script("arguments[0].click();", element)
+            return(watcher.wait_for_new())
+        finally:
+            watcher.close()
+
+    def parse_selection(self, quit=True):
+        """
+        Parse all the entries selected in the 'List View' (see
+        `parse_entries`). If `batch_cif`, their CIFs are exported at once
+        before opening the 'Detailed View', instead of one by one; the
+        entries missing from the export are neither recorded as crawled nor
+        returned, and are crawled again.
 
-    def is_disordered(self):
-        """
-        Is the 'Disordered Structure' checkbox enabled?
-        """
-        remarks = self._get_remarks()
-        return("Disordered structure that cannot adequately be described by numerical parameters" in remarks)
+        Keyword arguments:
+            quit: (default: True) see `parse_entries`
 
-    def is_mineral(self):
-        """
-        Is the 'Mineral' checkbox enabled?
+        Return: (list) A list of ICSD Collection Codes of entries parsed
         """
-        df = self._get_chemistry_panel()
-        if "Mineral name" in df.Name.values:
-            return(True)
+        if self.skipcif or not self.batch_cif:
+            self._click_show_detailed_view()
+            return(self.parse_entries(quit=quit))
 
-        return(False)
+        path = self.export_selected_CIFs()
+        self.batch_cifs = read_cif_batch(path)
+        os.remove(path)
+        self._click_show_detailed_view()
+        self.skipcif = True
+        try:
+            entries_parsed = self.parse_entries(quit=quit)
+        finally:
+            self.skipcif = False
+            batch_cifs, self.batch_cifs = self.batch_cifs, None
+
+        # the entries are saved with their CIF (see `record_entry`)
+        missing = [c for c in entries_parsed if c not in batch_cifs]
+        if missing:
+            sys.stdout.write('CIF missing from the export, to be crawled '
+                             'again: {}\n'.format(', '.join(missing)))
+            sys.stdout.flush()
 
-    def is_is_structure_prototype(self):
-        """
-        Is the 'Structure Prototype' checkbox enabled?
-        """
-        # table = self.get_html_table(idx=7)
-        table = self.get_html_table_dynamic(['Standardized Crystal Structure Data'])
-        df = pd.read_html(table)[0]
-        df = self._parse_two_column_table(df)
-        return("Transformation info" in df.columns.values)
+        return([c for c in entries_parsed if c in batch_cifs])
 
     def export_CIF(self, base_filename='ICSD_Coll_Code'):
         """
@@ -1412,7 +848,7 @@ class Queryer(object):
             "//button[@id='display_form:btnEntryDownloadCif']/span[2]")
         self.driver.execute_script("arguments[0].click();", element)
 
-    def save_screenshot(self, size=None, fname='ICSD.png'):
+    def take_screenshot(self, size=None, fname='ICSD.png'):
         """
         Save screenshot of the current page.
 
@@ -1428,8 +864,16 @@ class Queryer(object):
         self.driver.save_screenshot(fname)
 
     def quit(self):
+        if self.cif_fetcher is not None:
+            self.cif_fetcher.close()
+            self.cif_fetcher = None
+        if self.download_watcher is not None:
+            self.download_watcher.close()
+            self.download_watcher = None
         self.driver.stop_client()
         self.driver.quit()
+        if self._remove_browser_data:
+            shutil.rmtree(self.browser_data_dir, ignore_errors=True)
 
     def perform_icsd_query(self):
         """
@@ -1443,5 +887,5 @@ class Queryer(object):
         self.select_structure_source()
         self.post_query_to_form()
         self._click_select_all()
-        self._click_show_detailed_view()
-        return(self.parse_entries())
+        return(self.parse_selection())
+
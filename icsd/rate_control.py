@@ -0,0 +1,221 @@
+"""
+Adaptive pace of a crawl: additive increase / multiplicative decrease (AIMD)
+of the number of codes queried at once and of the pause before each entry,
+driven by the latency of the entries and by the errors of the queries.
+The state is kept in a JSON file, so that a restarted crawl resumes at the
+pace the server last tolerated; the latencies are measured anew.
+"""
+import os
+import json
+import time
+import threading
+import requests
+from selenium.common.exceptions import TimeoutException
+from icsd.entry_parser import HitCountMismatch
+from icsd.waits import WaitTimeout
+from icsd.download_watcher import DownloadTimeout
+
+
+# HTTP statuses of an overloaded (or throttling) server
+OVERLOAD_STATUSES = (429, 500, 502, 503, 504)
+
+_TIMEOUTS = (WaitTimeout, DownloadTimeout, TimeoutException,
+             requests.Timeout, requests.ConnectionError)
+
+
+def classify_error(error):
+    """
+    Return: (string) class of a failure of a query:
+            "mismatch" if the 'Detailed View' missed some of the hits,
+            "overload" for timeouts, dropped connections and HTTP statuses
+            of an overloaded server, "error" otherwise
+    """
+    if isinstance(error, HitCountMismatch):
+        return('mismatch')
+    if isinstance(error, _TIMEOUTS) or \
+            isinstance(error.__cause__, _TIMEOUTS) or \
+            getattr(error, 'status', None) in OVERLOAD_STATUSES:
+        return('overload')
+
+    return('error')
+
+
+class RateController(object):
+    """
+    AIMD controller of the batch size (number of codes per query) and of the
+    interval (seconds before each entry) of a crawl, shared by its workers.
+
+    - A successful batch adds `increase` to the batch size, and clears the
+      backoff.
+    - Entries parsed at a normal pace remove `interval_step` from the
+      interval; entries slower than `slow_factor` times the fastest recent
+      pace double it. The fastest pace is relaxed by `relax` after each
+      batch, so that an old record does not hold the crawl back for ever.
+    - A hit-count mismatch halves the batch size.
+    - An overload halves the batch size, doubles the interval and doubles
+      the backoff (the pause before the next query), from `base_backoff`
+      up to `max_backoff`.
+    - Any other error halves the batch size, with a pause of `base_backoff`.
+    """
+
+    def __init__(self, max_batch=100, min_batch=1, increase=None,
+                 decrease=0.5, interval_step=0.5, max_interval=30,
+                 base_backoff=60, max_backoff=1800, slow_factor=3.0,
+                 relax=0.1, state_file=None):
+        """
+        Keyword arguments:
+            max_batch: (default: 100) maximum number of codes per query
+            min_batch: (default: 1) minimum number of codes per query
+            increase: (default: None) codes added to the batch size after a
+                      successful batch (default: a tenth of `max_batch`)
+            decrease: (default: 0.5) factor of the batch size after a failure
+            interval_step: (default: 0.5) seconds removed from the interval
+                           after a successful batch, and minimum interval
+                           after an overload
+            max_interval: (default: 30) maximum interval in seconds
+            base_backoff: (default: 60) seconds to pause after a failure
+            max_backoff: (default: 1800) maximum pause in seconds
+            slow_factor: (default: 3.0) ratio to the fastest recent pace
+                         over which the entries are too slow
+            relax: (default: 0.1) fraction by which the fastest pace moves
+                   towards the average pace after each batch
+            state_file: (default: None) JSON file the state is saved into
+                        after each change (not saved if None)
+
+        Attributes:
+            batch: current batch size (float, see `batch_size`)
+            interval: current seconds to pause before each entry
+            backoff: seconds to pause before the next query after a failure
+            latency: moving average of the seconds per entry
+            fastest: fastest recent seconds per entry
+            n_errors: number of failures of each class (see
+                      `classify_error`)
+        """
+        self.max_batch = max_batch
+        self.min_batch = min_batch
+        self.increase = increase if increase is not None \
+            else max(1, max_batch / 10.0)
+        self.decrease = decrease
+        self.interval_step = interval_step
+        self.max_interval = max_interval
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.slow_factor = slow_factor
+        self.relax = relax
+        self.state_file = state_file
+
+        self.batch = float(max_batch)
+        self.interval = 0.0
+        self.backoff = 0.0
+        self.latency = None
+        self.fastest = None
+        self.n_errors = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, state_file, **kwargs):
+        """
+        Arguments:
+            state_file: JSON file of the state saved by a previous crawl
+
+        Keyword arguments: see `RateController`
+
+        Return: (RateController) a controller resuming from the state saved
+                in `state_file` (if any), within the limits of `kwargs`
+        """
+        controller = cls(state_file=state_file, **kwargs)
+        if state_file is None or not os.path.exists(state_file):
+            return(controller)
+
+        try:
+            with open(state_file) as f:
+                state = json.load(f)
+        except ValueError:
+            return(controller)
+
+        controller.batch = float(state.get('batch', controller.batch))
+        controller.interval = float(state.get('interval', 0.0))
+        controller.backoff = float(state.get('backoff', 0.0))
+        controller.n_errors = state.get('n_errors', {})
+        controller._clamp()
+        return(controller)
+
+    @property
+    def batch_size(self):
+        """
+        Return: (int) number of codes to query at once
+        """
+        return(int(self.batch))
+
+    def _clamp(self):
+        self.batch = min(max(self.batch, self.min_batch), self.max_batch)
+        self.interval = min(max(self.interval, 0.0), self.max_interval)
+        self.backoff = min(max(self.backoff, 0.0), self.max_backoff)
+
+    def _slow_down(self):
+        self.interval = max(self.interval * 2, self.interval_step)
+
+    def record_success(self, n_entries, seconds):
+        """
+        Record a batch of `n_entries` entries parsed in `seconds` (from the
+        'Detailed View' on, without the time spent on the query).
+        """
+        with self._lock:
+            previous = self._state()
+            self.backoff = 0.0
+            self.batch += self.increase
+            if n_entries > 0:
+                pace = float(seconds) / n_entries
+                self.latency = pace if self.latency is None \
+                    else 0.7 * self.latency + 0.3 * pace
+                self.fastest = pace if self.fastest is None else min(
+                    pace, self.fastest +
+                    self.relax * max(self.latency - self.fastest, 0))
+
+            if self.latency is not None and \
+                    self.latency > self.slow_factor * self.fastest:
+                self._slow_down()
+            else:
+                self.interval -= self.interval_step
+            self._clamp()
+            self._save_if_changed(previous)
+
+    def record_error(self, error):
+        """
+        Record the failure of a query.
+
+        Return: (float) seconds to pause before the next query
+        """
+        kind = classify_error(error)
+        with self._lock:
+            previous = self._state()
+            self.n_errors[kind] = self.n_errors.get(kind, 0) + 1
+            self.batch *= self.decrease
+            if kind == 'overload':
+                self._slow_down()
+                self.backoff = max(self.backoff * 2, self.base_backoff)
+            elif kind == 'error':
+                self.backoff = self.base_backoff
+            self._clamp()
+            self._save_if_changed(previous)
+            # a smaller batch is enough after a mismatch
+            return(0 if kind == 'mismatch' else self.backoff)
+
+    def _state(self):
+        return({
+            'batch': self.batch,
+            'interval': self.interval,
+            'backoff': self.backoff,
+            'n_errors': dict(self.n_errors),
+        })
+
+    def _save_if_changed(self, previous):
+        state = self._state()
+        if self.state_file is None or state == previous:
+            return
+
+        state['updated'] = time.strftime('%Y-%m-%dT%H:%M:%S')
+        part = '{}.part'.format(self.state_file)
+        with open(part, 'w') as fw:
+            json.dump(state, fw, indent=2)
+        os.replace(part, self.state_file)
@@ -0,0 +1,164 @@
+import os
+import sys
+import glob
+import json
+from multiprocessing import Pool
+from tqdm import tqdm
+from icsd import entry_parser, detailed_view, extraction
+from icsd.entry_parser import EntryParser
+from tags import parse_tags_file
+
+
+# Files whose changes can alter the output of `EntryParser.parse_fields`.
+# An entry parsed before the last change of any of them is parsed again.
+PARSER_FILES = [
+    os.path.abspath(entry_parser.__file__),
+    os.path.abspath(detailed_view.__file__),
+    os.path.abspath(extraction.__file__),
+    parse_tags_file,
+]
+
+
+class SavedPage(EntryParser):
+    """
+    Parse the 'Detailed View' page saved by `Queryer.save_entire_page`
+    without a WebDriver.
+    """
+
+    def __init__(self, source_file):
+        """
+        Arguments:
+            source_file: path to a saved "source.html"
+        """
+        super(SavedPage, self).__init__()
+        with open(source_file, 'r') as fr:
+            self.source = fr.read()
+
+    def get_page_source(self):
+        return(self.source)
+
+
+def parser_mtime():
+    """
+    Return: (float) last modification time of the parser (see `PARSER_FILES`)
+    """
+    return(max(os.path.getmtime(p) for p in PARSER_FILES))
+
+
+def is_up_to_date(entry_dir, since):
+    """
+    Check if "meta_data.json" of an entry is newer than both its
+    "source.html" and the parser.
+
+    Arguments:
+        entry_dir: directory of the entry, named after its Collection Code
+        since: modification time of the parser (see `parser_mtime`)
+
+    Return: (bool) True if the entry does not need to be parsed again
+    """
+    json_file = os.path.join(entry_dir, 'meta_data.json')
+    if not os.path.exists(json_file):
+        return(False)
+
+    source_file = os.path.join(entry_dir, 'source.html')
+    json_mtime = os.path.getmtime(json_file)
+    return(json_mtime > os.path.getmtime(source_file) and json_mtime > since)
+
+
+def reparse_entry(entry_dir):
+    """
+    Parse "source.html" of an entry and (over)write its "meta_data.json".
+
+    Arguments:
+        entry_dir: directory of the entry, named after its Collection Code
+
+    Return: (tuple) (entry_dir, error message or None)
+    """
+    try:
+        entry_data = SavedPage(
+            os.path.join(entry_dir, 'source.html')).parse_fields()
+    except Exception as e:
+        return(entry_dir, '{}: {}'.format(type(e).__name__, e))
+
+    coll_code = str(entry_data['collection_code'])
+    if coll_code != os.path.basename(os.path.normpath(entry_dir)):
+        error_message = 'Collection Code in the page ({}) does not match '\
+            'the directory'.format(coll_code)
+        return(entry_dir, error_message)
+
+    # write to a temporary file first, so that an interrupted run never
+    # leaves a truncated "meta_data.json" behind
+    json_file = os.path.join(entry_dir, 'meta_data.json')
+    tmp_file = json_file + '.tmp'
+    with open(tmp_file, 'w') as fw:
+        json.dump(entry_data, fw, indent=2)
+    os.replace(tmp_file, json_file)
+
+    return(entry_dir, None)
+
+
+def find_entries(directory='.', codes=None, force=False):
+    """
+    List the entry directories in `directory` to be parsed again.
+
+    Keyword arguments:
+        directory: (default: '.') directory the crawler ran in
+        codes: (default: None) only consider these Collection Codes
+        force: (default: False) also include the up-to-date entries
+
+    Return: (list) Entry directories
+    """
+    if codes:
+        paths = [os.path.join(directory, str(c), 'source.html') for c in codes]
+        paths = [p for p in paths if os.path.exists(p)]
+    else:
+        paths = glob.glob(os.path.join(directory, '*', 'source.html'))
+
+    entry_dirs = sorted(os.path.dirname(p) for p in paths)
+
+    if force:
+        return(entry_dirs)
+
+    since = parser_mtime()
+    return([d for d in entry_dirs if not is_up_to_date(d, since)])
+
+
+def reparse_all(directory='.', codes=None, force=False, processes=None):
+    """
+    Rebuild "meta_data.json" of crawled entries from their "source.html",
+    spreading the entries over a pool of `processes` worker processes.
+
+    Keyword arguments:
+        directory: (default: '.') directory the crawler ran in
+        codes: (default: None) only parse these Collection Codes
+        force: (default: False) parse the up-to-date entries as well
+        processes: (default: None) number of worker processes
+                   (None uses all the CPU cores)
+
+    Return: (dict) Entry directories that failed, with the error messages
+    """
+    entry_dirs = find_entries(directory, codes=codes, force=force)
+    sys.stdout.write('{} entries to parse.\n'.format(len(entry_dirs)))
+    sys.stdout.flush()
+
+    failed = {}
+    if len(entry_dirs) == 0:
+        return(failed)
+
+    with Pool(processes) as pool:
+        results = pool.imap_unordered(reparse_entry, entry_dirs, chunksize=16)
+        for entry_dir, error in tqdm(results, total=len(entry_dirs)):
+            if error is not None:
+                failed[entry_dir] = error
+
+    for entry_dir, error in sorted(failed.items()):
+        sys.stdout.write('{}: {}\n'.format(entry_dir, error))
+    sys.stdout.write('{} parsed, {} failed.\n'.format(
+        len(entry_dirs) - len(failed), len(failed)))
+    sys.stdout.flush()
+
+    return(failed)
+
+
+def main(codes=None, force=False, processes=None):
+    reparse_all('.', codes=codes, force=force, processes=processes)
@@ -0,0 +1,172 @@
+"""
+Long-lived browser session crawling ranges of ICSD Collection Codes one
+after another, without relaunching Chrome for each range.
+"""
+import time
+import logging
+from icsd.queryer import Queryer
+from icsd.http_queryer import HttpQueryer
+from icsd.coverage import format_code_ranges
+from tags import ICSD_QUERY_TAGS
+
+
+class CrawlSession(object):
+    """
+    A `Queryer` kept open across code ranges: after a range has been parsed,
+    the session goes back to the search form and submits the next range in
+    the same browser. The browser is relaunched only after a failure.
+
+    The structure source ("All Structures") is selected once per browser;
+    the content selection is kept by the ICSD for the rest of the session.
+    """
+
+    def __init__(self, instrument=False, browser_data_dir=None,
+                 skipcif=True, lean=False, batch_cif=False, url=None,
+                 engine='browser', journal=None, cif_over_http=False):
+        """
+        Keyword arguments:
+            instrument: (default: False) see `Queryer`
+            browser_data_dir: (default: None) see `Queryer`
+            skipcif: (default: True) whether the CIFs are not downloaded
+            lean: (default: False) see `Queryer`
+            batch_cif: (default: False) whether the CIFs of each range are
+                       exported at once (see `Queryer.parse_selection`)
+            url: (default: None) URL of the search page (see `Queryer`)
+            engine: (default: 'browser') 'browser' to drive Chrome with a
+                    `Queryer`, 'http' to replay the forms with an
+                    `HttpQueryer` (see `icsd.http_queryer`)
+            journal: (default: None) `CrawlJournal` the queries and the
+                     entries saved are recorded into (see `icsd.journal`)
+            cif_over_http: (default: False) whether the browser sessions
+                           download the CIFs over HTTP (see
+                           `Queryer.fetch_cif_over_http`)
+
+        Attributes:
+            queryer: `Queryer` (or `HttpQueryer`) of the open session, None
+                     if closed
+            interval: (default: 0) seconds to pause before parsing each
+                      entry (see `Queryer`), set by the crawler before each
+                      range (see `icsd.rate_control`)
+            entries_seconds: seconds spent on the entries of the last query,
+                             from the 'Detailed View' on (the pace of the
+                             entries, without the query, for the crawler)
+            n_launches: number of browsers launched
+            instrumentation_file: (default: None) JSON file for the summary
+                                  of instrumentation (default: see `Queryer`)
+        """
+        self.instrument = instrument
+        self.browser_data_dir = browser_data_dir
+        self.skipcif = skipcif
+        self.lean = lean
+        self.batch_cif = batch_cif
+        self.url = url
+        self.engine = engine
+        self.journal = journal
+        self.cif_over_http = cif_over_http
+        self.queryer = None
+        self.interval = 0
+        self.entries_seconds = 0
+        self.n_launches = 0
+        self.instrumentation_file = None
+
+    def _launch(self):
+        if self.engine == 'http':
+            queryer = HttpQueryer(url=self.url, structure_source="A",
+                                  instrument=self.instrument)
+        else:
+            queryer = Queryer(url=self.url, structure_source="A",
+                              instrument=self.instrument,
+                              browser_data_dir=self.browser_data_dir,
+                              lean=self.lean)
+            queryer.fetch_cif_over_http = self.cif_over_http
+        if self.instrumentation_file:
+            queryer.instrumentation_file = self.instrumentation_file
+        queryer.select_structure_source()
+        self.n_launches += 1
+        return(queryer)
+
+    def _new_search(self):
+        """
+        Go back to the 'Basic Search & Retrieve' form.
+        """
+        if self.engine == 'http':
+            self.queryer.new_search()
+            return
+
+        self.queryer.invalidate_page()
+        self.queryer.driver.get(self.queryer.url)
+        self.queryer._check_basic_search()
+
+    def crawl(self, first_code, last_code):
+        """
+        Search the code range, and parse all its entries (see
+        `crawl_codes`).
+
+        Arguments:
+            first_code: first ICSD Collection Code of the range
+            last_code: last ICSD Collection Code of the range
+
+        Return: (list) A list of ICSD Collection Codes of entries parsed
+        """
+        return(self.crawl_codes(((first_code, last_code),)))
+
+    def crawl_codes(self, code_ranges):
+        """
+        Search the code ranges at once (see `icsd.coverage`), and parse all
+        their entries (see `Queryer.parse_entries`). On failure, the browser
+        is closed, and a new one is launched for the next query.
+
+        Arguments:
+            code_ranges: ranges (first, last) of ICSD Collection Codes
+
+        Return: (list) A list of ICSD Collection Codes of entries parsed
+        """
+        codes = format_code_ranges(code_ranges)
+        try:
+            if self.queryer is None:
+                self.queryer = self._launch()
+            else:
+                self._new_search()
+
+            queryer = self.queryer
+            queryer.skipcif = self.skipcif
+            queryer.batch_cif = self.batch_cif
+            queryer.interval = self.interval
+            if self.engine == 'http':
+                queryer.http.set_field(
+                    ICSD_QUERY_TAGS['icsd_collection_code'], codes)
+            else:
+                textbox = queryer.driver.find_element_by_id(
+                    ICSD_QUERY_TAGS['icsd_collection_code'])
+                textbox.clear()
+                textbox.send_keys(codes)
+            queryer._run_query()
+            queryer._check_list_view()
+            queryer._click_select_all()
+            cursor = None
+            if self.journal is not None:
+                cursor = self.journal.begin(code_ranges, queryer.hits)
+                queryer.journal_cursor = cursor
+
+            start = time.time()
+            entries_parsed = queryer.parse_selection(quit=False)
+            self.entries_seconds = time.time() - start
+            queryer.journal_cursor = None
+            if cursor is not None:
+                cursor.finish()
+            return(entries_parsed)
+        except Exception:
+            logging.warning('Closing the browser after a failure on {}'
+                            .format(codes))
+            self.close()
+            raise
+
+    def close(self):
+        if self.queryer is None:
+            return
+
+        try:
+            self.queryer.quit()
+        except Exception:
+            pass
+        self.queryer = None
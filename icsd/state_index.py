@@ -0,0 +1,203 @@
+"""
+On-disk index of the state of a crawl (SQLite): the ICSD Collection Codes
+enumerated into "combined/*.csv" and whether each has been crawled. The
+enumerations are read again only when their files change, and the entries
+are marked as crawled as they are saved, so that the crawler refreshes its
+lists from the codes changed since its last refresh, instead of reading
+every enumeration and listing every entry directory.
+"""
+import os
+import sqlite3
+import threading
+import pandas as pd
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS codes (
+    code INTEGER PRIMARY KEY,
+    source TEXT,  -- enumeration the code was read from (NULL if none)
+    crawled INTEGER NOT NULL DEFAULT 0,
+    seq INTEGER NOT NULL  -- change counter at the last change
+);
+CREATE INDEX IF NOT EXISTS codes_seq ON codes (seq);
+CREATE TABLE IF NOT EXISTS sources (
+    path TEXT PRIMARY KEY,
+    mtime REAL NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO counters VALUES ('seq', 0);
+INSERT OR IGNORE INTO counters VALUES ('imported', 0);
+"""
+
+
+def mark_crawled(codes, path='crawl_state.sqlite'):
+    """
+    Mark the ICSD Collection Codes `codes` as crawled in the index at `path`,
+    if there is one: for the entries saved outside of a crawl (e.g. by
+    `icsd scrape --code`, or copied by `icsd merge`).
+    """
+    if not os.path.exists(path):
+        return
+
+    state = StateIndex(path)
+    try:
+        state.mark_crawled(codes)
+    finally:
+        state.close()
+
+
+class StateIndex(object):
+    """
+    SQLite index of the codes of a crawl, shared by its threads. Each change
+    is stamped with an increasing counter (`seq`), see `changes`.
+    """
+
+    def __init__(self, path='crawl_state.sqlite'):
+        """
+        Keyword arguments:
+            path: (default: "crawl_state.sqlite") SQLite file of the index
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        with self.conn:
+            self.conn.executescript(SCHEMA)
+
+    @property
+    def imported(self):
+        """
+        Return: (bool) whether the entries crawled before the index existed
+                have been imported (see `import_crawled`)
+        """
+        with self._lock:
+            return(bool(self.conn.execute(
+                "SELECT value FROM counters WHERE name = 'imported'")
+                .fetchone()[0]))
+
+    def _next_seq(self):
+        self.conn.execute("UPDATE counters SET value = value + 1 "
+                          "WHERE name = 'seq'")
+        return(self.conn.execute("SELECT value FROM counters "
+                                 "WHERE name = 'seq'").fetchone()[0])
+
+    def _read_codes(self, path):
+        if os.stat(path).st_size == 0:
+            return([])
+        return(pd.read_csv(path)['Coll. Code'].tolist())
+
+    def _enumerated_elsewhere(self, path, codes, chunk=500):
+        duplicates = []
+        for i in range(0, len(codes), chunk):
+            part = [int(c) for c in codes[i:i + chunk]]
+            duplicates += [c for c, in self.conn.execute(
+                'SELECT code FROM codes WHERE source IS NOT NULL '
+                'AND source != ? AND code IN ({})'.format(
+                    ','.join('?' * len(part))), [path] + part)]
+        return(duplicates)
+
+    def sync_enumeration(self, paths):
+        """
+        Read the enumerations (CSV files with a "Coll. Code" column, see
+        `icsd.collection_coder`) new or modified since the last call.
+
+        Arguments:
+            paths: paths of the CSV files
+
+        Return: (list) paths of the files read
+        """
+        with self._lock:
+            known = dict(((p, (m, s)) for p, m, s in self.conn.execute(
+                'SELECT path, mtime, size FROM sources')))
+
+        changed = []
+        for path in sorted(paths):
+            stat = os.stat(path)
+            if known.get(path) == (stat.st_mtime, stat.st_size):
+                continue
+
+            codes = self._read_codes(path)
+            with self._lock, self.conn:
+                seq = self._next_seq()
+                duplicates = self._enumerated_elsewhere(path, codes)
+                assert not duplicates, \
+                    'Codes of {} already enumerated: {}'.format(
+                        path, duplicates[:10])
+                # no upsert (ON CONFLICT) before SQLite 3.24
+                self.conn.executemany(
+                    'INSERT OR IGNORE INTO codes (code, source, seq) '
+                    'VALUES (?, ?, ?)',
+                    [(int(c), path, seq) for c in codes])
+                self.conn.executemany(
+                    'UPDATE codes SET source = ?, seq = ? '
+                    'WHERE code = ? AND source IS NULL',
+                    [(path, seq, int(c)) for c in codes])
+                self.conn.execute(
+                    'INSERT OR REPLACE INTO sources VALUES (?, ?, ?)',
+                    (path, stat.st_mtime, stat.st_size))
+            changed.append(path)
+
+        return(changed)
+
+    def mark_crawled(self, codes):
+        """
+        Mark the ICSD Collection Codes `codes` as crawled, in a single
+        transaction.
+        """
+        codes = [int(c) for c in codes]
+        if not codes:
+            return
+
+        with self._lock, self.conn:
+            self._mark_crawled(codes)
+
+    def _mark_crawled(self, codes):
+        seq = self._next_seq()
+        self.conn.executemany(
+            'INSERT OR IGNORE INTO codes (code, crawled, seq) VALUES (?, 1, ?)',
+            [(c, seq) for c in codes])
+        self.conn.executemany(
+            'UPDATE codes SET crawled = 1, seq = ? '
+            'WHERE code = ? AND crawled = 0',
+            [(seq, c) for c in codes])
+
+    def import_crawled(self, codes):
+        """
+        Mark the ICSD Collection Codes of the entries crawled before the
+        index existed as crawled, and the index as `imported`, in a single
+        transaction: an import cut short is done again by the next crawl.
+        """
+        codes = [int(c) for c in codes]
+        with self._lock, self.conn:
+            if codes:
+                self._mark_crawled(codes)
+            self.conn.execute("UPDATE counters SET value = 1 "
+                              "WHERE name = 'imported'")
+
+    def changes(self, since=0):
+        """
+        Arguments:
+            since: (default: 0) counter of the last changes seen (0 for all
+                   the codes)
+
+        Return: (tuple) counter of the last change, and the list of
+                (code, enumerated, crawled) changed since `since`, by code
+        """
+        with self._lock:
+            seq = self.conn.execute("SELECT value FROM counters "
+                                    "WHERE name = 'seq'").fetchone()[0]
+            rows = self.conn.execute(
+                'SELECT code, source IS NOT NULL, crawled FROM codes '
+                'WHERE seq > ? AND seq <= ? ORDER BY code',
+                (since, seq)).fetchall()
+
+        return(seq, [(c, bool(e), bool(k)) for c, e, k in rows])
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
@@ -0,0 +1,153 @@
+"""
+Event-driven waits on the ICSD web interface: each wait polls a readiness
+signal of the page (PrimeFaces ajax queue, blockUI dialog, title, DOM
+mutations) and returns as soon as it is met, instead of sleeping for a fixed
+time.
+"""
+import time
+from icsd.entry_parser import QueryerError
+from icsd.instrumentation import Instrumentation
+
+
+# true when no ajax request is queued or running (and, if arguments[0] is
+# true, when the blockUI dialog is hidden)
+IDLE_SCRIPT = """
+var queue = window.PrimeFaces && PrimeFaces.ajax && PrimeFaces.ajax.Queue;
+if (queue && !queue.isEmpty()) { return false; }
+if (window.jQuery && jQuery.active !== 0) { return false; }
+if (document.readyState !== 'complete') { return false; }
+if (arguments[0]) {
+    var dialog = document.getElementById('dlgBlockUI');
+    if (dialog && dialog.getAttribute('aria-hidden') !== 'true') {
+        return false;
+    }
+}
+return true;
+"""
+
+# milliseconds since the last DOM mutation (the observer is installed on the
+# first call on a page)
+QUIET_SCRIPT = """
+if (!window.__icsdMutations) {
+    window.__icsdMutations = {last: Date.now()};
+    new MutationObserver(function() {
+        window.__icsdMutations.last = Date.now();
+    }).observe(document.documentElement, {
+        childList: true, subtree: true, attributes: true,
+        characterData: true});
+}
+return Date.now() - window.__icsdMutations.last;
+"""
+
+
+class WaitTimeout(QueryerError):
+    pass
+
+
+class Waiter(object):
+    """
+    Block until the page is ready, then return immediately.
+
+    The time each wait took is recorded in `instrumentation` as
+    ('wait', [name of the wait]).
+    """
+
+    def __init__(self, driver, timeout=60, poll=0.05, instrumentation=None):
+        """
+        Arguments:
+            driver: Selenium WebDriver
+
+        Keyword arguments:
+            timeout: (default: 60) default timeout of a wait in seconds
+            poll: (default: 0.05) seconds between two checks of a signal
+            instrumentation: (default: None) `Instrumentation` to record the
+                             waits into (default: a new one)
+        """
+        self.driver = driver
+        self.timeout = timeout
+        self.poll = poll
+        if instrumentation is None:
+            instrumentation = Instrumentation()
+        self.instrumentation = instrumentation
+
+    def until(self, condition, name, timeout=None):
+        """
+        Poll `condition` until it returns a true value.
+
+        Arguments:
+            condition: function driver -> value
+            name: name of the wait, for the records and the error message
+
+        Keyword arguments:
+            timeout: (default: None) seconds (default: `self.timeout`)
+
+        Return: the value returned by `condition`
+        """
+        if timeout is None:
+            timeout = self.timeout
+
+        start = time.perf_counter()
+        deadline = start + timeout
+        try:
+            while True:
+                value = condition(self.driver)
+                if value:
+                    return(value)
+                if time.perf_counter() > deadline:
+                    error_message = 'Timed out after {} s waiting for {}'\
+                        .format(timeout, name)
+                    raise WaitTimeout(error_message)
+                time.sleep(self.poll)
+        finally:
+            self.instrumentation.record('wait', name,
+                                        time.perf_counter() - start)
+
+    def ajax_idle(self, timeout=None):
+        """
+        Wait until the ajax queue is empty and the document is loaded.
+        """
+        return(self.until(
+            lambda driver: driver.execute_script(IDLE_SCRIPT, False),
+            'ajax_idle', timeout=timeout))
+
+    def page_idle(self, timeout=None):
+        """
+        Wait until the ajax queue is empty and the blockUI dialog is hidden.
+        """
+        return(self.until(
+            lambda driver: driver.execute_script(IDLE_SCRIPT, True),
+            'page_idle', timeout=timeout))
+
+    def block_ui_hidden(self, timeout=None):
+        """
+        Wait until the blockUI dialog ('dlgBlockUI') is hidden.
+        """
+        return(self.until(
+            lambda driver: driver.find_element_by_id(
+                'dlgBlockUI').get_attribute('aria-hidden') == 'true',
+            'block_ui_hidden', timeout=timeout))
+
+    def title_changed(self, previous, timeout=None):
+        """
+        Wait until the text of the 'display_main' titles differs from
+        `previous` (see `title`).
+        """
+        return(self.until(
+            lambda driver: self.title() != previous,
+            'title_changed', timeout=timeout))
+
+    def title(self):
+        """
+        Return: (string) text of the 'display_main' titles
+        """
+        titles = self.driver.find_elements_by_id('display_main')
+        return('\n'.join(t.text for t in titles))
+
+    def dom_settled(self, quiet=0.3, timeout=None):
+        """
+        Wait until the DOM has not changed for `quiet` seconds.
+        """
+        quiet_ms = 1e3 * quiet
+        return(self.until(
+            lambda driver: driver.execute_script(QUIET_SCRIPT) >= quiet_ms,
+            'dom_settled', timeout=timeout))
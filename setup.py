@@ -3,7 +3,7 @@ from setuptools import setup
 setup(
     version='0.0.4',
     name='icsd',
-    install_requires=["PyYAML","beautifulsoup4", "selenium", "PyVirtualDisplay", "pandas", "tqdm"],
+    install_requires=["PyYAML","selenium", "PyVirtualDisplay", "numpy", "pandas", "lxml", "tqdm", "requests"],
     entry_points={
         "console_scripts": [
             "icsd = icsd.main:main"
@@ -9,4 +9,6 @@ with open(query_tags_file, 'r') as fr:
     ICSD_QUERY_TAGS = yaml.safe_load(fr)
 
 with open(parse_tags_file, 'r') as fr:
-    ICSD_PARSE_TAGS = yaml.safe_load(fr)
+    ICSD_PARSE_SPEC = yaml.safe_load(fr)
+
+ICSD_PARSE_TAGS = {tag: spec['label'] for tag, spec in ICSD_PARSE_SPEC.items()}
@@ -0,0 +1,179 @@
+"""
+A stand-in for the Selenium WebDriver, serving recorded 'Detailed View'
+pages so that `Queryer` can be exercised without a browser.
+"""
+import os
+import re
+from unittest import mock
+from lxml import html
+from icsd.detailed_view import DetailedViewPage, SNAPSHOT_SCRIPT
+from icsd.queryer import Queryer
+
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), 'fixtures',
+                            'detailed_view')
+
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES_DIR, name)) as f:
+        return(f.read())
+
+
+class FakeElement(object):
+    def __init__(self, text='', attributes=None, on_click=None):
+        self.text = text
+        self.attributes = attributes or {}
+        self.on_click = on_click
+
+    def get_attribute(self, name):
+        return(self.attributes.get(name))
+
+    def is_displayed(self):
+        return(True)
+
+    def is_enabled(self):
+        return(True)
+
+    def click(self):
+        if self.on_click:
+            self.on_click()
+
+    def send_keys(self, *keys):
+        pass
+
+
+class FakeDriver(object):
+    """
+    Serve `pages` (HTML sources) one after another; clicking the 'Next'
+    button moves on to the next page. The page is always ready: the ajax
+    queue is empty, the blockUI dialog hidden and the DOM settled.
+
+    Attributes:
+        n_commands: number of WebDriver commands received
+        n_page_sources: number of `page_source` transfers
+        n_snapshots: number of `SNAPSHOT_SCRIPT` runs
+    """
+
+    def __init__(self, pages):
+        self.pages = pages
+        self.index = 0
+        self.n_commands = 0
+        self.n_page_sources = 0
+        self.n_snapshots = 0
+        self._title_texts = {}
+
+    @property
+    def page_source(self):
+        self.n_commands += 1
+        self.n_page_sources += 1
+        return(self.pages[self.index])
+
+    def get(self, url):
+        self.n_commands += 1
+
+    def _next(self):
+        self.index = min(self.index + 1, len(self.pages) - 1)
+
+    def _titles(self):
+        source = self.pages[self.index]
+        if source not in self._title_texts:
+            tree = html.fromstring(source)
+            self._title_texts[source] = [
+                ' '.join(t.text_content().split())
+                for t in tree.xpath('//*[@id="display_main"]')]
+
+        entry = 'Entry {} of {}'.format(self.index + 1, len(self.pages))
+        return([FakeElement(re.sub(r'Entry \d+ of \d+', entry, text))
+                for text in self._title_texts[source]])
+
+    def _snapshot(self, include_source):
+        """
+        Return: (dict) what `SNAPSHOT_SCRIPT` returns on the current page
+        """
+        source = self.pages[self.index]
+        page = DetailedViewPage(source)
+        tables = sorted(page.tables.items(),
+                        key=lambda x: page.tree.xpath('//table').index(x[1]))
+        return({
+            'idle': True,
+            'blocked': False,
+            'titles': [t.text for t in self._titles()],
+            'version': page.version,
+            'panels': [[header, html.tostring(table, encoding='unicode',
+                                              with_tail=False)]
+                       for header, table in tables],
+            'source': source if include_source else None,
+            'transferred': len(source.encode()),
+        })
+
+    def find_elements(self, by='id', value=None):
+        self.n_commands += 1
+        if value == 'display_main':
+            return(self._titles())
+        return([self.find_element(by, value)])
+
+    def find_element(self, by='id', value=None):
+        self.n_commands += 1
+        if value == 'dlgBlockUI':
+            return(FakeElement(attributes={'aria-hidden': 'true'}))
+        if value == 'content_form:mainSearchPanel_header':
+            return(FakeElement('Basic Search & Retrieve'))
+        if value == 'display_main':
+            return(self._titles()[0])
+        if 'buttonNext' in str(value):
+            return(FakeElement(on_click=self._next))
+        return(FakeElement())
+
+    def find_element_by_id(self, value):
+        return(self.find_element('id', value))
+
+    def find_elements_by_id(self, value):
+        return(self.find_elements('id', value))
+
+    def find_element_by_xpath(self, value):
+        return(self.find_element('xpath', value))
+
+    def find_elements_by_xpath(self, value):
+        return(self.find_elements('xpath', value))
+
+    def execute_script(self, script, *args):
+        self.n_commands += 1
+        if script == SNAPSHOT_SCRIPT:
+            self.n_snapshots += 1
+            return(self._snapshot(*args))
+        if 'PrimeFaces' in script:
+            return(True)
+        if 'MutationObserver' in script:
+            return(1e6)
+        if 'jQuery.active' in script:
+            return(0)
+        if 'readyState' in script:
+            return('complete')
+        if 'click()' in script and args:
+            args[0].click()
+
+    def get_cookies(self):
+        return([{'name': 'JSESSIONID', 'value': 'fake-session',
+                 'domain': '127.0.0.1', 'path': '/'}])
+
+    def save_screenshot(self, fname):
+        self.n_commands += 1
+
+    def stop_client(self):
+        pass
+
+    def quit(self):
+        pass
+
+
+def make_queryer(pages, **kwargs):
+    """
+    Return: (Queryer) a `Queryer` driving a `FakeDriver` serving `pages`
+    """
+    driver = FakeDriver(pages)
+    with mock.patch.object(Queryer, '_initialize_driver',
+                           return_value=driver):
+        queryer = Queryer(**kwargs)
+
+    queryer.interval = 0
+    return(queryer)
@@ -0,0 +1,567 @@
+"""
+A local JSF application standing in for the ICSD web interface: the
+'Basic Search' form, the paginated 'List View' of the hits, the 'Detailed
+View' of each entry with its 'Next' button, the blockUI dialog, 'Expand all'
+and the CIF downloads, served from recorded (or synthetic) entry pages.
+
+The pages work both with the PrimeFaces ajax requests replayed by
+`icsd.http_queryer` and, without any JavaScript library, with a browser
+driven by `icsd.queryer` (every button is a submit button). A
+`javax.faces.ViewState` is checked on every post. Latency and errors can be
+injected to exercise the recovery of a crawl.
+
+Run it standalone to point a crawl at it:
+
+    python -m tests.icsd_standin --port 8080 --codes 1-5000 --latency 0.05
+"""
+import os
+import re
+import sys
+import time
+import random
+import argparse
+import itertools
+import threading
+from urllib.parse import parse_qs, urlsplit
+import socketserver
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+
+class ThreadingHTTPServer(socketserver.ThreadingMixIn, HTTPServer):
+    """
+    `http.server.ThreadingHTTPServer`, which is missing before Python 3.7.
+    """
+    daemon_threads = True
+
+
+BASIC_PATH = '/search/basic.xhtml'
+LIST_PATH = '/search/list.xhtml'
+DETAILS_PATH = '/search/details.xhtml'
+CIF_PATH = '/ws/cif/'
+
+VIEW_STATE = 'javax.faces.ViewState'
+VIEW_STATE_ID = 'j_id1:javax.faces.ViewState:0'
+
+TABLE = 'display_form:listViewTable'
+ROWS_SELECT = 'display_form:listViewTable:j_id12'
+ROWS_OPTIONS = [25, 50, 100]
+
+_RE_CODE = re.compile(r'Coll\. Code ICSD (\d+)')
+_RE_ENTRY = re.compile(r'Entry \d+ of \d+')
+_RE_FORM = re.compile(r'<form id="display_form"[^>]*>.*</form>', re.DOTALL)
+_RE_FORMULA = re.compile(r'Sum\. formula</td><td>([^<]*)</td>')
+_RE_DIALOG = re.compile(r'<div id="dlgBlockUI"[^>]*></div>')
+
+SEARCH_PAGE = """<html><head><title>ICSD - Basic Search</title></head>
+<body>
+{dialog}
+<form id="content_form" action="{path}" method="post">
+<div id="content_form:mainSearchPanel_header">Basic Search &amp; Retrieve</div>
+<table><tbody>
+<tr><td><input id="content_form:contentSelection:0" type="checkbox" name="content_form:contentSelection" value="EXP_INORGANIC" checked="checked"><label for="content_form:contentSelection:0">Experim. inorganic structures</label></td></tr>
+<tr><td><input id="content_form:contentSelection:1" type="checkbox" name="content_form:contentSelection" value="EXP_METAL_ORGANIC"><label for="content_form:contentSelection:1">Experim. metal-organic str.</label></td></tr>
+<tr><td><input id="content_form:contentSelection:2" type="checkbox" name="content_form:contentSelection" value="THEORETICAL"><label for="content_form:contentSelection:2">Theoretical structures</label></td></tr>
+</tbody></table>
+<input id="content_form:uiChemistrySearchSumForm:input" name="content_form:uiChemistrySearchSumForm:input" type="text" value="">
+<input id="content_form:uiChemistrySearchElCount:input:input" name="content_form:uiChemistrySearchElCount:input:input" type="text" value="">
+<input id="content_form:uiCodeCollection:input:input" name="content_form:uiCodeCollection:input:input" type="text" value="">
+<button id="content_form:btnRunQuery" name="content_form:btnRunQuery" type="submit"><span>Run Query</span></button>
+<input type="hidden" name="{view_state_name}" id="{view_state_id}" value="{view_state}">
+</form>
+{dialog_script}
+</body></html>
+"""
+
+LIST_PAGE = """<html><head><title>ICSD - List View</title></head>
+<body>
+{dialog}
+<form id="display_form" action="{path}" method="post">
+<div id="display_main" class="title">List View 1 - {n} of {n}</div>
+<table class="toolbar"><tbody><tr>
+<td><button id="display_form:btnDownloadCif" name="display_form:btnDownloadCif" type="submit"><span class="ui-icon"></span><span>Export CIF</span></button></td>
+<td><button id="display_form:btnDetailedView" name="display_form:btnDetailedView" type="submit"><span>Show Detailed View</span></button></td>
+</tr></tbody></table>
+{table}
+<input type="hidden" name="{view_state_name}" id="{view_state_id}" value="{view_state}">
+</form>
+<div id="footer_middle"><p>Version 4.2.0 (build 20190513-1424) - Data Release 2019.1</p></div>
+{dialog_script}
+</body></html>
+"""
+
+DATA_TABLE = """<div id="{table}" class="ui-datatable">
+<div class="ui-paginator"><span class="ui-paginator-current">({page} of {n_pages})</span>
+<button id="{table}_next" name="{table}_next" type="submit" class="ui-paginator-next"><span class="ui-icon ui-icon-seek-next"></span></button>
+<select id="{rows_select}" name="{rows_select}" onchange="this.form.submit()">{options}</select></div>
+<input id="{table}:uiSelectAllRows_input" name="{table}_selection" type="checkbox" value="@all"{checked}>
+<table><thead><tr><th>Coll. Code</th><th>Sum. formula</th></tr></thead>
+<tbody>{rows}</tbody></table>
+</div>"""
+
+PARTIAL_RESPONSE = """<?xml version='1.0' encoding='UTF-8'?>
+<partial-response id="j_id1"><changes>{updates}<update id="{view_state_id}"><![CDATA[{view_state}]]></update></changes></partial-response>"""
+
+PARTIAL_ERROR = """<?xml version='1.0' encoding='UTF-8'?>
+<partial-response id="j_id1"><error><error-name>{name}</error-name><error-message><![CDATA[{message}]]></error-message></error></partial-response>"""
+
+BLOCK_UI_DIALOG = '<div id="dlgBlockUI" class="ui-dialog" aria-hidden="{}"></div>'
+
+# hides the blockUI dialog once the page has been shown for a while
+BLOCK_UI_SCRIPT = """<script>setTimeout(function() {{
+document.getElementById('dlgBlockUI').setAttribute('aria-hidden', 'true');
+}}, {});</script>"""
+
+EXPAND_ALL = '<a id="ExpandAll" class="no_print" href="#">Expand all</a>'
+
+CIF = """data_{code}
+_database_code_ICSD {code}
+_chemical_formula_sum '{formula}'
+_cell_length_a 5.0
+_cell_length_b 5.0
+_cell_length_c 5.0
+"""
+
+
+def collection_code(page):
+    """
+    Return: (string) ICSD Collection Code in the title of a recorded page
+    """
+    return(_RE_CODE.search(page).group(1))
+
+
+def synthetic_pages(codes, template):
+    """
+    Make 'Detailed View' pages for `codes` out of a recorded page.
+
+    Arguments:
+        codes: ICSD Collection Codes
+        template: recorded 'Detailed View' page
+
+    Return: (list) pages, in the order of `codes`
+    """
+    code = collection_code(template)
+    return([template.replace('ICSD {}'.format(code), 'ICSD {}'.format(c))
+            .replace('<td>{}</td>'.format(code), '<td>{}</td>'.format(c))
+            for c in codes])
+
+
+def parse_codes(text):
+    """
+    Return: (set) ICSD Collection Codes in a query such as "1 5-9 12"
+    """
+    codes = set()
+    for item in text.replace(',', ' ').split():
+        first, _, last = item.partition('-')
+        codes.update(str(c) for c in range(int(first), int(last or first) + 1))
+
+    return(codes)
+
+
+class Session(object):
+    """
+    State of a user session of the stand-in (per JSESSIONID cookie).
+    """
+
+    def __init__(self):
+        self.view_state = None
+        self.hits = []
+        self.selected = False
+        self.index = 0
+        self.first = 0
+        self.rows = ROWS_OPTIONS[0]
+
+
+class StandInServer(object):
+    """
+    Serve the ICSD web interface on a local port, with the 'Detailed View'
+    `pages` as the database. Use as a context manager.
+
+    Attributes:
+        url: URL of the 'Basic Search' page
+        base_url: URL of the server
+        requests: (method, path, ajax source or button) of the requests
+        sessions: `Session` of each JSESSIONID
+        n_errors: number of errors injected
+    """
+
+    def __init__(self, pages, port=0, latency=0, error_rate=0, block_ui=0,
+                 seed=0):
+        """
+        Arguments:
+            pages: recorded 'Detailed View' pages (see `synthetic_pages`)
+
+        Keyword arguments:
+            port: (default: 0) port to listen on (default: any free port)
+            latency: (default: 0) seconds to wait before answering a request,
+                     or (minimum, maximum) to draw it at random
+            error_rate: (default: 0) fraction of the requests answered with
+                        "503 Service Unavailable"
+            block_ui: (default: 0) seconds the blockUI dialog is shown for
+                      in a browser after a page is loaded
+            seed: (default: 0) seed of the random latency and errors
+        """
+        self.pages = dict((collection_code(page), page) for page in pages)
+        self.codes = sorted(self.pages, key=int)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.block_ui = block_ui
+        self.requests = []
+        self.sessions = {}
+        self.n_errors = 0
+        self._failures = {}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', port),
+                                          self._handler_class())
+        self.server.daemon_threads = True
+        self.base_url = 'http://127.0.0.1:{}'.format(self.server.server_port)
+        self.url = self.base_url + BASIC_PATH
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self.server.serve_forever,
+                                        kwargs={'poll_interval': 0.05})
+        self._thread.daemon = True
+        self._thread.start()
+        return(self)
+
+    def __exit__(self, *args):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def fail(self, name, times=1, status=500):
+        """
+        Answer the next `times` requests named `name` (ajax source, button
+        or path of a GET) with the HTTP `status`.
+        """
+        with self._lock:
+            self._failures.setdefault(name, []).extend([status] * times)
+
+    def _injected_error(self, name):
+        """
+        Wait for the latency of the request.
+
+        Return: (int) HTTP status of the error to answer the request with,
+                None to serve it
+        """
+        with self._lock:
+            if self._failures.get(name):
+                self.n_errors += 1
+                return(self._failures[name].pop(0))
+            if self.error_rate and self._random.random() < self.error_rate:
+                self.n_errors += 1
+                return(503)
+            if isinstance(self.latency, (tuple, list)):
+                latency = self._random.uniform(*self.latency)
+            else:
+                latency = self.latency
+
+        if latency:
+            time.sleep(latency)
+        return(None)
+
+    def _new_view_state(self, session):
+        session.view_state = '{}:{}'.format(next(self._ids), id(session))
+        return(session.view_state)
+
+    def _dialog(self):
+        """
+        Return: (tuple) blockUI dialog, and script hiding it
+        """
+        if not self.block_ui:
+            return(BLOCK_UI_DIALOG.format('true'), '')
+
+        return(BLOCK_UI_DIALOG.format('false'),
+               BLOCK_UI_SCRIPT.format(int(1e3 * self.block_ui)))
+
+    def _render(self, template, session, **kwargs):
+        dialog, dialog_script = self._dialog()
+        return(template.format(view_state_name=VIEW_STATE,
+                               view_state_id=VIEW_STATE_ID,
+                               view_state=self._new_view_state(session),
+                               dialog=dialog, dialog_script=dialog_script,
+                               **kwargs))
+
+    def search_page(self, session):
+        return(self._render(SEARCH_PAGE, session, path=BASIC_PATH))
+
+    def data_table(self, session):
+        """
+        Return: (string) the 'List View' table, at its current page
+        """
+        hits = session.hits[session.first:session.first + session.rows]
+        rows = ''.join(
+            '<tr data-rk="{0}" aria-selected="{1}"><td>{0}</td><td>{2}</td>'
+            '</tr>'.format(code, 'true' if session.selected else 'false',
+                           self.formula(code))
+            for code in hits)
+        options = ''.join('<option value="{0}"{1}>{0}</option>'.format(
+            n, ' selected="selected"' if n == session.rows else '')
+            for n in ROWS_OPTIONS)
+        n_pages = max(1, -(-len(session.hits) // session.rows))
+        return(DATA_TABLE.format(
+            table=TABLE, rows_select=ROWS_SELECT, options=options,
+            page=session.first // session.rows + 1, n_pages=n_pages,
+            checked=' checked="checked"' if session.selected else '',
+            rows=rows))
+
+    def list_page(self, session):
+        return(self._render(LIST_PAGE, session, path=LIST_PATH,
+                            n=len(session.hits),
+                            table=self.data_table(session)))
+
+    def formula(self, code):
+        search = _RE_FORMULA.search(self.pages[code])
+        return(search.group(1) if search else '')
+
+    def cif(self, code):
+        return(CIF.format(code=code, formula=self.formula(code)))
+
+    def detailed_form(self, session):
+        """
+        Return: (string) 'display_form' of the current entry
+        """
+        page = self.pages[session.hits[session.index]]
+        form = _RE_FORM.search(page).group(0)
+        form = form.replace('<form id="display_form">',
+                            '<form id="display_form" action="{}" '
+                            'method="post">'.format(DETAILS_PATH), 1)
+        form = _RE_ENTRY.sub('Entry {} of {}'.format(
+            session.index + 1, len(session.hits)), form)
+        # buttons submit the form in a browser without PrimeFaces
+        form = re.sub(r'<button id="([^"]+)" type="button">',
+                      r'<button id="\1" name="\1" type="submit">', form)
+        if 'Expand all' not in form:
+            form = form.replace('</div>', '</div>\n' + EXPAND_ALL, 1)
+        return(form.replace(
+            '</form>', '<input type="hidden" name="{}" id="{}" value="{}">'
+            '</form>'.format(VIEW_STATE, VIEW_STATE_ID, session.view_state)))
+
+    def detailed_page(self, session):
+        page = self.pages[session.hits[session.index]]
+        self._new_view_state(session)
+        dialog, dialog_script = self._dialog()
+        page = _RE_DIALOG.sub(dialog, page, count=1)
+        page = page.replace('</body>', dialog_script + '</body>', 1)
+        return(_RE_FORM.sub(lambda m: self.detailed_form(session), page))
+
+    def partial_response(self, session, updates):
+        view_state = self._new_view_state(session)
+        return(PARTIAL_RESPONSE.format(
+            updates=''.join('<update id="{}"><![CDATA[{}]]></update>'.format(
+                element_id, content) for element_id, content in updates),
+            view_state_id=VIEW_STATE_ID, view_state=view_state))
+
+    def run_query(self, session, form):
+        codes = form.get('content_form:uiCodeCollection:input:input', [''])[0]
+        if codes.strip():
+            codes = parse_codes(codes)
+            session.hits = [c for c in self.codes if c in codes]
+        else:
+            session.hits = list(self.codes)
+        session.selected = False
+        session.index = 0
+        session.first = 0
+
+    def _handler_class(self):
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, status, body='', content_type='text/html',
+                       headers=None):
+                body = body.encode()
+                self.send_response(status)
+                self.send_header('Content-Type',
+                                 content_type + '; charset=UTF-8')
+                self.send_header('Content-Length', str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _attachment(self, filename, body):
+                self._reply(200, body, 'chemical/x-cif', headers={
+                    'Content-Disposition':
+                        'attachment; filename="{}"'.format(filename)})
+
+            def _session(self):
+                cookie = self.headers.get('Cookie', '')
+                match = re.search(r'JSESSIONID=([\w-]+)', cookie)
+                with standin._lock:
+                    if match and match.group(1) in standin.sessions:
+                        return(standin.sessions[match.group(1)], {})
+                    session_id = 'session-{}'.format(next(standin._ids))
+                    session = standin.sessions[session_id] = Session()
+                return(session, {'Set-Cookie': 'JSESSIONID={}; Path=/'.format(
+                    session_id)})
+
+            def do_GET(self):
+                path = urlsplit(self.path).path
+                standin.requests.append(('GET', path, None))
+                status = standin._injected_error(path)
+                if status is not None:
+                    return(self._reply(status, '<html>Error</html>'))
+
+                if path.startswith(CIF_PATH):
+                    return(self._cif(path[len(CIF_PATH):]))
+
+                session, headers = self._session()
+                if path == BASIC_PATH:
+                    return(self._reply(200, standin.search_page(session),
+                                       headers=headers))
+                if path == DETAILS_PATH and session.hits:
+                    return(self._reply(200, standin.detailed_page(session),
+                                       headers=headers))
+                self._reply(404, '<html>Not found</html>', headers=headers)
+
+            def _cif(self, code):
+                match = re.search(r'JSESSIONID=([\w-]+)',
+                                  self.headers.get('Cookie', ''))
+                if not match or match.group(1) not in standin.sessions:
+                    return(self._reply(403, '<html>Login</html>'))
+                if code not in standin.pages:
+                    return(self._reply(404, '<html>Not found</html>'))
+                self._reply(200, standin.cif(code), 'chemical/x-cif')
+
+            def do_POST(self):
+                path = urlsplit(self.path).path
+                length = int(self.headers.get('Content-Length', 0))
+                form = parse_qs(self.rfile.read(length).decode(),
+                                keep_blank_values=True)
+                ajax = self.headers.get('Faces-Request') == 'partial/ajax'
+                source = form.get('javax.faces.source', [None])[0]
+                button = next((name for name in form if name.endswith(
+                    ('RunQuery', 'DetailedView', 'DownloadCif', '_next',
+                     'buttonNext'))), None)
+                name = source or button
+                standin.requests.append(('POST', path, name))
+                session, _ = self._session()
+
+                status = standin._injected_error(name or path)
+                if status is not None:
+                    return(self._reply(status, '<html>Error</html>'))
+
+                if form.get(VIEW_STATE, [None])[0] != session.view_state:
+                    if ajax:
+                        return(self._reply(200, PARTIAL_ERROR.format(
+                            name='javax.faces.application.ViewExpiredException',
+                            message='View could not be restored'),
+                            'text/xml'))
+                    return(self._reply(500, '<html>View expired</html>'))
+
+                if path == BASIC_PATH and name == 'content_form:btnRunQuery':
+                    standin.run_query(session, form)
+                    if not session.hits:
+                        # no 'List View' without hits
+                        return(self._reply(200, standin.search_page(session)))
+                    return(self._reply(200, standin.list_page(session)))
+                if path == LIST_PATH:
+                    return(self._list_view(session, form, ajax, name))
+                if path == DETAILS_PATH:
+                    return(self._detailed_view(session, form, ajax, name))
+
+                self._reply(404, '<html>Not found</html>')
+
+            def _list_view(self, session, form, ajax, name):
+                if form.get(TABLE + '_selection', [''])[0] == '@all':
+                    session.selected = True
+                if ROWS_SELECT in form:
+                    rows = int(form[ROWS_SELECT][0])
+                    if rows != session.rows:
+                        session.rows = rows
+                        session.first = 0
+
+                if ajax and name == TABLE:
+                    if TABLE + '_pagination' in form:
+                        session.rows = int(form[TABLE + '_rows'][0])
+                        session.first = int(form[TABLE + '_first'][0])
+                    return(self._reply(200, standin.partial_response(
+                        session, [(TABLE, standin.data_table(session))]),
+                        'text/xml'))
+
+                if name == 'display_form:btnDetailedView':
+                    if not session.selected:
+                        return(self._reply(200, standin.list_page(session)))
+                    session.index = 0
+                    return(self._reply(302, headers={
+                        'Location': DETAILS_PATH}))
+
+                if name == 'display_form:btnDownloadCif':
+                    if not session.selected:
+                        return(self._reply(200, standin.list_page(session)))
+                    return(self._attachment('ICSD_export.cif', ''.join(
+                        standin.cif(code) for code in session.hits)))
+
+                if name == TABLE + '_next' and \
+                        session.first + session.rows < len(session.hits):
+                    session.first += session.rows
+
+                self._reply(200, standin.list_page(session))
+
+            def _detailed_view(self, session, form, ajax, name):
+                if name == 'display_form:btnEntryDownloadCif' or \
+                        'display_form:btnEntryDownloadCif' in form:
+                    code = session.hits[session.index]
+                    return(self._attachment(
+                        'ICSD_CollCode{}.cif'.format(code), standin.cif(code)))
+
+                if name == 'display_form:buttonNext':
+                    session.index = min(session.index + 1,
+                                        len(session.hits) - 1)
+
+                if ajax:
+                    return(self._reply(200, standin.partial_response(
+                        session, [('display_form',
+                                   standin.detailed_form(session))]),
+                        'text/xml'))
+                self._reply(200, standin.detailed_page(session))
+
+        return(Handler)
+
+
+def main():
+    from tests.fake_driver import FIXTURES_DIR, load_fixture
+
+    parser = argparse.ArgumentParser(
+        description='Serve a local stand-in of the ICSD web interface')
+    parser.add_argument('--port', default=8080, type=int)
+    parser.add_argument('--codes', default='',
+                        help='serve synthetic entries for these ICSD '
+                        'Collection Codes (e.g. 1-5000) instead of the '
+                        'recorded ones')
+    parser.add_argument('--latency', default=0, type=float,
+                        help='seconds to wait before answering a request')
+    parser.add_argument('--error-rate', default=0, type=float,
+                        help='fraction of the requests answered with 503')
+    parser.add_argument('--block-ui', default=0, type=float,
+                        help='seconds the blockUI dialog is shown for')
+    args = parser.parse_args()
+
+    pages = [load_fixture(name) for name in sorted(os.listdir(FIXTURES_DIR))
+             if name.endswith('.html')]
+    if args.codes:
+        pages = synthetic_pages(sorted(parse_codes(args.codes), key=int),
+                                pages[0])
+
+    with StandInServer(pages, port=args.port, latency=args.latency,
+                       error_rate=args.error_rate,
+                       block_ui=args.block_ui) as standin:
+        sys.stdout.write('Serving {} entries at {}\n'.format(
+            len(standin.pages), standin.url))
+        sys.stdout.flush()
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == '__main__':
+    main()
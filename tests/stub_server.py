@@ -0,0 +1,80 @@
+"""
+A local HTTP server standing in for the ICSD in tests.
+"""
+import threading
+import socketserver
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+
+class ThreadingHTTPServer(socketserver.ThreadingMixIn, HTTPServer):
+    """
+    `http.server.ThreadingHTTPServer`, which is missing before Python 3.7.
+    """
+    daemon_threads = True
+
+
+class StubServer(object):
+    """
+    Serve the CIFs in `cifs` at "/ws/cif/[code]" on a free local port, to
+    requests carrying the session cookie. Use as a context manager.
+
+    Attributes:
+        url: base URL of the server
+        n_requests: number of requests received
+        n_connections: number of TCP connections accepted
+    """
+
+    def __init__(self, cifs, cookie='JSESSIONID=fake-session'):
+        self.cifs = cifs
+        self.cookie = cookie
+        self.n_requests = 0
+        self.n_connections = 0
+        self._lock = threading.Lock()
+
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def setup(self):
+                with stub._lock:
+                    stub.n_connections += 1
+                BaseHTTPRequestHandler.setup(self)
+
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, status, body, content_type='text/plain'):
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                with stub._lock:
+                    stub.n_requests += 1
+
+                if stub.cookie not in self.headers.get('Cookie', ''):
+                    return(self._reply(403, b'<html>Login</html>',
+                                       'text/html'))
+
+                code = self.path.rsplit('/', 1)[-1]
+                if self.path.startswith('/ws/cif/') and code in stub.cifs:
+                    return(self._reply(200, stub.cifs[code].encode()))
+
+                self._reply(404, b'<html>Not found</html>', 'text/html')
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.url = 'http://127.0.0.1:{}'.format(self.server.server_port)
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self.server.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        return(self)
+
+    def __exit__(self, *args):
+        self.server.shutdown()
+        self.server.server_close()
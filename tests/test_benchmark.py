@@ -0,0 +1,34 @@
+import unittest
+from benchmarks import parse_engine, code_ranges
+
+
+class TestBenchmark(unittest.TestCase):
+
+    def test_run(self):
+        result = parse_engine.run(rounds=1)
+        self.assertEqual(5, result['n_entries'])
+        self.assertGreater(result['entries_per_sec'], 0)
+        for name in ['page', 'collection_code', 'ICSD_version', 'comments',
+                     'panel:Summary', 'panel:Additional information']:
+            self.assertIn(name, result['fields_us'])
+
+        self.assertEqual([], parse_engine.compare(result, result))
+
+    def test_compare(self):
+        baseline = {'entries_per_sec': 100.0,
+                    'fields_us': {'page': 100.0, 'authors': 1.0}}
+        result = {'entries_per_sec': 40.0,
+                  'fields_us': {'page': 300.0, 'authors': 3.0, 'doi': 1.0}}
+        regressions = parse_engine.compare(result, baseline)
+        self.assertEqual(2, len(regressions))
+        self.assertTrue(regressions[0].startswith('entries/sec'))
+        self.assertTrue(regressions[1].startswith('page'))
+
+    def test_code_ranges(self):
+        small = code_ranges.run(10 ** 4, claims=20)
+        self.assertGreater(small['lists_us'], 0)
+
+        # a binary search: about as fast for a million codes
+        large = code_ranges.run(10 ** 6, claims=20, with_lists=False)
+        self.assertIsNone(large['lists_us'])
+        self.assertLess(large['coverage_us'], 20 * small['coverage_us'] + 500)
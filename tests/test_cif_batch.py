@@ -0,0 +1,50 @@
+import os
+import shutil
+import tempfile
+import zipfile
+import unittest
+from icsd.cif_batch import split_cif_blocks, read_cif_batch, save_cifs
+
+
+def make_cif(code):
+    return('data_{0}-ICSD\n_database_code_ICSD {0}\n'
+           '_chemical_formula_sum \'Si O2\'\n'.format(code))
+
+
+class TestCIFBatch(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.workdir)
+
+    def test_split_cif_blocks(self):
+        text = '#(C) 2019 by FIZ Karlsruhe\n\n' + \
+            '\n'.join(make_cif(code) for code in [5013, 9853, 44278])
+        cifs = split_cif_blocks(text)
+        self.assertEqual(['44278', '5013', '9853'], sorted(cifs))
+        self.assertEqual(make_cif(9853), cifs['9853'])
+
+    def test_read_archive(self):
+        path = os.path.join(self.workdir, 'export.zip')
+        with zipfile.ZipFile(path, 'w') as archive:
+            archive.writestr('ICSD_CollCode5013.cif', make_cif(5013))
+            archive.writestr('ICSD_CollCode9853.cif',
+                             make_cif(9853) + make_cif(44278))
+            archive.writestr('readme.txt', 'data_1\n')
+        self.assertEqual(['44278', '5013', '9853'],
+                         sorted(read_cif_batch(path)))
+
+    def test_save_cifs(self):
+        path = os.path.join(self.workdir, 'export.cif')
+        with open(path, 'w') as fw:
+            fw.write(make_cif(5013) + make_cif(9853))
+
+        missing = save_cifs(read_cif_batch(path), [5013, 9853, 418498],
+                            directory=self.workdir)
+        self.assertEqual(['418498'], missing)
+        with open(os.path.join(self.workdir, '5013', '5013.cif')) as f:
+            self.assertEqual(make_cif(5013), f.read())
+        self.assertFalse(os.path.exists(
+            os.path.join(self.workdir, '418498')))
@@ -0,0 +1,79 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+from icsd.cif_fetcher import CIFFetcher
+from tests.fake_driver import FakeDriver, make_queryer, load_fixture
+from tests.stub_server import StubServer
+
+
+def make_cif(code):
+    return('data_{0}\n_database_code_ICSD {0}\n'.format(code) + 'x' * 100000)
+
+
+class TestCIFFetcher(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp()
+        self.cifs = dict((str(code), make_cif(code))
+                         for code in range(1000, 1020))
+
+    def tearDown(self):
+        shutil.rmtree(self.workdir)
+
+    def path(self, code):
+        return(os.path.join(self.workdir, '{}.cif'.format(code)))
+
+    def test_fetch_concurrently(self):
+        with StubServer(self.cifs) as server:
+            fetcher = CIFFetcher.from_driver(
+                FakeDriver([]), url=server.url + '/ws/cif/{code}', workers=4)
+            for code in self.cifs:
+                fetcher.submit(code, self.path(code))
+            self.assertEqual({}, fetcher.wait())
+            fetcher.close()
+
+        for code, cif in self.cifs.items():
+            with open(self.path(code)) as f:
+                self.assertEqual(cif, f.read())
+        self.assertEqual(20, server.n_requests)
+        self.assertLessEqual(server.n_connections, 4)
+
+    def test_errors(self):
+        with StubServer(self.cifs) as server:
+            url = server.url + '/ws/cif/{code}'
+            fetcher = CIFFetcher(url=url)
+            saved = []
+            fetcher.submit('1000', self.path(1000),
+                           then=lambda: saved.append('1000'))
+            fetcher.submit('2000', self.path(2000),
+                           then=lambda: saved.append('2000'))
+            errors = fetcher.wait()
+            fetcher.close()
+
+        self.assertEqual([], saved)
+        self.assertEqual(['1000', '2000'], sorted(errors))
+        self.assertIn('403', errors['1000'])
+        self.assertEqual([], os.listdir(self.workdir))
+
+    def test_parse_entries(self):
+        queryer = make_queryer([load_fixture('5013.html')])
+        queryer.hits = 1
+        queryer.skipcif = False
+        queryer.fetch_cif_over_http = True
+
+        cwd = os.getcwd()
+        os.chdir(self.workdir)
+        try:
+            with StubServer({'5013': make_cif(5013)}) as server:
+                queryer.cif_url = server.url + '/ws/cif/{code}'
+                with mock.patch('icsd.entry_parser.time.sleep'):
+                    self.assertEqual(['5013'], queryer.parse_entries())
+
+            with open(os.path.join('5013', '5013.cif')) as f:
+                self.assertEqual(make_cif(5013), f.read())
+        finally:
+            os.chdir(cwd)
+
+        self.assertIsNone(queryer.cif_fetcher)
@@ -0,0 +1,57 @@
+import unittest
+import numpy as np
+from icsd.coverage import Coverage
+from benchmarks.code_ranges import list_next_range
+
+
+class TestCoverage(unittest.TestCase):
+
+    def test_next_range(self):
+        coverage = Coverage([1, 5, 12, 15, 60, 61, 100, 101, 103, 105, 108],
+                            [61, 60, 100, 103, 105, 7])
+        # 7 is crawled, though not enumerated
+        self.assertEqual((1, 6), coverage.next_range(10))
+        self.assertEqual((1, 5), coverage.next_range(2))
+        self.assertEqual((12, 59), coverage.next_range(10, [(1, 6)]))
+        self.assertEqual((1, 3), coverage.next_range(10, [(4, 4)]))
+        self.assertEqual((101, 102),
+                         coverage.next_range(10, [(1, 5), (12, 59)]))
+
+        coverage.update(crawled_codes=[1, 5, 12, 15, 101])
+        self.assertEqual([108], coverage.uncrawled_codes().tolist())
+        self.assertEqual((108, 108), coverage.next_range(10))
+        self.assertIsNone(coverage.next_range(10, [(108, 108)]))
+
+        coverage.update(all_codes=[200, 108])
+        self.assertEqual([1, 5, 12, 15, 60, 61, 100, 101, 103, 105, 108, 200],
+                         coverage.codes.tolist())
+        self.assertEqual((108, 200), coverage.next_range(10))
+
+    def test_empty(self):
+        self.assertIsNone(Coverage().next_range(10))
+
+    def test_same_ranges_as_lists(self):
+        rng = np.random.RandomState(1)
+        for _ in range(50):
+            codes = np.sort(rng.choice(300, 100, replace=False)) + 1
+            crawled = rng.choice(320, 30, replace=False) + 1
+            coverage = Coverage(codes, crawled)
+            all_codes = codes.tolist()
+            crawled_codes = sorted(crawled.tolist())
+            not_yet_crawled = coverage.uncrawled_codes().tolist()
+
+            in_progress = []
+            for _ in range(5):
+                max_dl = rng.randint(1, 20)
+                code_range = coverage.next_range(max_dl, in_progress)
+                if code_range is None:
+                    break
+                self.assertEqual(
+                    list_next_range(all_codes, crawled_codes,
+                                    not_yet_crawled, max_dl, in_progress),
+                    code_range)
+                in_progress.append(code_range)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,15 @@
 import unittest
 import sys
 import os
+import time
+import shutil
+import sqlite3
+import tempfile
+import threading
+from unittest import mock
 from icsd.crawler import Crawler
+from icsd.journal import CrawlJournal
+from icsd.rate_control import RateController
 
 
 class TestCrawl(unittest.TestCase):
@@ -24,3 +32,170 @@ class TestCrawl(unittest.TestCase):
         crawler.not_yet_crawled = list(
             set(crawler.all_codes) - set(crawler.crawled_codes))
         self.assertEqual((108, 695), crawler.get_code_range())
+
+    def test_disjoint_code_ranges(self):
+        crawler = Crawler()
+        crawler.max_dl = 10
+        crawler.pack = False
+        crawler.refresh = lambda: None
+        crawler.all_codes = list(range(1, 36))
+        crawler.crawled_codes = [25]
+        crawler.not_yet_crawled = [c for c in crawler.all_codes if c != 25]
+
+        self.assertEqual(((1, 10),), crawler.claim_code_batch())
+        self.assertEqual(((11, 20),), crawler.claim_code_batch())
+        self.assertEqual(((21, 24),), crawler.claim_code_batch())
+        self.assertEqual(((26, 35),), crawler.claim_code_batch())
+        self.assertIsNone(crawler.claim_code_batch())
+
+        crawler.release_code_batch(((11, 20),))
+        self.assertEqual(((11, 20),), crawler.claim_code_batch())
+        self.assertAlmostEqual(44 / 50.0, crawler.fill_ratio)
+
+    def test_packed_code_ranges(self):
+        crawler = Crawler()
+        crawler.max_dl = 10
+        crawler.refresh = lambda: None
+        crawler.all_codes = list(range(1, 36)) + [40, 50]
+        crawler.crawled_codes = [3, 5, 25, 45]
+
+        self.assertEqual(((1, 2), (4, 4), (6, 12)),
+                         crawler.claim_code_batch())
+        self.assertEqual(((13, 22),), crawler.claim_code_batch())
+        self.assertEqual(((23, 24), (26, 33)), crawler.claim_code_batch())
+        self.assertEqual(((34, 44), (50, 50)), crawler.claim_code_batch())
+        self.assertIsNone(crawler.claim_code_batch())
+        self.assertAlmostEqual(34 / 40.0, crawler.fill_ratio)
+
+        crawler.max_ranges = 2
+        crawler.release_code_batch(((1, 2), (4, 4), (6, 12)))
+        self.assertEqual(((1, 2), (4, 4)), crawler.claim_code_batch())
+
+    def test_resume_code_range(self):
+        workdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, workdir)
+        crawler = Crawler()
+        crawler.max_dl = 10
+        crawler.refresh = lambda: None
+        crawler.all_codes = list(range(1, 36))
+        crawler.crawled_codes = [1, 2, 3]
+        crawler.not_yet_crawled = list(range(4, 36))
+        crawler.journal = CrawlJournal(os.path.join(workdir, 'journal'))
+
+        # failed after 3 entries, and before any entry
+        cursor = crawler.journal.begin(((1, 10),), 10)
+        for i in range(3):
+            cursor.record(i, i + 1)
+        crawler.journal.begin(((11, 20),), 10)
+
+        crawler.in_progress.append(((1, 10),))
+        self.assertEqual(((11, 20),), crawler.claim_code_batch())
+        crawler.release_code_batch(((1, 10),))
+        self.assertEqual(((4, 10),), crawler.claim_code_batch())
+        self.assertEqual([], crawler.journal.unfinished())
+
+    def test_workers(self):
+        crawled = set()
+        sessions = []
+        closed = []
+        lock = threading.Lock()
+
+        class FakeSession(object):
+            entries_seconds = 0.01
+
+            def __init__(self, instrument=False, browser_data_dir=None,
+                         skipcif=True, lean=False, batch_cif=False,
+                         url=None, engine='browser', journal=None,
+                         cif_over_http=False):
+                sessions.append(browser_data_dir)
+
+            def crawl_codes(self, code_ranges):
+                time.sleep(0.01)
+                with lock:
+                    codes = set(c for start, end in code_ranges
+                                for c in range(start, end + 1))
+                    assert not codes & crawled
+                    crawled.update(codes)
+
+            def close(self):
+                closed.append(self)
+
+        crawler = Crawler()
+        crawler.workers = 3
+        crawler.max_dl = 7
+        all_codes = list(range(1, 101))
+
+        def refresh():
+            crawler.all_codes = all_codes
+            crawler.crawled_codes = sorted(crawled)
+            crawler.not_yet_crawled = [c for c in all_codes
+                                       if c not in crawled]
+
+        crawler.refresh = refresh
+        cwd = os.getcwd()
+        workdir = tempfile.mkdtemp()
+        os.chdir(workdir)
+        try:
+            with mock.patch('icsd.crawler.CrawlSession', FakeSession):
+                crawler.run()
+        finally:
+            os.chdir(cwd)
+            shutil.rmtree(workdir)
+
+        self.assertEqual(set(all_codes), crawled)
+        self.assertEqual(3, len(set(sessions)))
+        for browser_data_dir in sessions:
+            self.assertTrue(os.path.isabs(browser_data_dir))
+            self.assertEqual('browser_data',
+                             os.path.basename(os.path.dirname(
+                                 browser_data_dir)))
+            self.assertTrue(os.path.basename(browser_data_dir)
+                            .startswith('worker-'))
+        self.assertEqual(3, len(closed))
+        self.assertEqual([], crawler.in_progress)
+
+    def test_claim_failure(self):
+        claims = [sqlite3.OperationalError('database is locked'),
+                  ((1, 10),), None]
+        crawled = []
+        sleeps = []
+
+        def claim_code_batch():
+            claim = claims.pop(0)
+            if isinstance(claim, Exception):
+                raise claim
+            return(claim)
+
+        class FakeSession(object):
+            entries_seconds = 0.01
+
+            def __init__(self, **kwargs):
+                pass
+
+            def crawl_codes(self, code_ranges):
+                crawled.append(code_ranges)
+                return([])
+
+            def close(self):
+                pass
+
+        crawler = Crawler()
+        crawler.rate = RateController(max_batch=10, base_backoff=60)
+        crawler.claim_code_batch = claim_code_batch
+        crawler.release_code_batch = lambda code_batch: None
+        crawler._sleep = sleeps.append
+        cwd = os.getcwd()
+        workdir = tempfile.mkdtemp()
+        os.chdir(workdir)
+        try:
+            with mock.patch('icsd.crawler.CrawlSession', FakeSession):
+                crawler._work(0)
+        finally:
+            os.chdir(cwd)
+            shutil.rmtree(workdir)
+
+        # the worker backs off, and claims the codes again
+        self.assertEqual([60], sleeps)
+        self.assertEqual([((1, 10),)], crawled)
+        self.assertEqual({'error': 1}, crawler.rate.n_errors)
+
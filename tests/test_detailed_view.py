@@ -0,0 +1,89 @@
+import os
+import unittest
+from lxml import html
+from icsd.detailed_view import DetailedViewPage, iter_panel_rows
+from icsd.entry_parser import EntryParser
+
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), 'fixtures',
+                            'detailed_view')
+
+
+class CountingPage(EntryParser):
+    def __init__(self, source):
+        super(CountingPage, self).__init__()
+        self.source = source
+        self.n_sources = 0
+
+    def get_page_source(self):
+        self.n_sources += 1
+        return(self.source)
+
+
+class TestDetailedView(unittest.TestCase):
+
+    def setUp(self):
+        with open(os.path.join(FIXTURES_DIR, '5013.html')) as f:
+            self.source = f.read()
+
+    def test_from_bundle(self):
+        page = DetailedViewPage(self.source)
+        bundle = {
+            'titles': page.titles,
+            'version': page.version,
+            'panels': [[header, html.tostring(table, encoding='unicode',
+                                              with_tail=False)]
+                       for header, table in page.tables.items()],
+        }
+        bundled = DetailedViewPage.from_bundle(bundle)
+        self.assertIsNone(bundled.source)
+        self.assertEqual(page.titles, bundled.titles)
+        self.assertEqual('Version 4.2.0 (build 20190513-1424) - '
+                         'Data Release 2019.1', bundled.version)
+        for header in page.tables:
+            self.assertEqual(page.panel(header), bundled.panel(header))
+
+    def test_split_panels(self):
+        page = DetailedViewPage(self.source)
+        self.assertEqual(
+            ['Summary', 'Chemistry', 'Published Crystal Structure Data',
+             'Standardized Crystal Structure Data', 'Experimental information',
+             'Bibliography', 'Additional information'],
+            list(page.tables.keys()))
+
+        rows = page.panel('Theoretical information', 'Experimental information')
+        self.assertEqual(['Temperature factors available',
+                          'Rietveld profile refinement applied'],
+                         [v for n, v in rows if n == 'Remarks'])
+        self.assertIs(rows, page.panel('Experimental information'))
+
+        with self.assertRaises(KeyError):
+            page.panel('Theoretical information')
+
+    def test_panel_rows(self):
+        table = html.fromstring(
+            '<table><tr><td>Z</td><td>4</td><td></td>'
+            '<td rowspan="3">Remarks</td><td>R1</td></tr>'
+            '<tr><td>Pearson symbol</td><td> oP\n 12 </td><td></td>'
+            '<td>R2</td></tr>'
+            '<tr><td></td><td></td><td></td><td>R3</td></tr></table>')
+        self.assertEqual(
+            [('Z', '4'), ('Remarks', 'R1'), ('Pearson symbol', 'oP 12'),
+             ('Remarks', 'R2'), ('Remarks', 'R3')],
+            list(iter_panel_rows(table)))
+
+    def test_empty_panel(self):
+        start = self.source.index('Additional information</div>')
+        start = self.source.index('<tbody>', start)
+        end = self.source.index('</tbody>', start) + len('</tbody>')
+        page = DetailedViewPage(self.source[:start] + self.source[end:])
+        self.assertEqual(0, len(page.panel('Additional information')))
+
+    def test_parse_once_per_entry(self):
+        parser = CountingPage(self.source)
+        parser.parse_fields()
+        self.assertEqual(1, parser.n_sources)
+
+        parser.invalidate_page()
+        parser.get_field("authors")
+        self.assertEqual(2, parser.n_sources)
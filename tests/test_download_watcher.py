@@ -0,0 +1,106 @@
+import os
+import time
+import shutil
+import tempfile
+import threading
+import unittest
+from icsd.download_watcher import DownloadWatcher, DownloadTimeout
+
+
+class TestInotifyWatcher(unittest.TestCase):
+    use_inotify = True
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.watcher = DownloadWatcher(self.directory, timeout=5, poll=0.01,
+                                       use_inotify=self.use_inotify)
+
+    def tearDown(self):
+        self.watcher.close()
+        shutil.rmtree(self.directory)
+
+    def download(self, name, content, delay=0.05):
+        """
+        Write the file as Chrome does: into "[name].crdownload", renamed
+        once complete.
+        """
+        def write():
+            partial = os.path.join(self.directory, name + '.crdownload')
+            with open(partial, 'w') as fw:
+                fw.write(content[:10])
+                fw.flush()
+                time.sleep(delay)
+                fw.write(content[10:])
+            os.rename(partial, os.path.join(self.directory, name))
+
+        thread = threading.Thread(target=write)
+        thread.start()
+        return(thread)
+
+    def test_wait_for(self):
+        content = 'data_5013\n' * 1000
+        thread = self.download('ICSD_CollCode5013.cif', content)
+        path, = self.watcher.wait_for(['ICSD_CollCode5013.cif'])
+        thread.join()
+        with open(path) as f:
+            self.assertEqual(content, f.read())
+
+    def test_many_files(self):
+        names = ['ICSD_CollCode{}.cif'.format(c) for c in range(1, 6)]
+        threads = [self.download(name, name * 100, delay=0.01 * (5 - i))
+                   for i, name in enumerate(names)]
+        paths = list(self.watcher.iter_completed(names))
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sorted(names),
+                         sorted(os.path.basename(p) for p in paths))
+
+    def test_wait_for_new(self):
+        with open(os.path.join(self.directory, 'old.cif'), 'w') as fw:
+            fw.write('data_1\n')
+        watcher = DownloadWatcher(self.directory, timeout=5, poll=0.01,
+                                  use_inotify=self.use_inotify)
+        try:
+            thread = self.download('export.zip', 'PK' * 100)
+            self.assertEqual(os.path.join(self.directory, 'export.zip'),
+                             watcher.wait_for_new())
+            thread.join()
+        finally:
+            watcher.close()
+
+    def test_written_in_place(self):
+        if not self.watcher.inotify:
+            self.skipTest('the size of a file written in place may hold '
+                          'still between two scans')
+
+        fw = open(os.path.join(self.directory, 'a.cif'), 'w')
+        fw.write('data_1\n')
+        fw.flush()
+
+        def write():
+            time.sleep(0.3)
+            fw.write('_end\n')
+            fw.close()
+
+        thread = threading.Thread(target=write)
+        thread.start()
+        path, = self.watcher.wait_for(['a.cif'])
+        with open(path) as f:
+            self.assertEqual('data_1\n_end\n', f.read())
+        thread.join()
+
+    def test_timeout(self):
+        partial = os.path.join(self.directory, 'a.cif.crdownload')
+        with open(partial, 'w') as fw:
+            fw.write('data_')
+        start = time.monotonic()
+        with self.assertRaises(DownloadTimeout):
+            self.watcher.wait_for(['a.cif'], timeout=0.1)
+        self.assertLess(time.monotonic() - start, 2)
+
+
+class TestPollingWatcher(TestInotifyWatcher):
+    use_inotify = False
+
+    def test_fallback(self):
+        self.assertFalse(self.watcher.inotify)
@@ -0,0 +1,69 @@
+import unittest
+from icsd.detailed_view import DetailedViewPage
+from icsd.extraction import ExtractionPlan
+
+
+PAGE = """<html><body>
+<table class="outputcontentpanel"><tbody>
+<tr><td>Author</td><td>Doe, J.</td><td></td><td>Title</td><td>A title</td></tr>
+</tbody></table>
+<div><span></span>Experimental information</div>
+<table class="outputcontentpanel"><tbody>
+<tr><td>R-value</td><td>0.05 (all)</td><td></td><td>Radiation type</td><td>Neutron</td></tr>
+<tr><td rowspan="2">Remarks</td><td>Polytype structure</td><td></td><td></td><td></td></tr>
+<tr><td>Prototype structure type</td><td></td><td></td><td></td></tr>
+</tbody></table>
+</body></html>"""
+
+
+class TestExtraction(unittest.TestCase):
+
+    def setUp(self):
+        self.page = DetailedViewPage(PAGE)
+
+    def test_plan(self):
+        experimental = ['Experimental information', 'Theoretical information']
+        spec = {
+            'authors': {'panel': 'Summary', 'row': 'Author'},
+            'R_value': {'panel': experimental, 'row': 'R-value',
+                        'transform': 'r_value'},
+            'pressure': {'panel': experimental, 'row': 'Pressure',
+                         'transform': 'r_value'},
+            'polytype': {'panel': experimental, 'row': 'Remarks',
+                         'equals': 'Polytype structure'},
+            'prototype': {'panel': experimental, 'row': 'Remarks',
+                          'contains': 'rototype'},
+            'x_ray': {'panel': experimental, 'row': 'Radiation type',
+                      'equals': 'X-Ray'},
+            'neutron': {'any': [
+                {'panel': experimental, 'row': 'Radiation type',
+                 'equals': 'X-Ray'},
+                {'panel': experimental, 'row': 'Radiation type',
+                 'equals': 'Neutron'}]},
+            'mineral': {'panel': 'Chemistry', 'row': 'Mineral name',
+                        'present': True},
+            'defect': {'constant': False},
+        }
+        plan = ExtractionPlan(spec)
+        self.assertEqual(
+            [('Summary',), tuple(experimental), ('Chemistry',)], plan.panels)
+
+        self.assertEqual({
+            'authors': 'Doe, J.',
+            'R_value': 0.05,
+            'pressure': None,
+            'polytype': True,
+            'prototype': True,
+            'x_ray': False,
+            'neutron': True,
+            'mineral': False,
+            'defect': False,
+        }, plan.extract(self.page))
+
+        self.assertEqual({'authors': 'Doe, J.'},
+                         plan.extract(self.page, fields=['authors']))
+
+    def test_unknown_transform(self):
+        with self.assertRaises(ValueError):
+            ExtractionPlan({'authors': {'panel': 'Summary', 'row': 'Author',
+                                        'transform': 'upper'}})
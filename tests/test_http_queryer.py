@@ -0,0 +1,84 @@
+import os
+import json
+import shutil
+import tempfile
+import unittest
+from icsd.http_queryer import HttpQueryer
+from icsd.jsf import JSFError
+from icsd.entry_parser import QueryerError
+from tests.fake_driver import FIXTURES_DIR, load_fixture
+from tests.icsd_standin import StandInServer
+
+
+CODES = ['5013', '9853', '44278', '418498']
+
+
+class TestHttpQueryer(unittest.TestCase):
+
+    def setUp(self):
+        self.server = StandInServer(
+            [load_fixture('{}.html'.format(c)) for c in CODES])
+        self.server.__enter__()
+        self.cwd = os.getcwd()
+        self.workdir = tempfile.mkdtemp()
+        os.chdir(self.workdir)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.workdir)
+        self.server.__exit__()
+
+    def test_query(self):
+        queryer = HttpQueryer(url=self.server.url,
+                              query={'icsd_collection_code': '1-50000'},
+                              structure_source='A')
+        self.assertEqual(CODES[:3], queryer.perform_icsd_query())
+
+        for code in CODES[:3]:
+            with open(os.path.join(code, 'meta_data.json')) as f:
+                entry_data = json.load(f)
+            del entry_data['crawler_version']
+            with open(os.path.join(FIXTURES_DIR, code + '.json')) as f:
+                self.assertEqual(json.load(f), entry_data)
+            with open(os.path.join(code, 'source.html')) as f:
+                self.assertIn('Coll. Code ICSD {}'.format(code), f.read())
+
+        self.assertEqual([
+            ('GET', '/search/basic.xhtml', None),
+            ('POST', '/search/basic.xhtml', 'content_form:btnRunQuery'),
+            ('POST', '/search/list.xhtml', 'display_form:listViewTable'),
+            ('POST', '/search/list.xhtml', 'display_form:btnDetailedView'),
+            ('GET', '/search/details.xhtml', None),
+            ('POST', '/search/details.xhtml', 'display_form:buttonNext'),
+            ('POST', '/search/details.xhtml', 'display_form:buttonNext'),
+        ], self.server.requests)
+
+    def test_content_selection(self):
+        queryer = HttpQueryer(url=self.server.url, structure_source='T')
+        queryer.select_structure_source()
+        self.assertEqual(
+            ['EXP_INORGANIC', 'THEORETICAL'],
+            [v for k, v in queryer.http.form_fields('content_form')
+             if k == 'content_form:contentSelection'])
+        queryer.quit()
+
+    def test_view_state(self):
+        queryer = HttpQueryer(url=self.server.url,
+                              query={'icsd_collection_code': '5013'})
+        queryer.post_query_to_form()
+        self.assertEqual(1, queryer.hits)
+
+        # a stale ViewState is rejected, as by the ICSD
+        table = 'display_form:listViewTable'
+        with self.assertRaises(JSFError):
+            queryer.http.ajax('display_form', table,
+                              params={'javax.faces.ViewState': 'stale'})
+        queryer.quit()
+
+    def test_not_basic_search(self):
+        with self.assertRaises(QueryerError):
+            HttpQueryer(url=self.server.base_url + '/search/list.xhtml')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import os
+import json
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+from icsd.instrumentation import Histogram, Instrumentation
+from tests.fake_driver import make_queryer, load_fixture
+
+
+class TestInstrumentation(unittest.TestCase):
+
+    def test_histogram(self):
+        histogram = Histogram()
+        for seconds in [0.001] * 9 + [1.0]:
+            histogram.add(seconds)
+
+        self.assertEqual(10, histogram.count)
+        self.assertAlmostEqual(1.009, histogram.total)
+        self.assertLess(histogram.percentile(50), 0.002)
+        self.assertGreater(histogram.percentile(99), 0.5)
+        self.assertEqual(1.0, histogram.summary()['max'])
+
+    def test_parse_entries(self):
+        queryer = make_queryer([load_fixture('5013.html')], instrument=True)
+        queryer.hits = 1
+
+        cwd = os.getcwd()
+        workdir = tempfile.mkdtemp()
+        os.chdir(workdir)
+        try:
+            with mock.patch('icsd.entry_parser.time.sleep'):
+                self.assertEqual(['5013'], queryer.parse_entries())
+
+            with open('instrumentation.json') as f:
+                summary = json.load(f)
+        finally:
+            os.chdir(cwd)
+            shutil.rmtree(workdir)
+
+        self.assertEqual(1, summary['field']['cell_parameters']['count'])
+        self.assertEqual(1, summary['wait']['snapshot']['count'])
+        self.assertEqual(1, summary['wait']['detailed_view']['count'])
+        self.assertNotIn('page_source', summary['webdriver'])
+        self.assertIn('find_element_by_id', summary['webdriver'])
+        self.assertIn('execute_script', summary['webdriver'])
+
+    def test_format_table(self):
+        instrumentation = Instrumentation()
+        with instrumentation.timer('wait', 'wait_for_ajax'):
+            pass
+        instrumentation.record('field', 'volume', 0.5)
+        lines = instrumentation.format_table().split('\n')
+        self.assertEqual(3, len(lines))
+        self.assertTrue(lines[1].startswith('field'))
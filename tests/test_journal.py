@@ -0,0 +1,71 @@
+import os
+import shutil
+import tempfile
+import unittest
+from icsd.journal import CrawlJournal
+
+
+class TestCrawlJournal(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.workdir, 'crawl_journal.jsonl')
+
+    def tearDown(self):
+        shutil.rmtree(self.workdir)
+
+    def test_remaining_ranges(self):
+        journal = CrawlJournal(self.path)
+        cursor = journal.begin([(100, 140), (150, 200)], 5)
+        self.assertEqual(((100, 140), (150, 200)), cursor.remaining_ranges())
+
+        # saved out of order by the parser threads
+        cursor.record(1, 120)
+        self.assertEqual(0, cursor.next_index)
+        cursor.record(0, 110)
+        cursor.record(3, 160)
+        self.assertEqual(2, cursor.next_index)
+        self.assertEqual(((121, 140), (150, 200)), cursor.remaining_ranges())
+
+        cursor.record(2, 150)
+        self.assertEqual(((161, 200),), cursor.remaining_ranges())
+        cursor.record(4, 190)
+        self.assertIsNone(cursor.remaining_ranges())
+
+    def test_last_code_saved(self):
+        cursor = CrawlJournal(self.path).begin([(1, 10)], 3)
+        cursor.record(0, 5)
+        cursor.record(1, 10)
+        self.assertIsNone(cursor.remaining_ranges())
+
+    def test_entries_out_of_code_order(self):
+        cursor = CrawlJournal(self.path).begin([(100, 200)], 3)
+        cursor.record(0, 150)
+        cursor.record(1, 120)
+        self.assertEqual(((100, 200),), cursor.remaining_ranges())
+
+    def test_reload(self):
+        journal = CrawlJournal(self.path)
+        cursor = journal.begin([(1, 10)], 4)
+        cursor.record(0, 2)
+        cursor.record(1, 3)
+        journal.begin([(11, 20)], 2).finish()
+        with open(self.path, 'a') as fw:
+            fw.write('{"event": "entry", "ran')
+
+        journal = CrawlJournal(self.path)
+        self.assertEqual([((1, 10),)],
+                         [c.code_ranges for c in journal.unfinished()])
+        cursor = journal.unfinished()[0]
+        self.assertEqual(((4, 10),), cursor.remaining_ranges())
+
+        # the finished queries are dropped from the file
+        with open(self.path) as f:
+            self.assertEqual(3, len(f.readlines()))
+
+        cursor.finish()
+        self.assertEqual([], CrawlJournal(self.path).unfinished())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,189 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import unittest
+import pandas as pd
+from icsd.coverage import Coverage
+from icsd.crawler import Crawler
+from icsd.journal import CrawlJournal
+from icsd.leases import LeaseCoordinator, merge_entries
+from icsd.state_index import StateIndex
+
+
+class TestLeaseCoordinator(unittest.TestCase):
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.workdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.workdir, 'leases.sqlite')
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.workdir)
+
+    def host(self, owner, ttl=600):
+        coordinator = LeaseCoordinator(self.path, owner=owner, ttl=ttl)
+        coverage = Coverage(range(1, 41))
+
+        def plan(crawled_codes, leased):
+            coverage.update(crawled_codes=crawled_codes)
+            return(coverage.next_batch(10, leased))
+
+        return(coordinator, lambda: coordinator.acquire(plan))
+
+    def test_disjoint_leases(self):
+        a, acquire_a = self.host('a')
+        b, acquire_b = self.host('b')
+        lease_a, batch_a = acquire_a()
+        lease_b, batch_b = acquire_b()
+        self.assertEqual(((1, 10),), batch_a)
+        self.assertEqual(((11, 20),), batch_b)
+
+        # a crawled 1-5 before failing: 6-10 are planned anew
+        a.release(lease_a, [1, 2, 3, 4, 5])
+        self.assertEqual(((6, 10), (21, 25)), acquire_b()[1])
+        b.release(lease_b, range(11, 21))
+        self.assertEqual(((26, 35),), acquire_a()[1])
+        self.assertEqual(0, a.n_requeued + b.n_requeued)
+
+    def test_expired_lease(self):
+        dead, acquire_dead = self.host('dead', ttl=60)
+        alive, acquire_alive = self.host('alive', ttl=60)
+        lease_dead, _ = acquire_dead()
+        lease_alive, _ = acquire_alive()
+
+        # only the alive host renews its lease
+        now = dead.clock()
+        dead.clock = alive.clock = lambda: now + 50
+        self.assertEqual([], alive.heartbeat([lease_alive]))
+        dead.clock = alive.clock = lambda: now + 100
+        self.assertEqual(((1, 10),), acquire_alive()[1])
+        self.assertEqual(1, alive.n_requeued)
+        self.assertEqual([lease_dead], dead.heartbeat([lease_dead]))
+
+    def test_nothing_left(self):
+        a, acquire = self.host('a')
+        for _ in range(4):
+            lease_id, code_batch = acquire()
+            a.release(lease_id, range(code_batch[0][0],
+                                      code_batch[-1][1] + 1))
+        self.assertIsNone(acquire())
+
+    def crawler(self, name, owner, ttl=60, clock=None):
+        """
+        Return: (Crawler) crawler of codes 1-40 in the directory `name`
+                (made current), without its workers (see `Crawler.run`)
+        """
+        directory = os.path.join(self.workdir, name)
+        if not os.path.exists(directory):
+            os.makedirs(os.path.join(directory, 'combined'))
+            pd.DataFrame({'Coll. Code': range(1, 41)}).to_csv(
+                os.path.join(directory, 'combined', 'a.csv'))
+        os.chdir(directory)
+
+        crawler = Crawler()
+        crawler.max_dl = 10
+        crawler.coordinator = LeaseCoordinator(self.path, owner=owner,
+                                               ttl=ttl)
+        if clock is not None:
+            crawler.coordinator.clock = clock
+        crawler.refresh()
+        crawler._reported_seq = crawler._seq
+        crawler.journal = CrawlJournal(crawler.journal_file,
+                                       state=crawler.state)
+        return(crawler)
+
+    def crawled(self, owner):
+        coordinator = LeaseCoordinator(self.path)
+        codes = [c for c, in coordinator.conn.execute(
+            'SELECT code FROM crawled WHERE owner = ? ORDER BY code',
+            (owner,))]
+        coordinator.close()
+        return(codes)
+
+    def test_host_dies_mid_lease(self):
+        dead = self.crawler('dead', 'dead')
+        code_batch = dead.claim_code_batch()
+        self.assertEqual(((1, 10),), code_batch)
+        cursor = dead.journal.begin(code_batch, 10)
+        for index, code in enumerate(range(1, 5)):
+            cursor.record(index, code)
+        # a heartbeat, and the host dies holding its lease
+        dead.report_crawled()
+        self.assertEqual([1, 2, 3, 4], self.crawled('dead'))
+
+        now = dead.coordinator.clock()
+        alive = self.crawler('alive', 'alive', clock=lambda: now + 100)
+        self.assertEqual(((5, 14),), alive.claim_code_batch())
+        self.assertEqual(1, alive.coordinator.n_requeued)
+
+    def test_restart_after_death(self):
+        dead = self.crawler('host', 'dead')
+        code_batch = dead.claim_code_batch()
+        cursor = dead.journal.begin(code_batch, 10)
+        for index, code in enumerate(range(1, 5)):
+            cursor.record(index, code)
+        # the host dies before reporting the entries saved
+
+        restarted = self.crawler('host', 'restarted')
+        self.assertEqual(((11, 20),), restarted.claim_code_batch())
+        self.assertEqual([1, 2, 3, 4], self.crawled('restarted'))
+        self.assertEqual([], restarted.journal.unfinished())
+        self.assertEqual([], CrawlJournal('crawl_journal.jsonl').unfinished())
+
+    def test_heartbeat_failure(self):
+        clock = [1000.0]
+        crawler = self.crawler('host', 'host', clock=lambda: clock[0])
+        crawler.report_interval = 0.01
+        crawler.claim_code_batch()
+
+        heartbeat = crawler.coordinator.heartbeat
+        n_beats = []
+        renewed = threading.Event()
+
+        def locked_once(lease_ids):
+            n_beats.append(len(lease_ids))
+            if len(n_beats) == 1:
+                raise sqlite3.OperationalError('database is locked')
+            lost = heartbeat(lease_ids)
+            renewed.set()
+            return(lost)
+
+        crawler.coordinator.heartbeat = locked_once
+        clock[0] += 50
+        stop = threading.Event()
+        thread = threading.Thread(target=crawler._heartbeat, args=(stop,))
+        thread.start()
+        try:
+            self.assertTrue(renewed.wait(5))
+        finally:
+            stop.set()
+            thread.join()
+
+        self.assertEqual([1, 1], n_beats[:2])
+        expires, = crawler.coordinator.conn.execute(
+            'SELECT expires FROM leases').fetchone()
+        self.assertEqual(1000.0 + 50 + 60, expires)
+
+    def test_merge_entries(self):
+        other = os.path.join(self.workdir, 'other')
+        here = os.path.join(self.workdir, 'here')
+        for path in [os.path.join(other, '1'), os.path.join(other, '2'),
+                     os.path.join(other, '3'), os.path.join(here, '1')]:
+            os.makedirs(path)
+        for path in [os.path.join(other, '1'), os.path.join(other, '2'),
+                     os.path.join(here, '1')]:
+            open(os.path.join(path, 'source.html'), 'w').close()
+        StateIndex(os.path.join(here, 'crawl_state.sqlite')).close()
+
+        self.assertEqual(['2'], merge_entries([other], here))
+        self.assertTrue(os.path.exists(os.path.join(here, '2',
+                                                    'source.html')))
+        state = StateIndex(os.path.join(here, 'crawl_state.sqlite'))
+        self.assertEqual([(2, False, True)], state.changes()[1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import sys
+import time
+import subprocess
+import unittest
+from unittest import mock
+import icsd
+
+
+HEAVY_MODULES = ['selenium', 'pandas', 'bs4', 'tqdm', 'pkg_resources',
+                 'lxml', 'yaml']
+
+
+def run_python(*args):
+    start = time.perf_counter()
+    output = subprocess.check_output([sys.executable] + list(args),
+                                     universal_newlines=True)
+    return(output, time.perf_counter() - start)
+
+
+class TestStartup(unittest.TestCase):
+
+    def test_no_heavy_imports(self):
+        output, _ = run_python('-c', (
+            'import sys, icsd.main; '
+            'print(" ".join(m for m in {} if m in sys.modules))'
+        ).format(HEAVY_MODULES))
+        self.assertEqual('', output.strip())
+
+    def test_help_startup_time(self):
+        _, baseline = run_python('-c', 'pass')
+        output, elapsed = run_python('-m', 'icsd.main', '--help')
+        self.assertIn('scrape', output)
+
+        startup = elapsed - baseline
+        sys.stdout.write('\n`icsd --help`: {:.0f} ms over the interpreter '
+                         'startup\n'.format(1e3 * startup))
+        self.assertLess(startup, 1.0)
+
+    def test_browser_options_with_http_engine(self):
+        for option in ('--lean', '--batch-cif'):
+            process = subprocess.run(
+                [sys.executable, '-m', 'icsd.main', 'scrape', '--engine',
+                 'http', option], stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE, universal_newlines=True)
+            self.assertEqual(2, process.returncode)
+            self.assertIn('{} is not supported with --engine http'.format(
+                option), process.stderr)
+
+    def test_crawler_version_once(self):
+        icsd._CRAWLER_VERSION = None
+        version = icsd.crawler_version()
+        self.assertEqual(version, icsd._CRAWLER_VERSION)
+        icsd._CRAWLER_VERSION = 'cached'
+        try:
+            self.assertEqual('cached', icsd.crawler_version())
+        finally:
+            icsd._CRAWLER_VERSION = version
+
+    def test_crawler_version_without_importlib_metadata(self):
+        # Python < 3.8 has no importlib.metadata
+        icsd._CRAWLER_VERSION = None
+        version = icsd.crawler_version()
+        icsd._CRAWLER_VERSION = None
+        try:
+            with mock.patch.dict(sys.modules, {'importlib.metadata': None}):
+                self.assertEqual(version, icsd.crawler_version())
+        finally:
+            icsd._CRAWLER_VERSION = None
@@ -0,0 +1,98 @@
+import os
+import json
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+from icsd.pipeline import EntryPipeline
+from tests.fake_driver import FIXTURES_DIR, make_queryer, load_fixture
+
+
+CODES = ['5013', '9853', '44278', '418498']
+
+
+class TestPipeline(unittest.TestCase):
+
+    def setUp(self):
+        self.sources = [load_fixture('{}.html'.format(c)) for c in CODES]
+        self.cwd = os.getcwd()
+        self.workdir = tempfile.mkdtemp()
+        os.chdir(self.workdir)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.workdir)
+
+    def parse_entries(self, pipeline):
+        queryer = make_queryer(self.sources)
+        queryer.hits = len(self.sources)
+        queryer.pipeline = pipeline
+        with mock.patch('icsd.entry_parser.time.sleep'):
+            return(queryer.parse_entries())
+
+    def read_entries(self):
+        entries = {}
+        for code in CODES:
+            with open(os.path.join(code, 'meta_data.json')) as f:
+                entries[code] = f.read()
+            with open(os.path.join(code, 'source.html')) as f:
+                entries[code + '.html'] = f.read()
+
+        return(entries)
+
+    def test_pipeline(self):
+        self.assertEqual(CODES, self.parse_entries(pipeline=True))
+        entries = self.read_entries()
+        for code, source in zip(CODES, self.sources):
+            self.assertEqual(source, entries[code + '.html'])
+            entry_data = json.loads(entries[code])
+            del entry_data['crawler_version']
+            with open(os.path.join(FIXTURES_DIR, code + '.json')) as f:
+                self.assertEqual(json.load(f), entry_data)
+
+        shutil.rmtree(CODES[0])
+        self.assertEqual(CODES, self.parse_entries(pipeline=False))
+        self.assertEqual(entries, self.read_entries())
+
+    def test_backpressure(self):
+        queryer = make_queryer(self.sources)
+        pipeline = EntryPipeline(queryer, parse_workers=1, queue_size=1,
+                                 batch_size=1)
+        with mock.patch('icsd.entry_parser.time.sleep'):
+            self.assertEqual(CODES, pipeline.run(len(CODES)))
+
+    def test_batch_cifs(self):
+        queryer = make_queryer(self.sources)
+        queryer.hits = len(self.sources)
+        queryer.skipcif = False
+        queryer.batch_cif = True
+        queryer.journal_cursor = mock.Mock()
+        with open('export.cif', 'w') as fw:
+            for code in CODES[1:]:
+                fw.write('data_{0}\n_database_code_ICSD {0}\n'.format(code))
+
+        with mock.patch.object(queryer, 'export_selected_CIFs',
+                               return_value='export.cif'), \
+                mock.patch.object(queryer, '_click_show_detailed_view'), \
+                mock.patch('icsd.entry_parser.time.sleep'):
+            self.assertEqual(CODES[1:], queryer.parse_selection())
+
+        # the entry missing from the export is not recorded as crawled
+        self.assertEqual(
+            CODES[1:], sorted((c.args[1] for c in
+                               queryer.journal_cursor.record.call_args_list),
+                              key=CODES.index))
+        self.assertFalse(os.path.exists(os.path.join(CODES[0],
+                                                     CODES[0] + '.cif')))
+        for code in CODES[1:]:
+            self.assertTrue(os.path.exists(os.path.join(code, code + '.cif')))
+        self.assertFalse(os.path.exists('export.cif'))
+
+    def test_parse_error(self):
+        queryer = make_queryer(self.sources)
+        queryer.hits = len(self.sources)
+        with mock.patch('icsd.pipeline.Snapshot.parse_fields',
+                        side_effect=ValueError('broken page')):
+            with self.assertRaises(ValueError):
+                queryer.parse_entries()
+        self.assertEqual([], os.listdir('.'))
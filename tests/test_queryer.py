@@ -4,8 +4,13 @@ import random
 import glob
 import json
 import platform
+import os
+import shutil
+import tempfile
 from icsd.queryer import Queryer
+from tests.fake_driver import FIXTURES_DIR, make_queryer, load_fixture
 import unittest
+from unittest import mock
 
 
 is_mac = platform.system() == 'Darwin'
@@ -37,6 +42,67 @@ class TestQueryer(unittest.TestCase):
         self.assertAlmostEqual(d1['beta'], 90.0)
         self.assertAlmostEqual(d1['gamma'], 90.0)
 
+    def test_page_snapshot(self):
+        source = load_fixture('5013.html')
+        queryer = make_queryer([source, source])
+
+        cwd = os.getcwd()
+        workdir = tempfile.mkdtemp()
+        os.chdir(workdir)
+        try:
+            entry_data = queryer.parse_entry()
+            os.mkdir('5013')
+            queryer.save_entire_page('5013')
+            with open('5013/source.html') as f:
+                self.assertEqual(source, f.read())
+        finally:
+            os.chdir(cwd)
+            shutil.rmtree(workdir)
+
+        self.assertEqual(5013, entry_data['collection_code'])
+        self.assertIn('Version', entry_data['ICSD_version'])
+        self.assertEqual(1, queryer.n_page_captures)
+        self.assertEqual(1, queryer.driver.n_snapshots)
+        self.assertEqual(0, queryer.driver.n_page_sources)
+
+        queryer._go_to_next_entry()
+        queryer.parse_entry()
+        self.assertEqual(2, queryer.n_page_captures)
+        self.assertEqual(2, queryer.driver.n_snapshots)
+        self.assertEqual(0, queryer.driver.n_page_sources)
+
+    def test_snapshot_bundle(self):
+        source = load_fixture('9853.html')
+        queryer = make_queryer([source])
+        queryer.save_source = False
+        entry_data = queryer.parse_entry()
+        self.assertIsNone(queryer.page.source)
+
+        with open(os.path.join(FIXTURES_DIR, '9853.json')) as f:
+            expected = json.load(f)
+        del entry_data['crawler_version']
+        self.assertEqual(expected, entry_data)
+        self.assertEqual(1, queryer.n_page_captures)
+        self.assertEqual(0, queryer.driver.n_page_sources)
+        self.assertEqual(len(source.encode()), queryer.n_bytes_transferred)
+
+    def test_lean_session(self):
+        queryer = make_queryer([load_fixture('5013.html')], lean=True)
+        self.assertTrue(queryer.lean_session)
+
+        browser = mock.MagicMock()
+        browser.command_executor._commands = {}
+        queryer._block_assets(browser)
+        commands = [c[0][1]['cmd'] for c in browser.execute.call_args_list]
+        self.assertEqual(['Network.enable', 'Network.setBlockedURLs'],
+                         commands)
+        urls = browser.execute.call_args[0][1]['params']['urls']
+        self.assertIn('*.css', urls)
+        self.assertIn('*.png', urls)
+
+        queryer.save_screenshot = True
+        self.assertFalse(queryer.lean_session)
+
     @unittest.skipIf(not is_mac, "Use macOS to run this")
     def test_dummy_data(self):
         queryer = Queryer()
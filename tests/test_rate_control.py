@@ -0,0 +1,91 @@
+import os
+import shutil
+import tempfile
+import unittest
+import requests
+from icsd.entry_parser import HitCountMismatch, QueryerError
+from icsd.jsf import JSFError
+from icsd.waits import WaitTimeout
+from icsd.rate_control import RateController, classify_error
+
+
+class TestRateControl(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp()
+        self.state_file = os.path.join(self.workdir, 'crawl_rate.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.workdir)
+
+    def test_classify_error(self):
+        self.assertEqual('mismatch', classify_error(HitCountMismatch('')))
+        self.assertEqual('overload', classify_error(WaitTimeout('')))
+        self.assertEqual('overload', classify_error(JSFError('', status=503)))
+        self.assertEqual('error', classify_error(JSFError('', status=404)))
+        self.assertEqual('error', classify_error(QueryerError('')))
+
+        try:
+            try:
+                raise requests.ConnectionError('reset')
+            except requests.ConnectionError as e:
+                raise JSFError('POST failed') from e
+        except JSFError as e:
+            self.assertEqual('overload', classify_error(e))
+
+    def test_decrease_and_recover(self):
+        rate = RateController(max_batch=100, base_backoff=60)
+        self.assertEqual(60, rate.record_error(JSFError('', status=503)))
+        self.assertEqual(50, rate.batch_size)
+        self.assertEqual(0.5, rate.interval)
+        self.assertEqual(120, rate.record_error(WaitTimeout('')))
+        self.assertEqual(25, rate.batch_size)
+        self.assertEqual(1.0, rate.interval)
+        self.assertEqual(0, rate.record_error(HitCountMismatch('')))
+        self.assertEqual(12, rate.batch_size)
+
+        for _ in range(20):
+            rate.record_success(10, 10.0)
+        self.assertEqual(100, rate.batch_size)
+        self.assertEqual(0, rate.interval)
+        self.assertEqual(0, rate.backoff)
+
+    def test_slow_entries(self):
+        rate = RateController(max_batch=100)
+        rate.record_success(10, 1.0)
+        rate.record_success(10, 50.0)
+        self.assertEqual(0.5, rate.interval)
+        self.assertEqual(100, rate.batch_size)
+
+    def test_recover_at_one_code_per_query(self):
+        rate = RateController(max_batch=100)
+        rate.record_success(100, 50.0)
+        for _ in range(7):
+            rate.record_error(JSFError('', status=503))
+        self.assertEqual(1, rate.batch_size)
+        self.assertEqual(30, rate.interval)
+
+        # a healthy server, with a fixed cost per query counted in
+        for _ in range(200):
+            n_entries = rate.batch_size
+            rate.record_success(n_entries, 5.0 + 0.5 * n_entries)
+        self.assertEqual(100, rate.batch_size)
+        self.assertEqual(0, rate.interval)
+
+    def test_persistence(self):
+        rate = RateController.load(self.state_file, max_batch=100)
+        rate.record_error(JSFError('', status=503))
+        rate.record_error(QueryerError(''))
+
+        rate = RateController.load(self.state_file, max_batch=10)
+        self.assertEqual(10, rate.batch_size)
+        self.assertEqual(0.5, rate.interval)
+        self.assertEqual({'overload': 1, 'error': 1}, rate.n_errors)
+        self.assertIsNone(rate.fastest)
+
+        rate = RateController.load(self.state_file, max_batch=100)
+        self.assertEqual(25, rate.batch_size)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import os
+import glob
+import json
+import shutil
+import tempfile
+import unittest
+from icsd.reparse import SavedPage, find_entries, reparse_all
+
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), 'fixtures',
+                            'detailed_view')
+
+
+class TestReparse(unittest.TestCase):
+
+    def setUp(self):
+        self.maxDiff = None
+        self.workdir = tempfile.mkdtemp()
+        os.mkdir(os.path.join(self.workdir, '5013'))
+        shutil.copy(os.path.join(FIXTURES_DIR, '5013.html'),
+                    os.path.join(self.workdir, '5013', 'source.html'))
+
+        with open(os.path.join(FIXTURES_DIR, '5013.json')) as f:
+            self.expected_dict = json.load(f)
+
+    def tearDown(self):
+        shutil.rmtree(self.workdir)
+
+    def test_saved_page(self):
+        for path in glob.glob(os.path.join(FIXTURES_DIR, '*.html')):
+            parsed_dict = SavedPage(path).parse_fields()
+            del parsed_dict['crawler_version']
+
+            with open(path.replace('.html', '.json')) as f:
+                expected_dict = json.load(f)
+            self.assertDictEqual(expected_dict, parsed_dict)
+
+    def test_empty_additional_information(self):
+        parsed_dict = SavedPage(os.path.join(FIXTURES_DIR,
+                                             '9854.html')).parse_fields()
+        self.assertEqual([], parsed_dict['warnings'])
+        self.assertEqual([], parsed_dict['comments'])
+        self.assertFalse(parsed_dict['theoretical_calculation'])
+
+    def test_reparse_all(self):
+        failed = reparse_all(self.workdir, processes=2)
+        self.assertEqual({}, failed)
+
+        with open(os.path.join(self.workdir, '5013', 'meta_data.json')) as f:
+            crawled_dict = json.load(f)
+        del crawled_dict['crawler_version']
+        self.assertDictEqual(self.expected_dict, crawled_dict)
+
+        # up-to-date entries are skipped unless forced
+        self.assertEqual([], find_entries(self.workdir))
+        self.assertEqual(1, len(find_entries(self.workdir, force=True)))
+
+    def test_mismatching_directory(self):
+        shutil.move(os.path.join(self.workdir, '5013'),
+                    os.path.join(self.workdir, '5014'))
+        failed = reparse_all(self.workdir, processes=1)
+        self.assertEqual(1, len(failed))
+        self.assertFalse(os.path.exists(
+            os.path.join(self.workdir, '5014', 'meta_data.json')))
@@ -0,0 +1,46 @@
+import unittest
+from unittest import mock
+from icsd.session import CrawlSession
+
+
+class TestCrawlSession(unittest.TestCase):
+
+    def setUp(self):
+        self.queryers = []
+
+        def launch():
+            queryer = mock.MagicMock()
+            queryer.parse_selection.return_value = ['1']
+            self.queryers.append(queryer)
+            return(queryer)
+
+        self.session = CrawlSession()
+        self.session._launch = launch
+
+    def test_reuse_browser(self):
+        self.assertEqual(['1'], self.session.crawl(1, 10))
+        self.assertEqual(['1'], self.session.crawl(11, 20))
+        self.assertEqual(1, len(self.queryers))
+
+        queryer = self.queryers[0]
+        queryer.driver.get.assert_called_once_with(queryer.url)
+        queryer.driver.find_element_by_id.return_value.send_keys\
+            .assert_called_with('11-20')
+        queryer.parse_selection.assert_called_with(quit=False)
+        queryer.quit.assert_not_called()
+
+        self.session.close()
+        queryer.quit.assert_called_once_with()
+        self.assertIsNone(self.session.queryer)
+
+    def test_relaunch_after_failure(self):
+        self.session.crawl(1, 10)
+        self.queryers[0].parse_selection.side_effect = \
+            RuntimeError('stale element')
+        with self.assertRaises(RuntimeError):
+            self.session.crawl(11, 20)
+        self.queryers[0].quit.assert_called_once_with()
+
+        self.session.crawl(11, 20)
+        self.assertEqual(2, len(self.queryers))
+        self.queryers[1].driver.get.assert_not_called()
@@ -0,0 +1,173 @@
+import os
+import json
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+import pandas as pd
+from icsd.collection_coder import CollectionCoder
+from icsd.crawler import Crawler
+from icsd.http_queryer import HttpQueryer
+from icsd.journal import CrawlJournal
+from icsd.leases import LeaseCoordinator
+from tests.fake_driver import load_fixture
+from tests.icsd_standin import StandInServer, synthetic_pages
+
+
+CODES = [str(3 * i + 1) for i in range(60)]
+
+
+class TestStandIn(unittest.TestCase):
+    """
+    Enumerate and crawl a stand-in of the ICSD end to end, over HTTP.
+    """
+
+    def setUp(self):
+        pages = synthetic_pages(CODES, load_fixture('5013.html'))
+        self.server = StandInServer(pages, latency=(0, 0.002))
+        self.server.__enter__()
+        self.cwd = os.getcwd()
+        self.workdir = tempfile.mkdtemp()
+        os.chdir(self.workdir)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.workdir)
+        self.server.__exit__()
+
+    def enumerate(self):
+        coder = CollectionCoder(1, 10000, url=self.server.url, engine='http')
+        coder.run()
+        return(pd.read_csv(coder.combined_csv_path))
+
+    def crawl(self, pack=True, coordinator=None):
+        crawler = Crawler()
+        crawler.pack = pack
+        crawler.coordinator = coordinator
+        crawler.url = self.server.url
+        crawler.engine = 'http'
+        crawler.workers = 2
+        crawler.max_dl = 10
+        with mock.patch.object(Crawler, '_sleep') as sleep, \
+                mock.patch.object(HttpQueryer, '_sleep') as pause:
+            crawler.run()
+        return(sleep, pause)
+
+    def check_entries(self, codes=CODES):
+        for code in codes:
+            with open(os.path.join(code, 'meta_data.json')) as f:
+                self.assertEqual(int(code), json.load(f)['collection_code'])
+            with open(os.path.join(code, '{}.cif'.format(code))) as f:
+                self.assertIn('_database_code_ICSD {}'.format(code), f.read())
+
+    def test_enumerate_and_crawl(self):
+        self.assertEqual([int(c) for c in CODES],
+                         self.enumerate()['Coll. Code'].tolist())
+        self.assertEqual(2, len(os.listdir('each')))
+
+        sleep, pause = self.crawl()
+        self.check_entries()
+        sleep.assert_not_called()
+        pause.assert_not_called()
+        # one for the enumeration, one per worker
+        self.assertEqual(3, len(self.server.sessions))
+
+    def test_packed_queries(self):
+        self.enumerate()
+        # holes left by entries already crawled
+        for code in CODES[::7]:
+            os.mkdir(code)
+            open(os.path.join(code, 'source.html'), 'w').close()
+
+        n_requests = len(self.server.requests)
+        self.crawl()
+        self.check_entries([c for c in CODES if c not in CODES[::7]])
+        queries = [r for r in self.server.requests[n_requests:]
+                   if r[2] == 'content_form:btnRunQuery']
+        # 51 codes left, 10 per query; 9 queries without packing
+        self.assertEqual(6, len(queries))
+
+    def test_leased_crawl(self):
+        self.enumerate()
+        path = os.path.join(self.workdir, 'leases.sqlite')
+        # a host died holding a lease; another crawled 61-88
+        LeaseCoordinator(path, owner='dead', ttl=0).acquire(
+            lambda crawled, leased: ((1, 28),))
+        other = LeaseCoordinator(path, owner='other')
+        lease_id, _ = other.acquire(lambda crawled, leased: ((61, 88),))
+        other.release(lease_id, CODES[20:30])
+
+        coordinator = LeaseCoordinator(path, owner='here')
+        self.crawl(coordinator=coordinator)
+        self.check_entries(CODES[:20] + CODES[30:])
+        for code in CODES[20:30]:
+            self.assertFalse(os.path.exists(code))
+        # the lease of the dead host was dropped by the next to ask for one
+        self.assertEqual(1, other.n_requeued)
+        self.assertIsNone(other.acquire(lambda crawled, leased: None))
+        self.assertEqual(
+            50, len(coordinator.conn.execute(
+                "SELECT code FROM crawled WHERE owner = 'here'").fetchall()))
+
+    def test_cif_failure(self):
+        self.enumerate()
+        self.server.fail('/ws/cif/{}'.format(CODES[3]))
+
+        self.crawl()
+        # crawled again after its CIF failed
+        self.check_entries()
+        self.assertEqual(2, self.server.requests.count(
+            ('GET', '/ws/cif/{}'.format(CODES[3]), None)))
+
+    def test_recovery_from_errors(self):
+        self.enumerate()
+        self.server.fail('display_form:buttonNext', times=2)
+        self.server.fail('content_form:btnRunQuery', status=503)
+
+        sleep, pause = self.crawl()
+        self.check_entries()
+        self.assertEqual(3, self.server.n_errors)
+        # a pause after each failure, and between the entries until the
+        # server is healthy again
+        self.assertEqual(3, sleep.call_count)
+        self.assertTrue(pause.called)
+        with open('crawl_rate.json') as f:
+            self.assertEqual({'overload': 3}, json.load(f)['n_errors'])
+        self.assertEqual([], CrawlJournal('crawl_journal.jsonl').unfinished())
+
+
+@unittest.skipUnless('CHROME' in os.environ and 'CDRIVER' in os.environ,
+                     'needs Chrome and ChromeDriver ($CHROME, $CDRIVER)')
+class TestStandInBrowser(unittest.TestCase):
+    """
+    Crawl the stand-in with Chrome, with the blockUI dialog shown for a
+    while after each page load.
+    """
+
+    def setUp(self):
+        pages = synthetic_pages(CODES[:5], load_fixture('5013.html'))
+        self.server = StandInServer(pages, block_ui=0.2)
+        self.server.__enter__()
+        self.cwd = os.getcwd()
+        self.workdir = tempfile.mkdtemp()
+        os.chdir(self.workdir)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.workdir)
+        self.server.__exit__()
+
+    def test_query(self):
+        from icsd.queryer import Queryer
+        queryer = Queryer(url=self.server.url,
+                          query={'icsd_collection_code': '1-100'},
+                          structure_source='E')
+        queryer.skipcif = False
+        self.assertEqual(CODES[:5], queryer.perform_icsd_query())
+        for code in CODES[:5]:
+            self.assertTrue(os.path.exists(
+                os.path.join(code, '{}.cif'.format(code))))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+import pandas as pd
+from icsd.crawler import Crawler
+from icsd.pipeline import record_entry
+from icsd.state_index import StateIndex
+
+
+def write_enumeration(path, codes):
+    pd.DataFrame({'Coll. Code': codes}).to_csv(path)
+
+
+class TestStateIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.workdir = tempfile.mkdtemp()
+        os.chdir(self.workdir)
+        os.mkdir('combined')
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.workdir)
+
+    def test_changes(self):
+        state = StateIndex('state.sqlite')
+        self.assertFalse(state.imported)
+        write_enumeration('combined/a.csv', [1, 2, 3])
+        write_enumeration('combined/b.csv', [10, 11])
+        state.mark_crawled([2, 500])
+        paths = ['combined/a.csv', 'combined/b.csv']
+        self.assertEqual(paths, state.sync_enumeration(paths))
+        self.assertEqual([], state.sync_enumeration(paths))
+
+        seq, changes = state.changes()
+        self.assertEqual([(1, True, False), (2, True, True),
+                          (3, True, False), (10, True, False),
+                          (11, True, False), (500, False, True)], changes)
+
+        state.mark_crawled([3, 2])
+        seq, changes = state.changes(seq)
+        self.assertEqual([(3, True, True)], changes)
+        self.assertEqual([], state.changes(seq)[1])
+
+        write_enumeration('combined/c.csv', [11, 12])
+        with self.assertRaises(AssertionError):
+            state.sync_enumeration(['combined/c.csv'])
+        state.close()
+
+        self.assertFalse(StateIndex('state.sqlite').imported)
+
+    def test_refresh(self):
+        write_enumeration('combined/a.csv', [1, 2, 3, 4])
+        os.mkdir('2')
+        open('2/source.html', 'w').close()
+
+        crawler = Crawler()
+        crawler.refresh()
+        self.assertEqual([1, 2, 3, 4], crawler.all_codes)
+        self.assertEqual([2], crawler.crawled_codes)
+        self.assertEqual([1, 3, 4], crawler.not_yet_crawled)
+
+        # entry directories are not listed again
+        os.mkdir('3')
+        open('3/source.html', 'w').close()
+        crawler.state.mark_crawled([4])
+        write_enumeration('combined/b.csv', [7, 8])
+        crawler.refresh()
+        self.assertEqual([1, 2, 3, 4, 7, 8], crawler.all_codes)
+        self.assertEqual([2, 4], crawler.crawled_codes)
+        self.assertEqual([1, 3, 7, 8], crawler.not_yet_crawled)
+
+        # resumed from the index
+        crawler = Crawler()
+        crawler.refresh()
+        self.assertEqual([1, 3, 7, 8], crawler.not_yet_crawled)
+
+    def test_import_cut_short(self):
+        write_enumeration('combined/a.csv', [1, 2, 3])
+        os.mkdir('2')
+        open('2/source.html', 'w').close()
+
+        crawler = Crawler()
+        with mock.patch.object(StateIndex, 'import_crawled',
+                               side_effect=KeyboardInterrupt):
+            with self.assertRaises(KeyboardInterrupt):
+                crawler.refresh()
+        crawler.state.close()
+
+        # the index exists, but the entries are imported by the next crawl
+        crawler = Crawler()
+        crawler.refresh()
+        self.assertEqual([2], crawler.crawled_codes)
+        self.assertTrue(crawler.state.imported)
+
+    def test_entry_saved_outside_a_crawl(self):
+        write_enumeration('combined/a.csv', [1, 2, 3])
+        crawler = Crawler()
+        crawler.refresh()
+
+        # e.g. by `icsd scrape --code 3`
+        queryer = mock.Mock(journal_cursor=None, skipcif=True,
+                            cif_fetcher=None, batch_cifs=None)
+        record_entry(queryer, 0, '3')
+        crawler.refresh()
+        self.assertEqual([3], crawler.crawled_codes)
+
+
+if __name__ == '__main__':
+    unittest.main()
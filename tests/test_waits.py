@@ -0,0 +1,47 @@
+import unittest
+from icsd.entry_parser import QueryerError
+from icsd.waits import Waiter, WaitTimeout
+from tests.fake_driver import FakeDriver, load_fixture
+
+
+class TestWaiter(unittest.TestCase):
+
+    def setUp(self):
+        source = load_fixture('5013.html')
+        self.driver = FakeDriver([source, source])
+        self.waits = Waiter(self.driver, timeout=1, poll=0.001)
+
+    def test_until_returns_when_ready(self):
+        polls = []
+
+        def ready(driver):
+            polls.append(1)
+            return(len(polls) == 3 and 'ready')
+
+        self.assertEqual('ready', self.waits.until(ready, 'ready'))
+        self.assertEqual(3, len(polls))
+
+        histogram = self.waits.instrumentation.histograms[('wait', 'ready')]
+        self.assertEqual(1, histogram.count)
+        self.assertLess(histogram.total, 0.5)
+
+    def test_timeout(self):
+        with self.assertRaises(WaitTimeout):
+            self.waits.until(lambda driver: False, 'never', timeout=0.01)
+        self.assertTrue(issubclass(WaitTimeout, QueryerError))
+
+        histogram = self.waits.instrumentation.histograms[('wait', 'never')]
+        self.assertGreaterEqual(histogram.total, 0.01)
+
+    def test_page_signals(self):
+        self.assertTrue(self.waits.page_idle())
+        self.assertTrue(self.waits.block_ui_hidden())
+        self.assertTrue(self.waits.dom_settled())
+
+        title = self.waits.title()
+        self.assertIn('Entry 1 of 2', title)
+        with self.assertRaises(WaitTimeout):
+            self.waits.title_changed(title, timeout=0.01)
+
+        self.driver._next()
+        self.assertTrue(self.waits.title_changed(title))